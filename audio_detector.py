@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+音訊輸出裝置偵測（Linux PulseAudio / PipeWire）
+啟動時查詢一次預設輸出裝置；常駐行程（daemon）另以 `pactl subscribe` 監聽裝置變更事件（watch=True），
+只在 sink / card / server 有變動時重新查詢；目前的裝置與耳機狀態保存在記憶體，
+should_enable_voice() 只是查表，不會每則通知都啟動子行程。
+一次性的行程不監聽（只查詢一次），不會為了一則通知多啟動一個 pactl subscribe。
+
+裝置名稱或描述包含 config.json 的 my_devices 任一項（不分大小寫），
+或目前輸出是耳機、藍牙耳機時，靜音模式下也會啟用語音。
+"""
+import os
+import time
+import atexit
+import shutil
+import threading
+import subprocess
+from typing import Any, Dict, List, Optional, Tuple
+
+# 事件常成串出現（拔插耳機會同時改變 card、sink、server），等待這段時間再一次重新查詢
+DEBOUNCE_SECONDS = 0.2
+
+# subscribe 行程意外結束後重新啟動的等待時間
+RESTART_DELAY = 2.0
+
+# 會觸發重新查詢的事件對象
+WATCHED_FACILITIES = ('sink', 'card', 'server')
+
+# 視為耳機的 device.form_factor
+HEADPHONE_FORM_FACTORS = {'headphone', 'headset', 'hands-free', 'handset'}
+HEADPHONE_PORT_WORDS = ('headphone', 'headset')
+
+# pactl 的輸出依語系翻譯，解析時固定使用英文
+_PACTL_ENV = dict(os.environ, LC_ALL='C')
+
+
+def parse_default_sink(info: str) -> Optional[str]:
+    """從 `pactl info` 取出預設輸出裝置名稱"""
+    for line in info.splitlines():
+        key, _, value = line.partition(':')
+        if key.strip() == 'Default Sink':
+            return value.strip() or None
+    return None
+
+
+def parse_sinks(listing: str) -> List[Dict[str, Any]]:
+    """
+    解析 `pactl list sinks`
+
+    Returns:
+        [{'name', 'description', 'active_port', 'ports': {名稱: 說明}, 'properties': {...}}, ...]
+    """
+    sinks = []
+    sink = None
+    section = None
+    for raw in listing.splitlines():
+        if raw.startswith('Sink #'):
+            sink = {'name': None, 'description': '', 'active_port': None,
+                    'ports': {}, 'properties': {}}
+            sinks.append(sink)
+            section = None
+            continue
+        if sink is None or not raw.strip():
+            continue
+
+        depth = len(raw) - len(raw.lstrip('\t'))
+        line = raw.strip()
+        if depth <= 1:
+            key, _, value = line.partition(':')
+            value = value.strip()
+            section = key if not value else None
+            if key == 'Name':
+                sink['name'] = value
+            elif key == 'Description':
+                sink['description'] = value
+            elif key == 'Active Port':
+                sink['active_port'] = value
+        elif section == 'Properties':
+            key, _, value = line.partition('=')
+            sink['properties'][key.strip()] = value.strip().strip('"')
+        elif section == 'Ports':
+            name, _, description = line.partition(':')
+            sink['ports'][name.strip()] = description.strip()
+    return sinks
+
+
+def describe_sink(sink: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """把 sink 整理為偵測器狀態"""
+    if sink is None:
+        return {'sink': None, 'description': '', 'port': None,
+                'headphones': False, 'bluetooth': False}
+
+    properties = sink['properties']
+    port = sink['active_port'] or ''
+    port_text = f"{port} {sink['ports'].get(port, '')}".lower()
+    form_factor = properties.get('device.form_factor', '').lower()
+    bluetooth = properties.get('device.bus') == 'bluetooth' or (sink['name'] or '').startswith('bluez')
+
+    headphones = (form_factor in HEADPHONE_FORM_FACTORS
+                  or any(word in port_text for word in HEADPHONE_PORT_WORDS)
+                  # 沒有標示外型的藍牙輸出大多是耳機
+                  or (bluetooth and not form_factor))
+
+    return {'sink': sink['name'], 'description': sink['description'] or sink['name'],
+            'port': sink['active_port'], 'headphones': headphones, 'bluetooth': bluetooth}
+
+
+class AudioDeviceDetector:
+    """以事件更新狀態的音訊輸出偵測器"""
+
+    def __init__(self, config_path: Optional[str] = None, devices: Optional[List[str]] = None,
+                 watch: bool = False, pactl: str = 'pactl'):
+        """
+        Args:
+            config_path: 統一設定檔路徑（讀取 my_devices，修改後自動套用）
+            devices: 直接指定 my_devices（未提供 config_path 時使用）
+            watch: 是否以 `pactl subscribe` 監聽裝置變更（常駐行程使用，結束前呼叫 close()）
+            pactl: pactl 命令
+        """
+        self.config_path = config_path
+        self.devices = list(devices or [])
+        self.pactl = shutil.which(pactl)
+        # 重新查詢次數（觀察用）
+        self.probes = 0
+
+        self._state = {'available': False, 'version': 0}
+        # (狀態版本與 my_devices, 判斷結果)
+        self._decision = (None, None)
+        self._lock = threading.Lock()
+        self._changed = threading.Event()
+        self._closed = False
+        self._subscriber = None
+
+        if self.pactl is None:
+            return
+
+        # 先開始監聽再查詢，避免漏掉兩者之間的變更
+        if watch:
+            self._start_subscriber()
+            threading.Thread(target=self._refresh_loop, name='audio-refresh', daemon=True).start()
+            atexit.register(self.close)
+        self.refresh()
+
+    @property
+    def state(self) -> Dict[str, Any]:
+        """目前的輸出裝置狀態（唯讀複本）"""
+        return dict(self._state)
+
+    def refresh(self):
+        """查詢預設輸出裝置並更新狀態"""
+        if self.pactl is None:
+            return
+        try:
+            info = self._pactl('info')
+            listing = self._pactl('list', 'sinks')
+        except (OSError, subprocess.SubprocessError):
+            state = {'available': False}
+        else:
+            default = parse_default_sink(info)
+            sinks = parse_sinks(listing)
+            sink = next((item for item in sinks if item['name'] == default), None)
+            state = dict(describe_sink(sink), available=True)
+
+        with self._lock:
+            self.probes += 1
+            state['version'] = self._state['version'] + 1
+            state['updated'] = time.time()
+            # 整份替換，讀取端不需要加鎖
+            self._state = state
+
+    def should_enable_voice(self) -> Dict[str, Any]:
+        """
+        靜音模式下是否應該啟用語音
+
+        Returns:
+            {'enable': bool, 'reason': str, 'device': 裝置描述或 None}
+        """
+        state = self._state
+        devices = self._my_devices()
+        key = (state['version'], devices)
+        cached_key, decision = self._decision
+        if key != cached_key:
+            decision = self._decide(state, devices)
+            self._decision = (key, decision)
+        return decision
+
+    def close(self):
+        """停止監聽"""
+        self._closed = True
+        self._changed.set()
+        process = self._subscriber
+        if process is not None and process.poll() is None:
+            process.terminate()
+            try:
+                process.wait(timeout=1)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    def _my_devices(self) -> Tuple[str, ...]:
+        if self.config_path is None:
+            return tuple(self.devices)
+        from voice_config import load_snapshot
+        return tuple(load_snapshot(self.config_path).get('my_devices', ()))
+
+    @staticmethod
+    def _decide(state: Dict[str, Any], devices: Tuple[str, ...]) -> Dict[str, Any]:
+        if not state.get('available'):
+            return {'enable': False, 'reason': '無法偵測音訊裝置', 'device': None}
+
+        description = state['description']
+        if not state['sink']:
+            return {'enable': False, 'reason': '沒有預設輸出裝置', 'device': None}
+
+        haystack = f"{state['sink']} {description}".lower()
+        for device in devices:
+            if device and device.lower() in haystack:
+                return {'enable': True, 'reason': f'偵測到您的裝置 {description}',
+                        'device': description}
+        if state['headphones']:
+            kind = '藍牙耳機' if state['bluetooth'] else '耳機'
+            return {'enable': True, 'reason': f'偵測到{kind} {description}', 'device': description}
+        return {'enable': False, 'reason': f'目前輸出為 {description}', 'device': description}
+
+    def _pactl(self, *args: str) -> str:
+        return subprocess.run([self.pactl, *args], capture_output=True, text=True, check=True,
+                              env=_PACTL_ENV, timeout=5).stdout
+
+    def _start_subscriber(self):
+        try:
+            self._subscriber = subprocess.Popen([self.pactl, 'subscribe'], stdout=subprocess.PIPE,
+                                                stderr=subprocess.DEVNULL, stdin=subprocess.DEVNULL,
+                                                text=True, env=_PACTL_ENV)
+        except OSError:
+            self._subscriber = None
+            return
+        threading.Thread(target=self._read_events, args=(self._subscriber,),
+                         name='audio-subscribe', daemon=True).start()
+
+    def _read_events(self, process: subprocess.Popen):
+        """讀取事件，例如 Event 'change' on sink #53"""
+        for line in process.stdout:
+            words = line.split()
+            if len(words) >= 4 and words[3] in WATCHED_FACILITIES:
+                self._changed.set()
+        process.stdout.close()
+        process.wait()
+
+        if self._closed:
+            return
+        # 音訊伺服器重新啟動等情況：稍後重新監聽並查詢
+        time.sleep(RESTART_DELAY)
+        if not self._closed:
+            self._start_subscriber()
+            self._changed.set()
+
+    def _refresh_loop(self):
+        while True:
+            self._changed.wait()
+            if self._closed:
+                return
+            time.sleep(DEBOUNCE_SECONDS)
+            self._changed.clear()
+            self.refresh()
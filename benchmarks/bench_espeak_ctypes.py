@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+比較行程內 libespeak-ng（ctypes）與 subprocess.run(['espeak', ...]) 的單句合成延遲
+
+兩邊都只合成不播放：ctypes 收集 PCM，espeak 命令以 --stdout 輸出 WAV
+
+用法:
+    python3 benchmarks/bench_espeak_ctypes.py [-n 次數] [--rate 語速] [--text 文字]
+"""
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+from pathlib import Path
+from typing import Callable, Dict, List
+
+# 添加工具路徑
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import espeak_lib
+from tts_backends import EspeakBackend
+
+DEFAULT_TEXTS = [
+    '小西已完成任務',
+    '快來看看！發現 Git 衝突，需要您決定如何處理',
+    'Build failed with 3 errors in src/main.rs'
+]
+
+
+def measure(synthesize: Callable[[str], object], texts: List[str], iterations: int) -> List[float]:
+    """回傳每句的耗時（毫秒）"""
+    synthesize(texts[0])  # 預熱
+    samples = []
+    for i in range(iterations):
+        text = texts[i % len(texts)]
+        start = time.perf_counter()
+        synthesize(text)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    return {
+        'mean': statistics.mean(ordered),
+        'p50': ordered[len(ordered) // 2],
+        'p95': ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))],
+        'min': ordered[0]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='libespeak-ng ctypes 與 espeak 子行程的合成延遲比較')
+    parser.add_argument('-n', '--iterations', type=int, default=50, help='每種方式合成的次數')
+    parser.add_argument('--rate', type=int, default=180, help='語速')
+    parser.add_argument('--text', action='append', help='要合成的文字（可重複指定）')
+    args = parser.parse_args()
+
+    texts = args.text or DEFAULT_TEXTS
+    library = espeak_lib.load()
+    espeak = EspeakBackend()
+
+    results = {}
+    if library is not None:
+        results['ctypes'] = summarize(measure(
+            lambda text: library.synthesize(text, args.rate), texts, args.iterations))
+    else:
+        print('⚠️ 找不到 libespeak-ng，略過 ctypes 測試')
+
+    if espeak.available():
+        binary = espeak.binary()
+        results['subprocess'] = summarize(measure(
+            lambda text: subprocess.run([binary, '-s', str(args.rate), '--stdout', text],
+                                        check=True, capture_output=True),
+            texts, args.iterations))
+    else:
+        print('⚠️ 找不到 espeak / espeak-ng 命令，略過子行程測試')
+
+    if not results:
+        return 1
+
+    print(f'⏱️ 單句合成延遲（{args.iterations} 次，毫秒）:')
+    print(f"  {'方式':<12}{'平均':>10}{'p50':>10}{'p95':>10}{'最快':>10}")
+    for name, stats in results.items():
+        print(f"  {name:<12}{stats['mean']:>10.2f}{stats['p50']:>10.2f}{stats['p95']:>10.2f}{stats['min']:>10.2f}")
+
+    if len(results) == 2:
+        speedup = results['subprocess']['mean'] / max(results['ctypes']['mean'], 1e-6)
+        print(f'  ctypes 平均快 {speedup:.1f} 倍')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+長訊息開始出聲前的等待時間（time-to-first-audio）
+
+在假環境中以 speak() 播放不同長度的訊息，比較整段合成（speech_chunking 停用）與分段合成：
+假的 espeak 合成到檔案的耗時與字數成正比（--synth-ms-per-char），假播放端（aplay）記錄開始播放的
+時間，播放時間也與字數成正比（--play-ms-per-char）。每種長度先清空語音快取量一次，
+分段模式再以同一段文字量一次「已快取」的情況。
+
+分段合成時第一段的長度有上限，開始出聲前的等待應不隨訊息變長而增加；
+整段合成時等待與訊息長度成正比。
+
+用法:
+    python3 benchmarks/bench_first_audio.py
+    python3 benchmarks/bench_first_audio.py --lengths 50 200 800 --synth-ms-per-char 2 --json
+"""
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from run_benchmarks import FakeEnv
+
+# 假的合成與播放端（-S 略過 site，縮短啟動時間）
+STUB = '''#!{python} -S
+import os, sys, time
+SINK = {sink!r}
+SYNTH_SECONDS_PER_CHAR = {synth!r}
+PLAY_SECONDS_PER_CHAR = {play!r}
+
+args = sys.argv[1:]
+if '-w' in args:
+    output = args[args.index('-w') + 1]
+    text = args[-1]
+    time.sleep(len(text) * SYNTH_SECONDS_PER_CHAR)
+    with open(output, 'wb') as f:
+        f.write(b'x' * max(1, len(text)))
+    sys.exit(0)
+
+path = args[-1]
+size = os.path.getsize(path) if os.path.exists(path) else 0
+fd = os.open(SINK, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+try:
+    os.write(fd, ('%.6f %d\\n' % (time.time(), size)).encode())
+finally:
+    os.close(fd)
+time.sleep(size * PLAY_SECONDS_PER_CHAR)
+'''
+
+# 組成測試訊息的句子（中英混合，含全形與半形標點）
+SENTENCES = [
+    '測試完成，共 120 個測試通過，3 個跳過。',
+    'Coverage went up to 87.5%, two points higher than last time. ',
+    '接下來要處理文件，以及 CI 設定的調整！',
+    '最後還有三個 issue 需要回覆：#12、#15 與 #20。',
+    'The staging deploy finished in 42 seconds; production is next. ',
+]
+
+
+def build_text(length: int) -> str:
+    text = ''
+    index = 0
+    while len(text) < length:
+        text += SENTENCES[index % len(SENTENCES)]
+        index += 1
+    return text[:length]
+
+
+def write_config(fake: FakeEnv, chunking: bool):
+    config = json.loads(fake.config_path.read_text(encoding='utf-8'))
+    config['speech_chunking'] = {'enabled': chunking}
+    fake.config_path.write_text(json.dumps(config, ensure_ascii=False, indent=2), encoding='utf-8')
+
+
+def speak_once(assistant, text: str, sink: Path) -> Dict[str, float]:
+    """播放一次，回傳開始出聲前的等待與總時間（毫秒）"""
+    if sink.exists():
+        sink.unlink()
+    started = time.time()
+    assistant.speak(text)
+    finished = time.time()
+    starts = [float(line.split()[0]) for line in sink.read_text().splitlines() if line.strip()]
+    return {
+        'first_audio_ms': round((min(starts) - started) * 1000, 1) if starts else None,
+        'total_ms': round((finished - started) * 1000, 1),
+        'clips': len(starts),
+    }
+
+
+def run(args) -> List[Dict[str, Any]]:
+    fake = FakeEnv('espeak', keep=args.keep)
+    sink = fake.root / 'sink.jsonl'
+    stub = STUB.format(python=sys.executable, sink=str(sink),
+                       synth=args.synth_ms_per_char / 1000, play=args.play_ms_per_char / 1000)
+    for name in ('espeak', 'espeak-ng', 'aplay', 'paplay'):
+        path = fake.bin_dir / name
+        path.write_text(stub, encoding='utf-8')
+        path.chmod(0o755)
+
+    rows = []
+    try:
+        fake.activate()
+        from voice_assistant import ClaudeVoiceAssistant
+
+        assistant = ClaudeVoiceAssistant(fake.config_path)
+        for chunking in (False, True):
+            write_config(fake, chunking)
+            for length in args.lengths:
+                text = build_text(length)
+                assistant._get_tts_cache().clear()
+                row = {'mode': 'chunked' if chunking else 'whole', 'chars': len(text),
+                       'cached': False}
+                row.update(speak_once(assistant, text, sink))
+                rows.append(row)
+                if chunking:
+                    row = {'mode': 'chunked', 'chars': len(text), 'cached': True}
+                    row.update(speak_once(assistant, text, sink))
+                    rows.append(row)
+    finally:
+        fake.cleanup()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='比較整段與分段合成的開始出聲等待時間')
+    parser.add_argument('--lengths', type=int, nargs='+', default=[40, 100, 200, 400, 800],
+                        help='訊息長度（字元數）')
+    parser.add_argument('--synth-ms-per-char', type=float, default=1.0,
+                        help='假合成每個字元的耗時（毫秒）')
+    parser.add_argument('--play-ms-per-char', type=float, default=0.5,
+                        help='假播放每個字元的耗時（毫秒）')
+    parser.add_argument('--json', action='store_true', help='以 JSON 輸出')
+    parser.add_argument('--keep', action='store_true', help='保留假環境目錄（除錯用）')
+    args = parser.parse_args()
+
+    rows = run(args)
+    if args.json:
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+        return
+
+    print(f"{'模式':<10}{'字數':>7}{'快取':>6}{'段數':>6}{'開始出聲 ms':>14}{'總時間 ms':>12}")
+    for row in rows:
+        first_audio = row['first_audio_ms']
+        print(f"{row['mode']:<10}{row['chars']:>7}{'是' if row['cached'] else '否':>5}"
+              f"{row['clips']:>6}{first_audio if first_audio is not None else '-':>14}"
+              f"{row['total_ms']:>12}")
+
+
+if __name__ == '__main__':
+    main()
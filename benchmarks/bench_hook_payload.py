@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+比較 hook payload 的讀取方式
+
+- 整份載入：json.load(stdin) 後取出工具輸出再分類（輸出有多大就佔多少記憶體，且會複製數份）
+- 串流解析：hook_payload.scan_stream，以固定大小的區塊讀取並逐塊分類
+
+每種情況在子行程中執行，回報耗時與峰值記憶體（ru_maxrss）。
+串流解析的峰值記憶體應該不隨輸出大小增加；開頭就有決定性錯誤時之後只讀取、不再解析。
+
+用法:
+    python3 benchmarks/bench_hook_payload.py [--sizes-mb 1 10 50]
+"""
+import os
+import sys
+import json
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+
+NOISE_LINE = 'tests/test_models.py::test_create PASSED  "ok" 中文輸出\n'
+FAILURE = 'E   AssertionError: assert 1 == 2\n'
+
+# 子行程：讀 stdin、分類，輸出 「context 秒數 峰值 KB」
+RUNNER = '''
+import sys, time, resource
+sys.path.insert(0, {repo!r})
+from result_classifier import ResultClassifier
+from voice_config import DEFAULT_CONFIG
+classifier = ResultClassifier(DEFAULT_CONFIG['result_rules'])
+start = time.perf_counter()
+if sys.argv[1] == 'stream':
+    from hook_payload import scan_stream, drain
+    match, _ = scan_stream(sys.stdin.buffer, classifier)
+    elapsed = time.perf_counter() - start
+    drain(sys.stdin.buffer)
+else:
+    import json
+    payload = json.load(sys.stdin)
+    output = payload['tool_response']['stdout']
+    match = classifier.classify(output)
+    if match:
+        ResultClassifier.snippet(output, match)
+    elapsed = time.perf_counter() - start
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(match.context if match else '-', elapsed, peak)
+'''
+
+
+def write_payload(path: str, size: int, failure_at: str):
+    """逐行寫出模擬的 PostToolUse payload，避免產生器本身佔用大量記憶體"""
+    lines = max(1, size // len(NOISE_LINE.encode('utf-8')))
+    encoded_line = json.dumps(NOISE_LINE, ensure_ascii=False)[1:-1]
+    encoded_failure = json.dumps(FAILURE)[1:-1]
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('{"session_id": "bench", "tool_name": "Bash", '
+                '"tool_input": {"command": "pytest"}, "tool_response": {"stdout": "')
+        if failure_at == 'head':
+            f.write(encoded_failure)
+        for _ in range(lines):
+            f.write(encoded_line)
+        if failure_at == 'tail':
+            f.write(encoded_failure)
+        f.write('", "stderr": "", "interrupted": false}}')
+
+
+def run(mode: str, path: str):
+    runner = RUNNER.format(repo=str(REPO_DIR))
+    with open(path, 'rb') as stdin:
+        result = subprocess.run([sys.executable, '-c', runner, mode], stdin=stdin,
+                                capture_output=True, text=True, check=True)
+    context, elapsed, peak_kb = result.stdout.split()
+    return context, float(elapsed) * 1000, int(peak_kb) / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description='hook payload 讀取方式比較')
+    parser.add_argument('--sizes-mb', type=float, nargs='+', default=[1, 10, 50],
+                        help='模擬工具輸出大小（MB）')
+    args = parser.parse_args()
+
+    print(f"  {'大小':>6}  {'情況':<8}{'整份載入 ms':>12}{'峰值 MB':>9}"
+          f"{'串流 ms':>10}{'峰值 MB':>9}  分類結果")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'payload.json')
+        for size_mb in args.sizes_mb:
+            for name, failure_at in (('沒有比對', None), ('開頭錯誤', 'head'), ('結尾錯誤', 'tail')):
+                write_payload(path, int(size_mb * 1024 * 1024), failure_at)
+                _, load_ms, load_peak = run('load', path)
+                context, stream_ms, stream_peak = run('stream', path)
+                print(f'  {size_mb:>4g}MB  {name:<8}{load_ms:>12.1f}{load_peak:>9.1f}'
+                      f'{stream_ms:>10.1f}{stream_peak:>9.1f}  {context}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+比較 tool_result_hook 的關鍵字偵測
+
+- 舊版：11 個關鍵字逐一搜尋，只分 urgent / gentle
+- 單一正規表示式：同一份規則表的所有關鍵字合成一個 alternation，整段只掃描一次
+- 分類器：ResultClassifier（先以錨點子字串過濾，依規則優先權以 str.find 探測，第一條比對到的規則即停止）
+
+以約 10 MB 的模擬工具輸出測試三種情況：沒有比對、開頭附近有錯誤、結尾才出現錯誤。
+沒有比對是最常見、也是每個關鍵字都得掃過整段的情況：分類器在此比單一正規表示式慢時以結束碼 1 結束
+（舊版只找 11 個關鍵字、不分情境，列出作為參考）。
+
+用法:
+    python3 benchmarks/bench_result_classifier.py [--size-mb 10] [--repeat 3]
+"""
+import re
+import sys
+import time
+import random
+import argparse
+from pathlib import Path
+from typing import Callable
+
+# 添加工具路徑
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from result_classifier import ResultClassifier
+from voice_config import DEFAULT_CONFIG
+
+NOISE_LINES = [
+    'tests/test_models.py::test_create PASSED',
+    'Compiling serde v1.0.188',
+    'collected 412 items',
+    'INFO  request handled in 12ms path=/api/v1/items status=200',
+    '   Downloading package metadata',
+    'added 17 packages, audited 1203 packages in 3s',
+    'src/components/Button.tsx: formatted'
+]
+
+
+def legacy_classify(tool_data: str):
+    """原本 hook 的做法：整段轉小寫後逐一搜尋每個關鍵字"""
+    error_keywords = ['error', 'failed', 'exception', 'timeout', '❌', '失敗']
+    help_keywords = ['需要', 'help', 'assist', '協助', '檢查']
+    tool_lower = tool_data.lower()
+    for keyword in error_keywords:
+        if keyword in tool_lower:
+            return 'urgent'
+    for keyword in help_keywords:
+        if keyword in tool_lower:
+            return 'gentle'
+    return None
+
+
+def build_single_regex(rules):
+    """所有關鍵字合成一個正規表示式，比對後查表得知規則（單次掃描的對照組）"""
+    ranks = {}
+    for rank, rule in enumerate(rules):
+        for keyword in rule['keywords']:
+            ranks.setdefault(keyword.lower(), rank)
+    regex = re.compile('|'.join(re.escape(keyword)
+                                for keyword in sorted(ranks, key=len, reverse=True)))
+
+    def classify(tool_data: str):
+        best = None
+        for match in regex.finditer(tool_data.lower()):
+            rank = ranks[match.group()]
+            if best is None or rank < best:
+                best = rank
+                if rank == 0:
+                    break
+        return None if best is None else rules[best]['context']
+
+    return classify
+
+
+def make_output(size: int, seed: int = 1) -> str:
+    rng = random.Random(seed)
+    lines = []
+    total = 0
+    while total < size:
+        line = rng.choice(NOISE_LINES)
+        lines.append(line)
+        total += len(line) + 1
+    return '\n'.join(lines)
+
+
+def best_time(func: Callable[[str], object], text: str, repeat: int) -> float:
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(text)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description='工具輸出關鍵字偵測效能比較')
+    parser.add_argument('--size-mb', type=float, default=10, help='模擬輸出大小（MB）')
+    parser.add_argument('--repeat', type=int, default=3, help='每種情況重複次數（取最快）')
+    args = parser.parse_args()
+
+    noise = make_output(int(args.size_mb * 1024 * 1024))
+    failure = '\nE   AssertionError: assert 1 == 2\n=========== FAILURES ===========\n'
+    cases = {
+        '沒有比對': noise,
+        '開頭有錯誤': failure + noise,
+        '結尾才有錯誤': noise + failure
+    }
+
+    build_start = time.perf_counter()
+    classifier = ResultClassifier(DEFAULT_CONFIG['result_rules'])
+    build_ms = (time.perf_counter() - build_start) * 1000
+
+    print(f'🔎 工具輸出分類（{args.size_mb:g} MB，規則 {len(classifier.rules)} 條，編譯 {build_ms:.2f} ms）')
+    single_regex = build_single_regex(DEFAULT_CONFIG['result_rules'])
+    print(f"  {'情況':<10}{'舊版 (ms)':>12}{'單一正規式 (ms)':>16}{'分類器 (ms)':>14}  分類結果")
+    timings = {}
+    for name, text in cases.items():
+        legacy_ms = best_time(legacy_classify, text, args.repeat)
+        regex_ms = best_time(single_regex, text, args.repeat)
+        classifier_ms = best_time(classifier.classify, text, args.repeat)
+        timings[name] = (regex_ms, classifier_ms)
+        match = classifier.classify(text)
+        print(f"  {name:<10}{legacy_ms:>12.1f}{regex_ms:>16.1f}{classifier_ms:>14.1f}  "
+              f"{match.context if match else '-'}")
+
+    regex_ms, classifier_ms = timings['沒有比對']
+    if classifier_ms > regex_ms:
+        print(f'❌ 沒有比對時分類器比單一正規表示式慢：{classifier_ms:.1f} ms > {regex_ms:.1f} ms')
+        return 1
+    print(f'✅ 沒有比對時分類器不比單一正規表示式慢：{classifier_ms:.1f} ms <= {regex_ms:.1f} ms')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
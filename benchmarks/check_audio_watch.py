@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+檢查音訊裝置監聽（AudioDeviceDetector(watch=True)）
+
+在 PATH 最前面放一個假的 pactl：`info` 與 `list sinks` 依狀態檔回報預設輸出（喇叭或藍牙耳機），
+`subscribe` 輸出事件檔中新增的行，讀到 EXIT 時結束（模擬音訊伺服器重新啟動）。依序確認：
+
+1. sink 的 change 事件會讓快取的預設輸出失效並重新查詢（喇叭 → 藍牙耳機）
+2. 不監聽的對象（sink-input）不會觸發重新查詢
+3. subscribe 行程結束後會重新監聽並查詢，之後的事件仍然有效
+
+任何一步沒有在時限內發生時以結束碼 1 結束。
+
+用法:
+    python3 benchmarks/check_audio_watch.py
+"""
+import os
+import sys
+import json
+import time
+import tempfile
+from pathlib import Path
+from typing import Callable
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR))
+
+SPEAKERS = 'alsa_output.pci-0000_00_1f.3.analog-stereo'
+HEADPHONES = 'bluez_sink.00_1B_66_AA_BB_CC.a2dp_sink'
+
+SINKS = f'''Sink #1
+\tState: RUNNING
+\tName: {SPEAKERS}
+\tDescription: Built-in Audio Analog Stereo
+\tProperties:
+\t\tdevice.form_factor = "internal"
+\tPorts:
+\t\tanalog-output-speaker: Speakers (type: Speaker, priority: 10000, available)
+\tActive Port: analog-output-speaker
+Sink #2
+\tState: SUSPENDED
+\tName: {HEADPHONES}
+\tDescription: WH-1000XM4
+\tProperties:
+\t\tdevice.bus = "bluetooth"
+\t\tdevice.form_factor = "headphone"
+\tPorts:
+\t\theadphone-output: Headphone (type: Headphones, priority: 0, available)
+\tActive Port: headphone-output
+'''
+
+# 假的 pactl（-S 略過 site，縮短啟動時間）
+FAKE_PACTL = '''#!{python} -S
+import os, sys, json, time
+ROOT = {root!r}
+args = sys.argv[1:]
+if args == ['info']:
+    with open(os.path.join(ROOT, 'state.json')) as f:
+        print('Server Name: PulseAudio (on PipeWire 1.0.5)')
+        print('Default Sink: ' + json.load(f)['default'])
+elif args == ['list', 'sinks']:
+    with open(os.path.join(ROOT, 'sinks.txt')) as f:
+        sys.stdout.write(f.read())
+elif args == ['subscribe']:
+    events = open(os.path.join(ROOT, 'events.txt'))
+    events.seek(0, 2)
+    # 開始讀取事件後才登記，檢查端看到登記後寫入的事件都不會漏掉
+    with open(os.path.join(ROOT, 'subscribers.log'), 'a') as log:
+        log.write('%d\\n' % os.getpid())
+    while True:
+        line = events.readline()
+        if not line:
+            time.sleep(0.02)
+            continue
+        if line.strip() == 'EXIT':
+            sys.exit(0)
+        sys.stdout.write(line)
+        sys.stdout.flush()
+else:
+    sys.exit(1)
+'''
+
+
+def wait_for(condition: Callable[[], bool], timeout: float = 5.0) -> bool:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return condition()
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        bin_dir = root / 'bin'
+        bin_dir.mkdir()
+        pactl = bin_dir / 'pactl'
+        pactl.write_text(FAKE_PACTL.format(python=sys.executable, root=str(root)), encoding='utf-8')
+        pactl.chmod(0o755)
+        (root / 'sinks.txt').write_text(SINKS, encoding='utf-8')
+        (root / 'events.txt').write_text('', encoding='utf-8')
+
+        def set_default(sink: str):
+            (root / 'state.json').write_text(json.dumps({'default': sink}), encoding='utf-8')
+
+        def emit(line: str):
+            with open(root / 'events.txt', 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+
+        def subscribers() -> int:
+            path = root / 'subscribers.log'
+            return len(path.read_text().split()) if path.exists() else 0
+
+        os.environ['PATH'] = f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}"
+        import audio_detector
+        # 縮短重新監聽的等待，讓檢查快一點
+        audio_detector.RESTART_DELAY = 0.2
+
+        set_default(SPEAKERS)
+        detector = audio_detector.AudioDeviceDetector(devices=[], watch=True)
+        failures = []
+
+        def check(name: str, ok: bool):
+            print(f"  {'✅' if ok else '❌'} {name}")
+            if not ok:
+                failures.append(name)
+
+        try:
+            check('啟動時查詢到喇叭', detector.state.get('sink') == SPEAKERS
+                  and not detector.should_enable_voice()['enable'])
+            check('subscribe 已啟動', wait_for(lambda: subscribers() == 1))
+
+            # 1. sink 變更：快取失效並重新查詢
+            probes = detector.probes
+            set_default(HEADPHONES)
+            emit("Event 'change' on server #-1")
+            emit("Event 'change' on sink #2")
+            check('sink 變更後改為藍牙耳機', wait_for(lambda: detector.state.get('sink') == HEADPHONES))
+            wait_for(lambda: detector.probes > probes)
+            time.sleep(audio_detector.DEBOUNCE_SECONDS * 2)
+            check('成串的事件只重新查詢一次', detector.probes == probes + 1)
+            check('耳機時啟用語音', detector.should_enable_voice()['enable'])
+
+            # 2. 不監聽的對象不觸發重新查詢
+            probes = detector.probes
+            set_default(SPEAKERS)
+            emit("Event 'new' on sink-input #71")
+            emit("Event 'change' on client #12")
+            time.sleep(audio_detector.DEBOUNCE_SECONDS * 3)
+            check('sink-input、client 事件不重新查詢', detector.probes == probes
+                  and detector.state.get('sink') == HEADPHONES)
+
+            # 3. subscribe 結束（音訊伺服器重新啟動）：重新監聽並查詢
+            emit('EXIT')
+            check('subscribe 結束後重新監聽', wait_for(lambda: subscribers() == 2))
+            check('重新監聽後重新查詢到喇叭', wait_for(lambda: detector.state.get('sink') == SPEAKERS))
+            set_default(HEADPHONES)
+            emit("Event 'change' on card #40")
+            check('重新監聽後的事件仍有效', wait_for(lambda: detector.state.get('sink') == HEADPHONES))
+        finally:
+            detector.close()
+
+    if failures:
+        print(f'❌ {len(failures)} 項檢查失敗')
+        return 1
+    print('✅ 音訊裝置監聽檢查通過')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+檢查串流解析 hook payload 時擷取的通知詳情
+
+模擬 350 KB 的 pytest 輸出：開頭就有決定性的錯誤（AssertionError），摘要與失敗的測試在最後。
+hook_payload.scan_stream 比對到決定性的規則後仍要擷取輸出結尾的重點行，
+結果必須與整份載入後對完整輸出呼叫 salient_lines.extract() 相同，否則以結束碼 1 結束。
+
+用法:
+    python3 benchmarks/check_hook_details.py [--size-kb 350]
+"""
+import io
+import sys
+import json
+import argparse
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR))
+
+from hook_payload import CHUNK_SIZE, scan_stream
+from result_classifier import ResultClassifier
+from salient_lines import extract
+from voice_config import DEFAULT_CONFIG
+
+HEAD = ('============================= test session starts ==============================\n'
+        'collected 2000 items\n\n'
+        'tests/test_models.py F\n\n'
+        '=================================== FAILURES ===================================\n'
+        '_________________________________ test_create __________________________________\n'
+        'E   AssertionError: assert 1 == 2\n')
+NOISE_LINE = 'tests/test_api.py::test_list_items[case-{:05d}] PASSED\n'
+SUMMARY = ('=========================== short test summary info ============================\n'
+           'FAILED tests/test_models.py::test_create - AssertionError: assert 1 == 2\n'
+           '========================= 1 failed, 1999 passed in 12.34s =========================\n')
+
+
+def build_output(size: int) -> str:
+    lines = [HEAD]
+    total = len(HEAD) + len(SUMMARY)
+    index = 0
+    while total < size:
+        line = NOISE_LINE.format(index)
+        lines.append(line)
+        total += len(line)
+        index += 1
+    lines.append(SUMMARY)
+    return ''.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='串流解析的通知詳情檢查')
+    parser.add_argument('--size-kb', type=int, default=350, help='模擬工具輸出大小（KB）')
+    args = parser.parse_args()
+
+    output = build_output(args.size_kb * 1024)
+    payload = json.dumps({'session_id': 'check', 'tool_name': 'Bash',
+                          'tool_input': {'command': 'pytest'},
+                          'tool_response': {'stdout': output, 'stderr': '', 'interrupted': False}})
+    assert len(payload) > CHUNK_SIZE, '輸出需要超過一個區塊'
+
+    classifier = ResultClassifier(DEFAULT_CONFIG['result_rules'])
+    expected_match = classifier.classify(output)
+    expected = extract(output, expected_match.context)
+    match, details = scan_stream(io.BytesIO(payload.encode('utf-8')), classifier)
+
+    print(f'輸出 {len(output) / 1024:.0f} KB，比對位置 {match.start if match else "-"}')
+    print(f'  預期: {expected}')
+    print(f'  串流: {details}')
+    if match is None or match.context != expected_match.context or details != expected:
+        print('❌ 串流解析擷取的詳情與完整輸出不同')
+        return 1
+    print('✅ 串流解析擷取的詳情與完整輸出相同')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
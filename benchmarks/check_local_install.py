@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+檢查專案本地安裝（.claude-voice）的匯入是否完整
+
+以 project_setup.copy_voice_files_to_project 把 CORE_FILES 複製到暫存的 .claude-voice，
+再解析安裝目錄中每個 .py 檔的 import（包含函式內延遲匯入的模組）：
+匯入的模組是本專案的模組時，安裝目錄中必須有對應的檔案。
+缺少的模組會讓本地安裝靜默退回較慢或功能較少的路徑（例如沒有 speech_queue 時不排佇列），
+有缺少時以結束碼 1 結束。
+
+用法:
+    python3 benchmarks/check_local_install.py
+"""
+import ast
+import sys
+import tempfile
+import contextlib
+import io
+from pathlib import Path
+from typing import Dict, List, Set
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO_DIR))
+
+from project_setup import copy_voice_files_to_project
+
+
+def imported_modules(path: Path) -> Set[str]:
+    """檔案中匯入的最上層模組名稱"""
+    tree = ast.parse(path.read_text(encoding='utf-8'), str(path))
+    modules = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            modules.update(alias.name.split('.')[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+            modules.add(node.module.split('.')[0])
+    return modules
+
+
+def missing_imports(install_dir: Path) -> Dict[str, List[str]]:
+    """{安裝目錄中的檔案: [缺少的本專案模組]}"""
+    local_modules = {path.stem for path in REPO_DIR.glob('*.py')}
+    missing = {}
+    for path in sorted(install_dir.glob('*.py')):
+        absent = sorted(module for module in imported_modules(path) & local_modules
+                        if not (install_dir / f'{module}.py').exists())
+        if absent:
+            missing[path.name] = absent
+    return missing
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        install_dir = Path(tmp) / '.claude-voice'
+        with contextlib.redirect_stdout(io.StringIO()):
+            copy_voice_files_to_project(REPO_DIR, install_dir)
+        installed = sorted(path.name for path in install_dir.glob('*.py'))
+        missing = missing_imports(install_dir)
+
+    print(f'📦 本地安裝 {len(installed)} 個模組')
+    if missing:
+        for name, modules in missing.items():
+            print(f"  ❌ {name} 匯入了未安裝的模組: {', '.join(modules)}")
+        print('❌ 請把缺少的模組加入 project_setup.CORE_FILES')
+        return 1
+    print('✅ 本地安裝的模組匯入的本專案模組都在安裝目錄中')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+檢查 claude_notify.py 常用路徑的匯入成本
+
+以 python -X importtime 執行 claude_notify.py，並由本腳本扮演 daemon 回覆「已排入佇列」，
+統計直譯器啟動以外額外匯入的模組時間。超過預算或匯入了重量級模組時以結束碼 1 結束，
+可放進 CI 或提交前檢查。
+
+用法:
+    python3 benchmarks/check_notify_importtime.py [--budget-ms 25] [--runs 5]
+"""
+import os
+import sys
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+from pathlib import Path
+from typing import Dict, Tuple
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+
+# 常用路徑不應該匯入的模組
+FORBIDDEN_MODULES = ['voice_assistant', 'json', 're', 'typing', 'argparse',
+                     'platform', 'datetime', 'subprocess', 'pathlib']
+
+
+def serve_fake_daemon(socket_path: str) -> socket.socket:
+    """對每個連線回覆已排入佇列"""
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path)
+    server.listen(8)
+
+    def run():
+        while True:
+            try:
+                conn, _ = server.accept()
+            except OSError:
+                return
+            with conn:
+                conn.recv(65536)
+                conn.sendall(b'{"ok": true, "queued": true, "depth": 1}\n')
+
+    threading.Thread(target=run, daemon=True).start()
+    return server
+
+
+def import_times(args, env: Dict[str, str], cwd: str) -> Tuple[Dict[str, int], str]:
+    """執行命令並回傳 {模組: 自身匯入時間 µs} 與 stdout"""
+    result = subprocess.run([sys.executable, '-X', 'importtime'] + args, env=env, cwd=cwd,
+                            capture_output=True, text=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        times[name.strip()] = int(self_us)
+    return times, result.stdout
+
+
+def main():
+    parser = argparse.ArgumentParser(description='檢查 claude_notify.py 常用路徑的匯入時間預算')
+    parser.add_argument('--budget-ms', type=float, default=25.0, help='額外匯入時間上限（毫秒）')
+    parser.add_argument('--runs', type=int, default=5, help='執行次數（取最小值以降低雜訊）')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as state_dir:
+        socket_path = os.path.join(state_dir, 'daemon.sock')
+        server = serve_fake_daemon(socket_path)
+        env = dict(os.environ, CLAUDE_VOICE_STATE_DIR=state_dir, CLAUDE_VOICE_SOCKET=socket_path)
+
+        best_total = None
+        best_extra = None
+        for _ in range(max(1, args.runs)):
+            baseline, _ = import_times(['-c', 'pass'], env, state_dir)
+            times, output = import_times([str(REPO_DIR / 'claude_notify.py'), '匯入時間檢查'],
+                                         env, state_dir)
+            if '排入 daemon' not in output:
+                print(f'❌ 沒有走到 daemon 路徑:\n{output}')
+                return 1
+            extra = {name: us for name, us in times.items() if name not in baseline}
+            total = sum(extra.values())
+            if best_total is None or total < best_total:
+                best_total, best_extra = total, extra
+        server.close()
+
+    forbidden = [name for name in FORBIDDEN_MODULES if name in best_extra]
+    total_ms = best_total / 1000
+
+    print(f'⏱️ claude_notify.py 常用路徑額外匯入: {total_ms:.2f} ms（預算 {args.budget_ms:.2f} ms）')
+    for name, us in sorted(best_extra.items(), key=lambda item: -item[1])[:10]:
+        print(f'  {us / 1000:>7.2f} ms  {name}')
+
+    if forbidden:
+        print(f"❌ 常用路徑匯入了不應匯入的模組: {', '.join(forbidden)}")
+        return 1
+    if total_ms > args.budget_ms:
+        print('❌ 超過匯入時間預算')
+        return 1
+    print('✅ 在預算內')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+"""
+多會話負載產生器
+
+模擬 N 個同時進行的 Claude Code 會話：每個會話先觸發 session-start hook，之後反覆
+「user-prompt-submit → 數次 tool-result（輸出大小依 --payload-kb 抽樣，部分為失敗的測試輸出）」，
+偶爾以 claude_notify.py 發出通知。執行的是真正的 hook 腳本與通知工具，只有語音輸出換成假的播放端：
+
+- 假播放端（aplay、paplay、afplay，以及直接朗讀的 espeak / say）把每段播放的開始與結束時間
+  附加到 sink.jsonl，播放時間固定為 --play-ms；合成到檔案（espeak -w）花費 --synth-ms
+- 沒有 --daemon 時每個 hook 行程自己播放（目前沒有 daemon 時的行為）；--daemon 先在假環境
+  啟動語音 daemon，hook 只送出請求
+
+報告:
+- 各種 hook 的次數、每秒處理量、延遲 p50 / p95 / p99、失敗次數
+- 每則通知從 hook 到開始播放的延遲（追蹤記錄，見 voice_trace），以及被合併、
+  沒有播放（丟棄、過期）的則數
+- 播放重疊：同時播放的段數上限與重疊的段數
+- 檔案鎖競爭：需要等待 config / projects / instances.db 鎖的次數與等待時間（lock_wait 統計）
+
+用法:
+    python3 benchmarks/load_generator.py --sessions 16 --duration 30
+    python3 benchmarks/load_generator.py --sessions 32 --daemon --failure-rate 0.3 -o load.json
+"""
+import sys
+import json
+import time
+import random
+import argparse
+import threading
+import subprocess
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from run_benchmarks import FakeEnv
+
+# 假播放端：記錄每段播放的開始與結束（-S 略過 site，縮短啟動時間）
+SINK_STUB = '''#!{python} -S
+import os, sys, time
+SINK = {sink!r}
+PLAY_SECONDS = {play_seconds!r}
+SYNTH_SECONDS = {synth_seconds!r}
+name = os.path.basename(sys.argv[0])
+
+
+def log(event, what):
+    what = what.replace('\\\\', '/').replace('"', "'")[:80]
+    line = '{{"event": "%s", "ts": %.6f, "pid": %d, "player": "%s", "what": "%s"}}\\n' % (
+        event, time.time(), os.getpid(), name, what)
+    fd = os.open(SINK, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+    try:
+        os.write(fd, line.encode('utf-8'))
+    finally:
+        os.close(fd)
+
+
+def play(what):
+    log('start', what)
+    time.sleep(PLAY_SECONDS)
+    log('end', what)
+
+
+args = sys.argv[1:]
+output = None
+texts = []
+index = 0
+while index < len(args):
+    arg = args[index]
+    if arg in ('-w', '-o', '--stdout-file'):
+        output = args[index + 1]
+        index += 1
+    elif arg in ('-s', '-v', '-r', '-p', '-a', '-g'):
+        index += 1
+    elif arg == '-':
+        texts.append('(stdin)')
+        sys.stdin.buffer.read()
+    elif not arg.startswith('-'):
+        texts.append(arg)
+    index += 1
+
+if output:
+    time.sleep(SYNTH_SECONDS)
+    with open(output, 'wb') as f:
+        f.write(b'RIFF$\\x00\\x00\\x00WAVE')
+elif texts:
+    play(os.path.basename(texts[-1]))
+else:
+    # 常駐模式：每行一段
+    for line in sys.stdin:
+        play(line.strip())
+'''
+
+NOOP_STUB = '''#!/bin/sh
+exit 0
+'''
+
+PASSED_LINE = 'tests/test_service.py::test_case_{n} PASSED                     [ {p}%]\n'
+FAILED_LINES = [
+    'FAILED tests/test_service.py::test_create_{n} - AssertionError: assert 404 == 200\n',
+    'E   ModuleNotFoundError: No module named "service_{n}"\n',
+    'error: build failed with 3 errors in src/module_{n}.rs\n',
+]
+
+HOOKS = ('session_start', 'user_submit', 'tool_result', 'notify')
+
+
+def make_payload(size: int, failing: bool, rng: random.Random) -> bytes:
+    """模擬 PostToolUse payload，工具輸出約 size bytes，失敗時結尾是失敗訊息"""
+    lines = []
+    total = 0
+    n = 0
+    while total < size:
+        line = PASSED_LINE.format(n=n, p=min(99, n % 100))
+        lines.append(line)
+        total += len(line)
+        n += 1
+    if failing:
+        lines.append(rng.choice(FAILED_LINES).format(n=rng.randrange(1000)))
+    payload = {
+        'session_id': f'load-{rng.randrange(1 << 30):x}',
+        'tool_name': 'Bash',
+        'tool_input': {'command': 'pytest -q'},
+        'tool_response': {'stdout': ''.join(lines)},
+    }
+    return json.dumps(payload, ensure_ascii=False).encode('utf-8')
+
+
+class Session(threading.Thread):
+    """一個 Claude Code 會話：依設定的間隔觸發 hook"""
+
+    def __init__(self, index: int, fake: FakeEnv, args, stop_at: float, results: List[Dict]):
+        super().__init__(name=f'session-{index}', daemon=True)
+        self.fake = fake
+        self.args = args
+        self.stop_at = stop_at
+        self.results = results
+        self.rng = random.Random(args.seed * 1000 + index)
+        self.project_dir = fake.root / 'projects' / f'session-{index:03d}'
+        self.project_dir.mkdir(parents=True, exist_ok=True)
+        self.env = fake.env()
+        self.python = sys.executable
+        self.hooks_dir = fake.voice_dir / 'hooks'
+
+    def fire(self, hook: str, argv: List[str], stdin: Optional[bytes] = None,
+             expect_speech: bool = False):
+        started = time.time()
+        try:
+            result = subprocess.run(argv, input=stdin, env=self.env, cwd=str(self.project_dir),
+                                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                    timeout=self.args.hook_timeout)
+            ok = result.returncode == 0
+        except subprocess.TimeoutExpired:
+            ok = False
+        self.results.append({'hook': hook, 'started': started, 'seconds': time.time() - started,
+                             'ok': ok, 'expect_speech': expect_speech})
+
+    def pause(self, mean: float):
+        if mean > 0:
+            time.sleep(min(self.rng.expovariate(1 / mean), max(0.0, self.stop_at - time.time())))
+
+    def run(self):
+        args = self.args
+        # 會話開始的時間錯開
+        time.sleep(self.rng.uniform(0, args.prompt_interval))
+        # session-start hook 只把通知交給 daemon，沒有 daemon 時不發聲
+        self.fire('session_start', [self.python, str(self.hooks_dir / 'session_start_hook.py'),
+                                    str(self.project_dir)], expect_speech=args.daemon)
+        while time.time() < self.stop_at:
+            self.fire('user_submit', [self.python, str(self.hooks_dir / 'user_submit_hook.py')])
+            for _ in range(args.tools_per_prompt):
+                if time.time() >= self.stop_at:
+                    break
+                failing = self.rng.random() < args.failure_rate
+                size = int(self.rng.choice(args.payload_kb) * 1024)
+                self.fire('tool_result', [self.python, str(self.hooks_dir / 'tool_result_hook.py')],
+                          make_payload(size, failing, self.rng), expect_speech=failing)
+                self.pause(args.tool_interval)
+            if self.rng.random() < args.notify_rate:
+                self.fire('notify', [self.python, str(self.fake.voice_dir / 'claude_notify.py'),
+                                     f'{self.project_dir.name} 需要您確認', 'gentle'],
+                          expect_speech=True)
+            self.pause(args.prompt_interval)
+
+
+def start_daemon(fake: FakeEnv) -> subprocess.Popen:
+    process = subprocess.Popen([sys.executable, str(fake.voice_dir / 'voice_daemon.py'), 'run'],
+                               env=fake.env(), cwd=str(fake.root),
+                               stdout=open(fake.root / 'daemon.log', 'w'), stderr=subprocess.STDOUT)
+    from voice_client import daemon_available
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        if daemon_available():
+            return process
+        time.sleep(0.05)
+    process.kill()
+    raise RuntimeError(f'daemon 沒有啟動，見 {fake.root / "daemon.log"}')
+
+
+def wait_for_daemon_idle(timeout: float) -> Optional[Dict[str, Any]]:
+    """等 daemon 的工作佇列與語音佇列清空，回傳最後的狀態"""
+    from voice_client import send_request
+    deadline = time.time() + timeout
+    status = None
+    while time.time() < deadline:
+        status = send_request({'cmd': 'status'})
+        if status is None:
+            return None
+        queue = status.get('speech_queue', {})
+        if not status.get('pending') and not queue.get('depth') and not queue.get('playing'):
+            return status
+        time.sleep(0.2)
+    return status
+
+
+def latency_summary(values: List[float]) -> Dict[str, Any]:
+    from voice_metrics import percentile
+
+    values = sorted(values)
+    if not values:
+        return {'count': 0}
+    return {
+        'count': len(values),
+        'p50_ms': round(percentile(values, 0.50) * 1000, 1),
+        'p95_ms': round(percentile(values, 0.95) * 1000, 1),
+        'p99_ms': round(percentile(values, 0.99) * 1000, 1),
+        'max_ms': round(values[-1] * 1000, 1),
+    }
+
+
+def analyze_sink(path: Path) -> Dict[str, Any]:
+    """由假播放端的記錄算出播放段數、重疊段數與最大同時播放數"""
+    intervals = []
+    open_starts: Dict[int, List[float]] = {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record['event'] == 'start':
+                    open_starts.setdefault(record['pid'], []).append(record['ts'])
+                elif open_starts.get(record['pid']):
+                    intervals.append((open_starts[record['pid']].pop(0), record['ts']))
+    except OSError:
+        pass
+
+    events = sorted([(start, 1) for start, _ in intervals] + [(end, -1) for _, end in intervals])
+    active = max_active = overlapping = 0
+    for _, delta in events:
+        if delta > 0 and active > 0:
+            overlapping += 1
+        active += delta
+        max_active = max(max_active, active)
+    unfinished = sum(len(starts) for starts in open_starts.values())
+    return {'utterances': len(intervals), 'unfinished': unfinished,
+            'overlapping': overlapping, 'max_concurrent': max_active}
+
+
+def analyze_traces() -> Dict[str, Any]:
+    """每則通知從 hook 到開始播放的延遲與結果"""
+    from voice_trace import read_traces
+
+    outcomes = {'spoken': 0, 'coalesced': 0, 'not_spoken': 0, 'undelivered': 0}
+    to_audio = []
+    for trace in read_traces(recent=None):
+        hops = {record['hop']: record['ts'] for record in trace['hops']}
+        origin = hops.get('hook', hops.get('cli'))
+        if origin is None:
+            continue
+        if 'audio_start' in hops:
+            outcomes['spoken'] += 1
+            to_audio.append(hops['audio_start'] - origin)
+        elif 'coalesced' in hops:
+            outcomes['coalesced'] += 1
+        elif 'notify_start' in hops:
+            outcomes['not_spoken'] += 1
+        else:
+            # 沒有送到 daemon 也沒有在行程內處理（例如沒有 daemon 時的 session-start）
+            outcomes['undelivered'] += 1
+    return {'outcomes': outcomes, 'hook_to_audio': latency_summary(to_audio)}
+
+
+def analyze_locks() -> Dict[str, Any]:
+    """lock_wait 統計（只有需要等待時才有記錄）"""
+    from voice_metrics import read_log, summarize
+
+    rows = summarize(record for record in read_log(recent=None) if record.get('stage') == 'lock_wait')
+    return {row['backend']: {'waits': row['count'], 'p50_ms': round(row['p50_ms'], 1),
+                             'p95_ms': round(row['p95_ms'], 1), 'max_ms': round(row['max_ms'], 1)}
+            for row in rows}
+
+
+def print_report(report: Dict[str, Any]):
+    settings = report['settings']
+    print(f"\n🚦 {settings['sessions']} 個會話 × {settings['duration']} 秒"
+          f"（{'daemon' if settings['daemon'] else '無 daemon'}，後端 {settings['backend']}）")
+    print(f"\n{'hook':<16}{'次數':>7}{'每秒':>8}{'失敗':>6}{'p50 ms':>10}{'p95 ms':>10}"
+          f"{'p99 ms':>10}{'最長 ms':>10}")
+    for hook, row in report['hooks'].items():
+        if not row['count']:
+            continue
+        print(f"{hook:<16}{row['count']:>7}{row['per_second']:>8.1f}{row['failed']:>6}"
+              f"{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}{row['p99_ms']:>10.1f}{row['max_ms']:>10.1f}")
+
+    speech = report['speech']
+    outcomes = speech['traces']['outcomes']
+    undelivered = f"（另有 {outcomes['undelivered']} 則未送達）" if outcomes['undelivered'] else ''
+    print(f"\n🔊 預期播放 {speech['expected']} 則：播放 {outcomes['spoken']}，"
+          f"合併 {outcomes['coalesced']}，沒有播放 {outcomes['not_spoken']}{undelivered}")
+    latency = speech['traces']['hook_to_audio']
+    if latency.get('count'):
+        print(f"   hook → 開始播放: p50 {latency['p50_ms']} ms, p95 {latency['p95_ms']} ms, "
+              f"p99 {latency['p99_ms']} ms, 最長 {latency['max_ms']} ms")
+    sink = speech['sink']
+    print(f"   播放端: {sink['utterances']} 段，重疊 {sink['overlapping']} 段，"
+          f"最多同時 {sink['max_concurrent']} 段，未播完 {sink['unfinished']} 段")
+    queue = speech.get('daemon_queue')
+    if queue:
+        print(f"   daemon 佇列: 丟棄 {queue.get('dropped', 0)}，過期 {queue.get('expired', 0)}，"
+              f"合併 {queue.get('merged', 0)}，被打斷 {queue.get('preempted', 0)}，"
+              f"等待 p95 {queue.get('wait_ms_p95', 0)} ms")
+
+    locks = report['locks']
+    print('\n🔒 檔案鎖競爭:' + ('' if locks else ' 沒有需要等待的情況'))
+    for name, row in locks.items():
+        print(f"   {name:<14} 等待 {row['waits']} 次，p50 {row['p50_ms']} ms，"
+              f"p95 {row['p95_ms']} ms，最長 {row['max_ms']} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='多會話 hook 與通知的負載產生器')
+    parser.add_argument('--sessions', type=int, default=8, help='同時進行的會話數')
+    parser.add_argument('--duration', type=float, default=30, help='產生負載的秒數')
+    parser.add_argument('--prompt-interval', type=float, default=5.0,
+                        help='每個會話兩次提問之間的平均秒數')
+    parser.add_argument('--tools-per-prompt', type=int, default=4, help='每次提問觸發的工具數')
+    parser.add_argument('--tool-interval', type=float, default=0.5, help='工具之間的平均秒數')
+    parser.add_argument('--failure-rate', type=float, default=0.2, help='工具輸出為失敗的比例')
+    parser.add_argument('--notify-rate', type=float, default=0.1,
+                        help='每次提問後以 claude_notify.py 發出通知的機率')
+    parser.add_argument('--payload-kb', type=float, nargs='+', default=[1, 8, 64, 512],
+                        help='工具輸出大小（KB），每次隨機抽一個')
+    parser.add_argument('--play-ms', type=float, default=300, help='假播放端每段的播放時間')
+    parser.add_argument('--synth-ms', type=float, default=20, help='假合成（espeak -w）的耗時')
+    parser.add_argument('--backend', default='espeak', choices=['espeak', 'espeak-persistent', 'say'])
+    parser.add_argument('--daemon', action='store_true', help='先啟動語音 daemon')
+    parser.add_argument('--hook-timeout', type=float, default=60, help='單一 hook 的逾時秒數')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', '-o', help='報告寫入的 JSON 檔')
+    parser.add_argument('--keep', action='store_true', help='保留假環境目錄（除錯用）')
+    args = parser.parse_args()
+
+    stub_settings = {'python': sys.executable, 'play_seconds': args.play_ms / 1000,
+                     'synth_seconds': args.synth_ms / 1000}
+    # 播放端替身要寫入假環境內的 sink 路徑，建立假環境後再寫入
+    fake = FakeEnv(args.backend, keep=args.keep,
+                   stubs={'osascript': NOOP_STUB, 'terminal-notifier': NOOP_STUB},
+                   config_overrides={'coalesce': {'enabled': True}})
+    sink_path = fake.root / 'sink.jsonl'
+    sink_stub = SINK_STUB.format(sink=str(sink_path), **stub_settings)
+    for name in ('say', 'espeak', 'espeak-ng', 'aplay', 'paplay', 'afplay'):
+        stub = fake.bin_dir / name
+        stub.write_text(sink_stub, encoding='utf-8')
+        stub.chmod(0o755)
+
+    daemon = None
+    try:
+        fake.activate()
+        if args.daemon:
+            daemon = start_daemon(fake)
+
+        results: List[Dict[str, Any]] = []
+        started = time.time()
+        sessions = [Session(index, fake, args, started + args.duration, results)
+                    for index in range(args.sessions)]
+        print(f"🚀 {args.sessions} 個會話，{args.duration:.0f} 秒（假環境: {fake.root}）",
+              file=sys.stderr)
+        for session in sessions:
+            session.start()
+        for session in sessions:
+            session.join()
+        elapsed = time.time() - started
+
+        # 沒有 daemon 時 hook 行程會等播放結束才返回，不需另外等待
+        daemon_status = wait_for_daemon_idle(timeout=120) if daemon is not None else None
+
+        hooks = {}
+        for hook in HOOKS:
+            rows = [row for row in results if row['hook'] == hook]
+            summary = latency_summary([row['seconds'] for row in rows])
+            summary.update(count=len(rows), failed=sum(1 for row in rows if not row['ok']),
+                           per_second=round(len(rows) / elapsed, 2))
+            hooks[hook] = summary
+
+        report = {
+            'settings': {key: value for key, value in vars(args).items()
+                         if key not in ('output', 'keep')},
+            'elapsed': round(elapsed, 2),
+            'hooks': hooks,
+            'speech': {
+                'expected': sum(1 for row in results if row['expect_speech']),
+                'traces': analyze_traces(),
+                'sink': analyze_sink(sink_path),
+                'daemon_queue': (daemon_status or {}).get('speech_queue'),
+            },
+            'locks': analyze_locks(),
+        }
+    finally:
+        if daemon is not None:
+            daemon.terminate()
+            try:
+                daemon.wait(10)
+            except subprocess.TimeoutExpired:
+                daemon.kill()
+        fake.cleanup()
+
+    print_report(report)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 報告已寫入 {args.output}")
+
+
+if __name__ == '__main__':
+    main()
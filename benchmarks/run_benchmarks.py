@@ -0,0 +1,466 @@
+#!/usr/bin/env python3
+"""
+通知路徑的微基準測試
+
+在暫存目錄建立假環境後執行，不需要音效卡，也不會動到實際的設定檔與狀態目錄：
+- bin/：say、espeak、espeak-ng、osascript、terminal-notifier、aplay、paplay、afplay 的替身，
+  立即結束（合成命令寫出一個很小的 WAV 檔），放在 PATH 最前面
+- voice/：語音助理原始碼的複本與基準測試用的 config.json（full 模式、關閉合併重複通知）
+- state/、home/、project/：CLAUDE_VOICE_STATE_DIR、HOME 與 hook 的工作目錄
+
+測量項目:
+    construct               ClaudeVoiceAssistant() 建構
+    load_config / _cold     load_config()（快照命中 / 設定檔剛變更）
+    notify:emotion=… / notify:context=…   各情緒、各情境的 notify()（排入語音佇列為止）
+    say                     say()
+    hook:…                  hooks/ 下的 hook 腳本與 claude_notify.py（子行程，沒有 daemon）
+    cli:…                   voice_assistant.py 各子命令的啟動到結束（子行程）
+    python_startup          空的直譯器啟動，子行程項目的下限
+
+結果以 JSON 輸出，可與前一次提交的結果比較，p50 變慢超過門檻時以結束碼 1 結束。
+
+用法:
+    python3 benchmarks/run_benchmarks.py -o before.json
+    python3 benchmarks/run_benchmarks.py -o after.json --baseline before.json [--threshold 0.25]
+    python3 benchmarks/run_benchmarks.py --filter notify --runs 50
+"""
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import subprocess
+from contextlib import redirect_stdout
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+
+# 每個項目的重複次數（子行程項目較慢，另外設定）
+DEFAULT_RUNS = 20
+DEFAULT_CLI_RUNS = 5
+
+# p50 變慢超過此比例，且差距超過 MIN_DELTA_MS 才算退步（避免微秒級的項目因雜訊誤報）
+DEFAULT_THRESHOLD = 0.25
+MIN_DELTA_MS = 1.0
+
+# 替身命令：合成命令遇到輸出檔參數時寫出最小的 WAV，常駐模式（沒有文字參數）讀完 stdin 才結束
+_WAV_STUB = '''#!/bin/sh
+out=""; text=0
+while [ $# -gt 0 ]; do
+  case "$1" in
+    -w|-o|--stdout-file) out="$2"; shift ;;
+    -s|-v|-r|-p|-a|-g) shift ;;
+    -*) ;;
+    *) text=1 ;;
+  esac
+  shift
+done
+if [ -n "$out" ]; then
+  printf 'RIFF\\044\\000\\000\\000WAVE' > "$out"
+elif [ $text -eq 0 ]; then
+  cat > /dev/null
+fi
+exit 0
+'''
+
+_PLAYER_STUB = '''#!/bin/sh
+# 從 stdin 播放時讀完輸入
+for arg in "$@"; do [ "$arg" = "-" ] && cat > /dev/null; done
+exit 0
+'''
+
+_NOOP_STUB = '''#!/bin/sh
+exit 0
+'''
+
+STUBS = {
+    'say': _WAV_STUB,
+    'espeak': _WAV_STUB,
+    'espeak-ng': _WAV_STUB,
+    'aplay': _PLAYER_STUB,
+    'paplay': _PLAYER_STUB,
+    'afplay': _PLAYER_STUB,
+    'osascript': _NOOP_STUB,
+    'terminal-notifier': _NOOP_STUB,
+}
+
+# 基準測試用設定：每次都走完整路徑（不合併重複通知、不偵測耳機）
+BENCH_CONFIG = {
+    'mode': 'full',
+    'voice_enabled': True,
+    'auto_detect_audio': False,
+    'coalesce': {'enabled': False},
+    'prerender': {'auto': False},
+}
+
+# voice_assistant.py 子命令（名稱、參數）
+CLI_COMMANDS = [
+    ('--help', ['--help']),
+    ('notify', ['notify', '建置完成', '--emotion', 'excited', '--details', '共 12 個步驟']),
+    ('blocked', ['blocked', 'urgent']),
+    ('help', ['help']),
+    ('completed', ['completed']),
+    ('error', ['error', 'ImportError: No module named foo']),
+    ('git-conflict', ['git-conflict']),
+    ('test-failed', ['test-failed', '3 個測試失敗']),
+    ('build-error', ['build-error']),
+    ('review', ['review']),
+    ('say', ['say', '你好，這是基準測試']),
+    ('talk', ['talk', '測試']),
+    ('test', ['test']),
+    ('mode', ['mode']),
+    ('config', ['config', '--show']),
+    ('cache', ['cache']),
+    ('queue', ['queue']),
+    ('stats', ['stats']),
+    ('trace', ['trace']),
+    ('prerender', ['prerender', '--workers', '1']),
+]
+
+# 需要鍵盤、麥克風或互動式對話框，無法在無頭環境測量的子命令
+SKIPPED_COMMANDS = {
+    'hotkey': '需要鍵盤監聽',
+    'chat': '互動式對話',
+    'listen': '需要麥克風或對話框',
+    'test-notification': 'macOS 互動式通知',
+}
+
+TOOL_FAILURE_PAYLOAD = {
+    'session_id': 'bench', 'tool_name': 'Bash', 'tool_input': {'command': 'pytest -q'},
+    'tool_response': {'stdout': 'tests/test_api.py::test_list PASSED\n' * 200
+                      + 'FAILED tests/test_api.py::test_create - AssertionError: assert 1 == 2\n'
+                      + '1 failed, 200 passed in 3.21s\n'},
+}
+
+TOOL_SUCCESS_PAYLOAD = {
+    'session_id': 'bench', 'tool_name': 'Read', 'tool_input': {'file_path': 'README.md'},
+    'tool_response': {'stdout': '# 專案說明\n' + '一般的檔案內容，沒有任何錯誤。\n' * 400},
+}
+
+
+class FakeEnv:
+    """暫存目錄中的假環境（替身命令、原始碼複本、狀態目錄）"""
+
+    def __init__(self, backend: str = 'espeak', keep: bool = False,
+                 stubs: Optional[Dict[str, str]] = None,
+                 config_overrides: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            stubs: 替身命令 {名稱: 腳本內容}，預設為 STUBS
+            config_overrides: 額外寫入 config.json 的設定（覆寫 BENCH_CONFIG）
+        """
+        self.root = Path(tempfile.mkdtemp(prefix='voice-bench-'))
+        self.keep = keep
+        self.bin_dir = self.root / 'bin'
+        self.voice_dir = self.root / 'voice'
+        self.state_dir = self.root / 'state'
+        self.home_dir = self.root / 'home'
+        self.project_dir = self.root / 'project'
+        for path in (self.bin_dir, self.voice_dir / 'hooks', self.state_dir, self.home_dir,
+                     self.project_dir):
+            path.mkdir(parents=True, exist_ok=True)
+
+        for name, script in (stubs or STUBS).items():
+            stub = self.bin_dir / name
+            stub.write_text(script, encoding='utf-8')
+            stub.chmod(0o755)
+
+        for source in REPO_DIR.glob('*.py'):
+            shutil.copy2(source, self.voice_dir / source.name)
+        for source in (REPO_DIR / 'hooks').glob('*.py'):
+            shutil.copy2(source, self.voice_dir / 'hooks' / source.name)
+        template = REPO_DIR / 'claude_md_template.md'
+        if template.exists():
+            shutil.copy2(template, self.voice_dir / template.name)
+
+        self.config_path = self.voice_dir / 'config.json'
+        config = dict(BENCH_CONFIG, tts_backend=backend)
+        config.update(config_overrides or {})
+        self.config_path.write_text(json.dumps(config, ensure_ascii=False, indent=2),
+                                    encoding='utf-8')
+
+    def env(self) -> Dict[str, str]:
+        env = dict(os.environ)
+        env.update({
+            'PATH': f"{self.bin_dir}{os.pathsep}{env.get('PATH', '')}",
+            'HOME': str(self.home_dir),
+            'CLAUDE_VOICE_STATE_DIR': str(self.state_dir),
+            'PYTHONDONTWRITEBYTECODE': '1',
+        })
+        # 不可連到實際的 daemon，也不沿用外部的追蹤 ID
+        env.pop('CLAUDE_VOICE_SOCKET', None)
+        env.pop('CLAUDE_VOICE_TRACE_ID', None)
+        return env
+
+    def activate(self):
+        """讓本行程使用假環境（必須在匯入語音助理模組之前）"""
+        os.environ.clear()
+        os.environ.update(self.env())
+        sys.path.insert(0, str(self.voice_dir))
+
+    def cleanup(self):
+        if not self.keep:
+            shutil.rmtree(self.root, ignore_errors=True)
+
+
+def summarize(samples: List[float]) -> Dict[str, Any]:
+    from voice_metrics import percentile
+
+    values = sorted(sample * 1000 for sample in samples)
+    return {
+        'runs': len(values),
+        'mean_ms': round(sum(values) / len(values), 3),
+        'p50_ms': round(percentile(values, 0.50), 3),
+        'p95_ms': round(percentile(values, 0.95), 3),
+        'min_ms': round(values[0], 3),
+        'max_ms': round(values[-1], 3),
+    }
+
+
+def measure(func: Callable[[], Any], runs: int, setup: Optional[Callable[[], Any]] = None,
+            teardown: Optional[Callable[[], Any]] = None, warmup: int = 1) -> List[float]:
+    """重複執行 func，只計 func 本身的時間（輸出導向丟棄）"""
+    samples = []
+    sink = io.StringIO()
+    with redirect_stdout(sink):
+        for index in range(warmup + runs):
+            if setup is not None:
+                setup()
+            started = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - started
+            if teardown is not None:
+                teardown()
+            if index >= warmup:
+                samples.append(elapsed)
+            sink.seek(0)
+            sink.truncate()
+    return samples
+
+
+def in_process_benchmarks(fake: FakeEnv, runs: int) -> Dict[str, Callable[[], List[float]]]:
+    """行程內的項目（名稱: 執行後回傳樣本的函式）"""
+    from voice_assistant import ClaudeVoiceAssistant
+    from voice_config import DEFAULT_CONFIG
+
+    assistant = ClaudeVoiceAssistant(fake.config_path)
+    cwd = str(fake.project_dir)
+
+    def touch_config():
+        # 改變設定檔的修改時間，讓下一次讀取重新解析
+        stamp = time.time_ns() if hasattr(time, 'time_ns') else int(time.time() * 1e9)
+        os.utime(fake.config_path, ns=(stamp, stamp))
+
+    def idle():
+        assistant.wait_until_idle(10)
+
+    benchmarks = {
+        'construct': lambda: measure(lambda: ClaudeVoiceAssistant(fake.config_path), runs),
+        'load_config': lambda: measure(assistant.load_config, runs),
+        'load_config_cold': lambda: measure(assistant.load_config, runs, setup=touch_config),
+    }
+    for emotion in DEFAULT_CONFIG['prefixes']:
+        benchmarks[f'notify:emotion={emotion}'] = (
+            lambda emotion=emotion: measure(
+                lambda: assistant.notify('基準測試通知', emotion=emotion, cwd=cwd), runs,
+                teardown=idle))
+    for context in DEFAULT_CONFIG['contextual_messages']:
+        benchmarks[f'notify:context={context}'] = (
+            lambda context=context: measure(
+                lambda: assistant.notify(context=context, emotion='gentle', cwd=cwd), runs,
+                teardown=idle))
+    benchmarks['say'] = lambda: measure(
+        lambda: assistant.say('基準測試說話', emotion='gentle', cwd=cwd), runs, teardown=idle)
+    return benchmarks
+
+
+def run_process(fake: FakeEnv, argv: List[str], stdin: Optional[bytes] = None) -> float:
+    started = time.perf_counter()
+    subprocess.run(argv, input=stdin, env=fake.env(), cwd=str(fake.project_dir),
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=120)
+    return time.perf_counter() - started
+
+
+def process_benchmarks(fake: FakeEnv, runs: int) -> Dict[str, Callable[[], List[float]]]:
+    """子行程項目：hook 腳本、claude_notify.py 與 CLI 子命令"""
+    python = sys.executable
+    hooks_dir = fake.voice_dir / 'hooks'
+    failure = json.dumps(TOOL_FAILURE_PAYLOAD, ensure_ascii=False).encode('utf-8')
+    success = json.dumps(TOOL_SUCCESS_PAYLOAD, ensure_ascii=False).encode('utf-8')
+
+    def repeat(argv, stdin=None):
+        return lambda: [run_process(fake, argv, stdin) for _ in range(runs)]
+
+    benchmarks = {
+        'python_startup': repeat([python, '-c', 'pass']),
+        'hook:session_start': repeat([python, str(hooks_dir / 'session_start_hook.py'),
+                                      str(fake.project_dir)]),
+        'hook:user_submit': repeat([python, str(hooks_dir / 'user_submit_hook.py')]),
+        'hook:tool_result(failure)': repeat([python, str(hooks_dir / 'tool_result_hook.py')],
+                                            failure),
+        'hook:tool_result(success)': repeat([python, str(hooks_dir / 'tool_result_hook.py')],
+                                            success),
+        'hook:claude_notify': repeat([python, str(fake.voice_dir / 'claude_notify.py'),
+                                      '需要您的協助', 'urgent']),
+    }
+    script = str(fake.voice_dir / 'voice_assistant.py')
+    for name, args in CLI_COMMANDS:
+        benchmarks[f'cli:{name}'] = repeat([python, script] + args)
+    return benchmarks
+
+
+def uncovered_commands(fake: FakeEnv) -> List[str]:
+    """voice_assistant.py 中沒有列入 CLI_COMMANDS 也沒有略過的子命令"""
+    result = subprocess.run([sys.executable, str(fake.voice_dir / 'voice_assistant.py'), '--help'],
+                            env=fake.env(), capture_output=True, text=True)
+    names = set()
+    for line in result.stdout.splitlines():
+        line = line.strip()
+        if line.startswith('{') and '}' in line:
+            names.update(line[1:line.index('}')].split(','))
+            break
+    covered = {name for name, _ in CLI_COMMANDS} | set(SKIPPED_COMMANDS)
+    return sorted(names - covered)
+
+
+def git_commit() -> Optional[str]:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=str(REPO_DIR),
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'],
+                               cwd=str(REPO_DIR), capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ('-dirty' if dirty else '')
+
+
+def compare(results: Dict[str, Dict[str, Any]], baseline: Dict[str, Dict[str, Any]],
+            threshold: float, min_delta_ms: float) -> List[Dict[str, Any]]:
+    """
+    與基準結果比較 p50
+
+    Returns:
+        [{'name', 'baseline_ms', 'current_ms', 'change', 'regressed'}, ...]
+    """
+    rows = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        base_ms, current_ms = previous['p50_ms'], current['p50_ms']
+        delta = current_ms - base_ms
+        rows.append({
+            'name': name,
+            'baseline_ms': base_ms,
+            'current_ms': current_ms,
+            'change': delta / base_ms if base_ms else 0.0,
+            'regressed': delta > max(min_delta_ms, base_ms * threshold),
+        })
+    return rows
+
+
+def print_results(results: Dict[str, Dict[str, Any]]):
+    print(f"{'項目':<40}{'次數':>6}{'p50 ms':>10}{'p95 ms':>10}{'最短 ms':>10}")
+    for name, row in results.items():
+        print(f"{name:<42}{row['runs']:>6}{row['p50_ms']:>10.2f}{row['p95_ms']:>10.2f}"
+              f"{row['min_ms']:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='通知路徑的微基準測試（假後端，不需要音效卡）')
+    parser.add_argument('--runs', type=int, default=DEFAULT_RUNS, help='行程內項目的重複次數')
+    parser.add_argument('--cli-runs', type=int, default=DEFAULT_CLI_RUNS,
+                        help='子行程項目（hook、CLI）的重複次數')
+    parser.add_argument('--filter', '-k', action='append', default=[],
+                        help='只執行名稱包含此字串的項目（可重複）')
+    parser.add_argument('--backend', default='espeak',
+                        choices=['espeak', 'espeak-persistent', 'say'],
+                        help='語音後端（皆為替身命令）')
+    parser.add_argument('--output', '-o', help='結果寫入的 JSON 檔')
+    parser.add_argument('--baseline', '-b', help='比較用的前一次結果（JSON）')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='p50 變慢超過此比例視為退步（預設 0.25）')
+    parser.add_argument('--min-delta-ms', type=float, default=MIN_DELTA_MS,
+                        help='差距小於此毫秒數時不視為退步')
+    parser.add_argument('--list', action='store_true', help='只列出項目名稱')
+    parser.add_argument('--keep', action='store_true', help='保留假環境目錄（除錯用）')
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    # 在切換到假環境（HOME）之前取得提交，git 設定在原本的家目錄
+    commit = git_commit()
+    fake = FakeEnv(args.backend, keep=args.keep)
+    try:
+        missing = uncovered_commands(fake)
+        fake.activate()
+        benchmarks = in_process_benchmarks(fake, args.runs)
+        benchmarks.update(process_benchmarks(fake, args.cli_runs))
+        if args.filter:
+            benchmarks = {name: run for name, run in benchmarks.items()
+                          if any(pattern in name for pattern in args.filter)}
+
+        if args.list:
+            for name in benchmarks:
+                print(name)
+            return
+
+        print(f"🏁 {len(benchmarks)} 個項目（假環境: {fake.root}，後端: {args.backend}）",
+              file=sys.stderr)
+        if missing:
+            print(f"⚠️ 尚未納入的子命令: {', '.join(missing)}", file=sys.stderr)
+
+        results = {}
+        started = time.perf_counter()
+        for name, run in benchmarks.items():
+            results[name] = summarize(run())
+            print(f"  {name}: p50 {results[name]['p50_ms']:.2f} ms", file=sys.stderr)
+        elapsed = time.perf_counter() - started
+    finally:
+        fake.cleanup()
+
+    report = {
+        'meta': {
+            'commit': commit,
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'backend': args.backend,
+            'runs': args.runs,
+            'cli_runs': args.cli_runs,
+            'seconds': round(elapsed, 2),
+        },
+        'results': results,
+    }
+    print()
+    print_results(results)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 結果已寫入 {args.output}")
+
+    if baseline is None:
+        return
+    rows = compare(results, baseline.get('results', {}), args.threshold, args.min_delta_ms)
+    print(f"\n📊 與 {args.baseline}（{baseline.get('meta', {}).get('commit')}）比較 p50：")
+    for row in rows:
+        mark = '❌' if row['regressed'] else ' '
+        print(f"{mark} {row['name']:<40}{row['baseline_ms']:>10.2f}{row['current_ms']:>10.2f}"
+              f"{row['change']:>+10.1%}")
+    regressed = [row['name'] for row in rows if row['regressed']]
+    if regressed:
+        print(f"\n❌ {len(regressed)} 個項目變慢超過 {args.threshold:.0%}: {', '.join(regressed)}")
+        sys.exit(1)
+    print(f"\n✅ 沒有項目變慢超過 {args.threshold:.0%}")
+
+
+if __name__ == '__main__':
+    main()
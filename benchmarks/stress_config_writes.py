@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+設定檔同時寫入壓力測試
+
+多個行程同時以 update_config_file 寫入同一個 config.json：
+- 每個寫入者更新自己的項目（writer_N），檢查最後的值都保留
+- 以 mutate 在鎖內遞增共用計數器並加入裝置，檢查沒有遺失任何一次更新
+- 另一個行程持續讀取並解析設定檔，檢查從未讀到寫到一半或空白的檔案
+
+--legacy 改用舊版的做法（不加鎖、直接覆寫原檔案）對照
+
+用法:
+    python3 benchmarks/stress_config_writes.py [--writers 32] [--updates 50] [--legacy]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import multiprocessing
+from pathlib import Path
+
+# 添加工具路徑
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# 每個寫入者每隔幾次更新加入一個裝置
+DEVICE_EVERY = 5
+
+
+def legacy_update(path, changes=None, mutate=None):
+    """舊版 update_config_file：讀取後直接覆寫原檔案，沒有鎖"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            user_config = json.load(f)
+    except FileNotFoundError:
+        user_config = {}
+    if changes:
+        user_config.update(changes)
+    if mutate is not None:
+        mutate(user_config)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(user_config, f, ensure_ascii=False, indent=2)
+
+
+def _increment(user_config):
+    user_config['counter'] = user_config.get('counter', 0) + 1
+
+
+def writer(path: str, index: int, updates: int, legacy: bool, failures):
+    from voice_config import update_config_file
+    update = legacy_update if legacy else update_config_file
+
+    for n in range(updates):
+        device = f'device-{index}-{n}' if n % DEVICE_EVERY == 0 else None
+
+        def mutate(user_config, device=device):
+            _increment(user_config)
+            if device:
+                user_config.setdefault('my_devices', []).append(device)
+
+        try:
+            update(path, {f'writer_{index}': n}, mutate)
+        except ValueError:
+            # 讀到其他行程寫到一半的檔案
+            failures.value += 1
+
+
+def reader(path: str, stop, counters):
+    """持續讀取設定檔，記錄無法解析的次數"""
+    while not stop.is_set():
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                json.load(f)
+            counters[0] += 1
+        except FileNotFoundError:
+            pass
+        except ValueError:
+            counters[1] += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description='設定檔同時寫入壓力測試')
+    parser.add_argument('--writers', type=int, default=32, help='同時寫入的行程數')
+    parser.add_argument('--updates', type=int, default=50, help='每個行程的更新次數')
+    parser.add_argument('--legacy', action='store_true', help='使用舊版不加鎖的寫入方式對照')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        # 鎖檔寫到暫存目錄，不影響實際的狀態目錄
+        os.environ['CLAUDE_VOICE_STATE_DIR'] = os.path.join(temp_dir, 'state')
+        path = os.path.join(temp_dir, 'config.json')
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'mode': 'full'}, f)
+
+        failures = multiprocessing.Value('i', 0)
+        counters = multiprocessing.Array('i', 2)
+        stop = multiprocessing.Event()
+        reader_process = multiprocessing.Process(target=reader, args=(path, stop, counters))
+        reader_process.start()
+
+        started = time.perf_counter()
+        writers = [multiprocessing.Process(target=writer,
+                                           args=(path, index, args.updates, args.legacy, failures))
+                   for index in range(args.writers)]
+        for process in writers:
+            process.start()
+        for process in writers:
+            process.join()
+        elapsed = time.perf_counter() - started
+
+        stop.set()
+        reader_process.join()
+
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                final = json.load(f)
+        except ValueError:
+            final = {}
+
+    total = args.writers * args.updates
+    expected_devices = args.writers * len(range(0, args.updates, DEVICE_EVERY))
+    lost_writer_keys = sum(1 for index in range(args.writers)
+                           if final.get(f'writer_{index}') != args.updates - 1)
+    counter = final.get('counter', 0)
+    devices = len(final.get('my_devices', []))
+
+    print(f"{'舊版寫入' if args.legacy else '加鎖 + rename'}: {args.writers} 個行程 × {args.updates} 次"
+          f" = {total} 次更新，耗時 {elapsed:.2f} 秒 ({total / elapsed:.0f} 次/秒)")
+    print(f"  計數器: {counter}/{total}")
+    print(f"  裝置: {devices}/{expected_devices}")
+    print(f"  遺失最後值的寫入者: {lost_writer_keys}/{args.writers}")
+    print(f"  寫入端讀到損壞檔案: {failures.value} 次")
+    print(f"  讀取端: 成功 {counters[0]} 次，損壞 {counters[1]} 次")
+
+    ok = (counter == total and devices == expected_devices and lost_writer_keys == 0
+          and failures.value == 0 and counters[1] == 0)
+    print('✅ 沒有遺失更新' if ok else '❌ 有更新遺失或讀到損壞的檔案')
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Claude Code 實例登錄表
+記錄每個專案目前的 Claude Code 會話與最後活動時間，存放在狀態目錄的 SQLite 資料庫（WAL 模式）。
+
+- project_path 與 instance_id 都有索引，hook 依工作目錄查詢或更新只需要一次索引查找
+- 活動更新是單一 UPSERT，多個 hook 行程同時執行也不會遺失更新
+- 資料表只在 PRAGMA user_version 低於 SCHEMA_VERSION 時建立，之後開啟資料庫不再執行任何寫入
+- 過期實例由 daemon 定期清除；沒有 daemon 時，hook 最多每 CLEANUP_INTERVAL 秒順便清除一次
+  （先以唯讀查詢確認上次清除的時間，不需要清除時 hook 只有登錄一次寫入）
+"""
+import os
+import time
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional
+
+from voice_paths import STATE_DIR, ensure_state_dir
+
+# 實例資料庫
+DB_PATH = os.path.join(STATE_DIR, 'instances.db')
+
+# 超過此秒數沒有活動的實例視為過期
+STALE_SECONDS = 6 * 60 * 60
+
+# 清除過期實例的間隔
+CLEANUP_INTERVAL = 5 * 60
+
+# 等待其他行程釋放寫入鎖的秒數
+BUSY_TIMEOUT = 5.0
+
+# 資料表結構版本（記錄在 PRAGMA user_version）
+SCHEMA_VERSION = 1
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS instances (
+    instance_id TEXT PRIMARY KEY,
+    project_path TEXT NOT NULL,
+    project_name TEXT NOT NULL,
+    pid INTEGER,
+    registered REAL NOT NULL,
+    last_active REAL NOT NULL,
+    activity_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE UNIQUE INDEX IF NOT EXISTS instances_project_path ON instances (project_path);
+CREATE INDEX IF NOT EXISTS instances_last_active ON instances (last_active);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value REAL NOT NULL
+);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('last_cleanup', 0);
+'''
+
+# 以專案路徑為準：同一專案再次登錄時只更新活動時間與次數
+_UPSERT = '''
+INSERT INTO instances (instance_id, project_path, project_name, pid, registered, last_active,
+                       activity_count)
+VALUES (?, ?, ?, ?, ?, ?, 1)
+ON CONFLICT (project_path) DO UPDATE SET
+    pid = excluded.pid,
+    last_active = excluded.last_active,
+    activity_count = activity_count + 1
+'''
+
+_COLUMNS = ('instance_id', 'project_path', 'project_name', 'pid', 'registered', 'last_active',
+            'activity_count')
+
+
+class ClaudeInstanceManager:
+    """以 SQLite 儲存的實例登錄表"""
+
+    def __init__(self, db_path: str = DB_PATH):
+        self.db_path = db_path
+        if db_path == DB_PATH:
+            ensure_state_dir()
+        # isolation_level=None：每個陳述式自動提交，不會長時間持有寫入鎖
+        self._conn = sqlite3.connect(db_path, timeout=BUSY_TIMEOUT, isolation_level=None,
+                                     check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            if self._conn.execute('PRAGMA user_version').fetchone()[0] < SCHEMA_VERSION:
+                self._create_schema()
+
+    def _create_schema(self):
+        """建立資料表並記錄結構版本（WAL 模式記錄在資料庫檔案中，也只需要設定一次）"""
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.executescript('BEGIN IMMEDIATE;' + _SCHEMA
+                                 + f'PRAGMA user_version = {SCHEMA_VERSION}; COMMIT;')
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _row(self, row) -> Optional[Dict[str, Any]]:
+        return dict(zip(_COLUMNS, row)) if row is not None else None
+
+    def _write(self, sql: str, params: tuple = ()) -> sqlite3.Cursor:
+        """
+        執行寫入陳述式（呼叫端持有 self._lock）
+
+        先以不等待的方式嘗試；其他行程持有寫入鎖時才等待（最多 BUSY_TIMEOUT 秒），
+        並把等待時間記錄到耗時統計（lock_wait 階段，見 voice_config.record_lock_wait）
+        """
+        self._conn.execute('PRAGMA busy_timeout = 0')
+        try:
+            return self._conn.execute(sql, params)
+        except sqlite3.OperationalError as e:
+            if 'locked' not in str(e) and 'busy' not in str(e):
+                raise
+        finally:
+            self._conn.execute(f'PRAGMA busy_timeout = {int(BUSY_TIMEOUT * 1000)}')
+
+        started = time.perf_counter()
+        cursor = self._conn.execute(sql, params)
+        try:
+            from voice_config import record_lock_wait
+            record_lock_wait('instances.db', time.perf_counter() - started)
+        except ImportError:
+            pass
+        return cursor
+
+    def register(self, project_path: Optional[str] = None, pid: Optional[int] = None) -> str:
+        """
+        登錄或更新專案的實例（單一 UPSERT）
+
+        Args:
+            project_path: 專案目錄（預設為目前目錄）
+            pid: Claude Code 行程（預設為父行程，hook 由 Claude Code 啟動）
+
+        Returns:
+            實例 ID（同一專案沿用原本的 ID）
+        """
+        project_path = os.path.abspath(project_path or os.getcwd())
+        now = time.time()
+        new_id = os.urandom(6).hex()
+        with self._lock:
+            self._write(_UPSERT, (new_id, project_path, os.path.basename(project_path),
+                                  pid if pid is not None else os.getppid(), now, now))
+            row = self._conn.execute('SELECT instance_id FROM instances WHERE project_path = ?',
+                                     (project_path,)).fetchone()
+        return row[0] if row else new_id
+
+    def touch(self, project_path: str) -> bool:
+        """更新專案實例的活動時間，回傳實例是否存在"""
+        with self._lock:
+            cursor = self._write(
+                'UPDATE instances SET last_active = ?, activity_count = activity_count + 1 '
+                'WHERE project_path = ?', (time.time(), os.path.abspath(project_path)))
+        return cursor.rowcount > 0
+
+    def update_instance_activity(self, instance_id: str) -> bool:
+        """依實例 ID 更新活動時間，回傳實例是否存在"""
+        with self._lock:
+            cursor = self._write(
+                'UPDATE instances SET last_active = ?, activity_count = activity_count + 1 '
+                'WHERE instance_id = ?', (time.time(), instance_id))
+        return cursor.rowcount > 0
+
+    def find_by_project(self, project_path: str) -> Optional[Dict[str, Any]]:
+        """依專案路徑查詢實例"""
+        with self._lock:
+            row = self._conn.execute(f'SELECT {", ".join(_COLUMNS)} FROM instances '
+                                     'WHERE project_path = ?',
+                                     (os.path.abspath(project_path),)).fetchone()
+        return self._row(row)
+
+    def get(self, instance_id: str) -> Optional[Dict[str, Any]]:
+        """依實例 ID 查詢"""
+        with self._lock:
+            row = self._conn.execute(f'SELECT {", ".join(_COLUMNS)} FROM instances '
+                                     'WHERE instance_id = ?', (instance_id,)).fetchone()
+        return self._row(row)
+
+    def remove(self, instance_id: str) -> bool:
+        with self._lock:
+            cursor = self._write('DELETE FROM instances WHERE instance_id = ?', (instance_id,))
+        return cursor.rowcount > 0
+
+    def list_instances(self, active_within: Optional[float] = None) -> List[Dict[str, Any]]:
+        """列出實例（最近活動的在前）"""
+        query = f'SELECT {", ".join(_COLUMNS)} FROM instances'
+        params = ()
+        if active_within is not None:
+            query += ' WHERE last_active >= ?'
+            params = (time.time() - active_within,)
+        with self._lock:
+            rows = self._conn.execute(query + ' ORDER BY last_active DESC', params).fetchall()
+        return [self._row(row) for row in rows]
+
+    @property
+    def instances(self) -> Dict[str, Dict[str, Any]]:
+        """所有實例 {實例 ID: 資訊}（相容舊版介面；查詢單一專案請用 find_by_project）"""
+        return {info['instance_id']: info for info in self.list_instances()}
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM instances').fetchone()[0]
+
+    def cleanup_stale(self, max_age: float = STALE_SECONDS) -> int:
+        """刪除過期實例，回傳刪除數量"""
+        with self._lock:
+            cursor = self._write('DELETE FROM instances WHERE last_active < ?',
+                                 (time.time() - max_age,))
+        return cursor.rowcount
+
+    def maybe_cleanup(self, interval: float = CLEANUP_INTERVAL,
+                      max_age: float = STALE_SECONDS) -> Optional[int]:
+        """
+        距離上次清除超過 interval 秒時清除過期實例
+
+        先以唯讀查詢比對上次清除的時間，不需要清除時不寫入；
+        需要時再以條件式 UPDATE 取得清除權，多個行程同時呼叫時只有一個會執行清除
+
+        Returns:
+            刪除數量；這次不需要清除時回傳 None
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'last_cleanup'").fetchone()
+            if row is not None and row[0] > now - interval:
+                return None
+            cursor = self._write(
+                "UPDATE meta SET value = ? WHERE key = 'last_cleanup' AND value <= ?",
+                (now, now - interval))
+            if cursor.rowcount == 0:
+                return None
+        return self.cleanup_stale(max_age)
+
+
+def start_cleanup_thread(stop_event: threading.Event, interval: float = CLEANUP_INTERVAL,
+                         max_age: float = STALE_SECONDS, db_path: str = DB_PATH) -> threading.Thread:
+    """在背景定期清除過期實例（daemon 使用），stop_event 設定後結束"""
+
+    def run():
+        manager = ClaudeInstanceManager(db_path)
+        try:
+            while True:
+                try:
+                    removed = manager.maybe_cleanup(interval, max_age)
+                    if removed:
+                        print(f'🧹 已清除 {removed} 個過期實例')
+                except sqlite3.Error as e:
+                    print(f'⚠️ 清除過期實例失敗: {e}')
+                if stop_event.wait(interval):
+                    break
+        finally:
+            manager.close()
+
+    thread = threading.Thread(target=run, name='instance-cleanup', daemon=True)
+    thread.start()
+    return thread
+
+
+def register_current_instance(project_path: Optional[str] = None) -> str:
+    """登錄目前工作目錄的實例並回傳實例 ID"""
+    with ClaudeInstanceManager() as manager:
+        instance_id = manager.register(project_path)
+        manager.maybe_cleanup()
+    return instance_id
+
+
+def send_notification_to_daemon(message: str, emotion: str = 'gentle',
+                                context: Optional[str] = None) -> bool:
+    """
+    交給語音 daemon 發送通知
+
+    Returns:
+        是否已排入 daemon 佇列（沒有 daemon 時回傳 False）
+    """
+    from voice_client import send_notification
+    return send_notification(message, emotion=emotion, context=context)
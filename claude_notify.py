@@ -2,17 +2,22 @@
 """
 Claude Code 語音通知工具
 讓 Claude Code 實例可以輕鬆發送語音通知給用戶
-簡化版本 - 直接使用語音助理，無需 daemon
+有 daemon 在運行時只負責送出請求並立即返回，否則直接使用語音助理
 """
 import sys
 import os
-from pathlib import Path
+import time
 
 # 添加工具路徑
-sys.path.insert(0, str(Path(__file__).parent))
+# 常用路徑（檢查停用旗標、交給 daemon）只匯入 os 與 socket，
+# 語音助理模組只在沒有 daemon 時才匯入
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from project_config import is_voice_enabled
 
 def main():
     """主函數"""
+    started = time.time()
     if len(sys.argv) < 2:
         print_usage()
         sys.exit(1)
@@ -25,7 +30,17 @@ def main():
         print("🔇 語音通知已停用，跳過通知")
         return
 
-    # 直接使用語音助理發送通知
+    # 追蹤這則通知經過的各站（voice_assistant.py trace），ID 經由環境變數傳給後續各站
+    from voice_trace import start as start_trace
+    start_trace('cli', ts=started)
+
+    # 優先交給常駐 daemon（排入佇列後立即返回）
+    from voice_client import send_notification
+    if send_notification(message, emotion=emotion):
+        print(f"✅ 語音通知已排入 daemon: {message}")
+        return
+
+    # 沒有 daemon，直接使用語音助理發送通知
     try:
         from voice_assistant import ClaudeVoiceAssistant
         assistant = ClaudeVoiceAssistant()
@@ -34,26 +49,6 @@ def main():
     except Exception as e:
         print(f"❌ 語音通知發送失敗: {e}")
 
-def is_voice_enabled():
-    """檢查當前專案是否啟用語音通知"""
-    try:
-        import json
-        project_dir = Path.cwd()
-
-        # 檢查專案中的語音設定檔案
-        voice_config_file = project_dir / '.claude-voice-config.json'
-        if voice_config_file.exists():
-            with open(voice_config_file, 'r', encoding='utf-8') as f:
-                config = json.load(f)
-                return config.get('voice_enabled', True)
-
-        # 如果沒有設定檔案，預設啟用
-        return True
-
-    except Exception as e:
-        print(f"⚠️ 檢查語音設定失敗: {e}")
-        return True  # 預設啟用
-
 def print_usage():
     """顯示使用方法"""
     print("""
@@ -1,10 +1,11 @@
 #!/usr/bin/env python3
 """
-Claude Code 直接語音通知工具 (不依賴 daemon)
-用於當 daemon 無法使用時的純手動語音通知
+Claude Code 直接語音通知工具
+強制播放語音（靜音模式也會播放），有 daemon 時交給 daemon，否則直接使用語音助理
 """
 import sys
 import os
+import time
 from pathlib import Path
 
 # 添加工具路徑
@@ -12,6 +13,7 @@ sys.path.insert(0, str(Path(__file__).parent))
 
 def main():
     """主函數"""
+    started = time.time()
     if len(sys.argv) < 2:
         print_usage()
         sys.exit(1)
@@ -27,27 +29,32 @@ def main():
         print("🔇 語音通知已停用，跳過通知")
         return
     
-    # 直接使用語音助理，不通過 daemon
+    # 追蹤這則通知經過的各站（voice_assistant.py trace）
+    try:
+        from voice_trace import start as start_trace
+        start_trace('cli', ts=started)
+    except ImportError:
+        pass
+    
+    # 優先交給常駐 daemon（排入佇列後立即返回）
+    from voice_client import send_notification
+    if send_notification(message, emotion=emotion, force_voice=True):
+        print(f"✅ 語音通知已排入 daemon")
+        send_system_notification(message)
+        return
+    
+    # 沒有 daemon，直接使用語音助理
     try:
         from voice_assistant import ClaudeVoiceAssistant
         assistant = ClaudeVoiceAssistant()
         
-        # 確保語音模式正確設置
-        original_mode = assistant.config.get('mode', 'normal')
-        if original_mode in ['normal', 'silent']:
-            # 臨時設置為 full 模式以確保語音播放
-            assistant.config['mode'] = 'full'
-        
-        print(f"🔊 使用語音模式: {assistant.config['mode']}")
+        # 強制播放語音（靜音模式也會發聲，off 模式除外）
+        print(f"🔊 使用語音模式: {assistant.config.get('mode', 'full')}（強制語音）")
         
         # 發送語音通知
-        assistant.notify(message, emotion=emotion)
+        assistant.notify(message, emotion=emotion, force_voice=True)
         print(f"✅ 語音通知成功發送")
         
-        # 恢復原始模式
-        if original_mode in ['normal', 'silent']:
-            assistant.config['mode'] = original_mode
-        
         # 同時發送系統通知
         send_system_notification(message)
         
@@ -80,28 +87,16 @@ def send_system_notification(message):
             print(f"⚠️ 系統通知發送失敗: {e}")
 
 def is_voice_enabled():
-    """檢查當前專案是否啟用語音通知"""
+    """檢查當前專案是否啟用語音通知（由目前目錄往上尋找專案設定）"""
     try:
-        import json
-        project_dir = Path.cwd()
-        
-        # 檢查專案中的語音設定檔案
-        voice_config_file = project_dir / '.claude-voice-config.json'
-        if voice_config_file.exists():
-            with open(voice_config_file, 'r', encoding='utf-8') as f:
-                config = json.load(f)
-                enabled = config.get('voice_enabled', True)
-                print(f"📋 從設定檔讀取: 語音通知{'已啟用' if enabled else '已停用'}")
-                return enabled
-        
-        # 如果沒有設定檔案，預設啟用
-        print("📋 沒有找到設定檔，預設啟用語音通知")
-        return True
-        
-    except Exception as e:
-        print(f"⚠️ 檢查語音設定失敗: {e}")
-        print("📋 預設啟用語音通知")
+        from project_config import is_voice_enabled as project_voice_enabled
+    except ImportError:
+        # 舊版本地副本沒有專案設定模組
         return True
+    
+    enabled = project_voice_enabled()
+    print(f"📋 專案設定: 語音通知{'已啟用' if enabled else '已停用'}")
+    return enabled
 
 def print_usage():
     """顯示使用方法"""
@@ -128,7 +123,8 @@ def print_usage():
   - worried  - 糟糕，
   - thinking - 嗯...讓我想想，
 
-這個工具直接使用語音助理，不依賴 daemon 系統。
+有 daemon 在運行時（python3 voice_daemon.py start）會交給 daemon 播放並立即返回，
+否則直接使用語音助理。
     """)
 
 if __name__ == "__main__":
@@ -2,94 +2,220 @@
 """
 專案自動偵測語音助理工具
 讓專案可以自動找到並使用全域或本地語音助理
+
+偵測結果依工作目錄快取在狀態目錄的 discovery.json：
+只重新檢查優先權不低於上次結果的路徑（更低優先的路徑不會改變結果），
+這些路徑的存在與否、修改時間與大小都沒變時直接使用快取；
+優先權較高的安裝出現（例如之後才裝了全域語音助理）時，記錄的狀態不同，會重新偵測。
 """
+import os
 import sys
+import json
+import shlex
 from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from voice_paths import STATE_DIR
+
+# 偵測結果快取
+DISCOVERY_CACHE_PATH = os.path.join(STATE_DIR, 'discovery.json')
+
+# 快取保留的工作目錄數量
+DISCOVERY_CACHE_LIMIT = 32
 
-def detect_voice_assistant():
+# 行程內的偵測結果 {工作目錄: 快取項目}，驗證方式與 discovery.json 相同
+_discovery_memo = {}
+
+# 各類型的說明與使用方式
+ASSISTANT_TYPES = {
+    'global': ('使用全域語音助理',
+               'python3 ~/.claude-code-tools/claude_notify.py "訊息" "情緒"'),
+    'local': ('使用專案本地語音助理',
+              'python3 .claude-voice/claude_notify.py "訊息" "情緒"'),
+    'direct': ('使用直接路徑語音助理',
+               'python3 ~/Documents/claude-code-voice/claude_notify_direct.py "訊息" "情緒"'),
+}
+
+
+def _candidates(cwd: str) -> List[Tuple[str, str]]:
     """
-    自動偵測可用的語音助理
-    返回最佳的語音助理路徑和使用方式
+    依優先順序列出語音助理的位置：
+    1. 全域語音助理 (~/.claude-code-tools/)
+    2. 本地語音助理 (./.claude-voice/)
+    3. 直接路徑 (~/Documents/claude-code-voice/)
     """
-    
-    # 優先順序：
-    # 1. 直接路徑 (~/Documents/claude-code-voice/)
-    # 2. 本地語音助理 (./.claude-voice/)
-    # 3. 直接路徑 (~/Documents/claude-code-voice/)
-    
-    home = Path.home()
-    current_dir = Path.cwd()
-    
-    # 1. 檢查全域語音助理
-    global_tools = home / '.claude-code-tools'
-    if (global_tools / 'claude_notify.py').exists():
-        return {
-            'type': 'global',
-            'path': global_tools / 'claude_notify.py',
-            'description': '使用全域語音助理',
-            'usage': f'python3 ~/Documents/claude-code-voice/claude_notify.py "訊息" "情緒"'
-        }
-    
-    # 2. 檢查本地語音助理  
-    local_voice = current_dir / '.claude-voice'
-    if (local_voice / 'claude_notify.py').exists():
-        return {
-            'type': 'local', 
-            'path': local_voice / 'claude_notify.py',
-            'description': '使用專案本地語音助理',
-            'usage': f'python3 .claude-voice/claude_notify.py "訊息" "情緒"'
-        }
-    
-    # 3. 檢查直接路徑
-    direct_path = home / 'Documents' / 'claude-code-voice'
-    if (direct_path / 'claude_notify_direct.py').exists():
+    home = os.path.expanduser('~')
+    return [
+        ('global', os.path.join(home, '.claude-code-tools', 'claude_notify.py')),
+        ('local', os.path.join(cwd, '.claude-voice', 'claude_notify.py')),
+        ('direct', os.path.join(home, 'Documents', 'claude-code-voice', 'claude_notify_direct.py')),
+    ]
+
+
+def _stamp(path: str) -> Optional[List[int]]:
+    """路徑的修改時間與大小，不存在時為 None"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def _assistant_info(assistant_type: str, path: Optional[str]) -> Dict[str, Any]:
+    if assistant_type not in ASSISTANT_TYPES:
         return {
-            'type': 'direct',
-            'path': direct_path / 'claude_notify_direct.py', 
-            'description': '使用直接路徑語音助理',
-            'usage': f'python3 ~/Documents/claude-code-voice/claude_notify_direct.py "訊息" "情緒"'
+            'type': 'none',
+            'path': None,
+            'description': '未找到語音助理',
+            'setup_hint': '請執行: python3 ~/Documents/claude-code-voice/setup_global.py'
         }
-    
-    # 沒有找到任何語音助理
-    return {
-        'type': 'none',
-        'path': None,
-        'description': '未找到語音助理',
-        'setup_hint': '請執行: python3 ~/Documents/claude-code-voice/setup_global.py'
-    }
+    description, usage = ASSISTANT_TYPES[assistant_type]
+    return {'type': assistant_type, 'path': Path(path), 'description': description, 'usage': usage}
 
-def get_voice_notify_command(message, emotion="gentle"):
+
+def _load_discovery_cache() -> Dict[str, Any]:
+    try:
+        with open(DISCOVERY_CACHE_PATH, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return cache if isinstance(cache, dict) else {}
+
+
+def _store_discovery_cache(cache: Dict[str, Any]):
+    """寫入偵測結果（失敗時忽略，下次重新偵測即可）"""
+    # 只保留最近使用的工作目錄
+    while len(cache) > DISCOVERY_CACHE_LIMIT:
+        cache.pop(next(iter(cache)))
+
+    temp_path = f'{DISCOVERY_CACHE_PATH}.{os.getpid()}.tmp'
+    try:
+        os.makedirs(STATE_DIR, mode=0o700, exist_ok=True)
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(cache, f, ensure_ascii=False)
+        os.replace(temp_path, DISCOVERY_CACHE_PATH)
+    except OSError:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+
+
+def _cache_entry_valid(entry: Any, candidates: List[Tuple[str, str]]) -> bool:
     """
-    取得語音通知的完整命令
+    快取中檢查過的路徑仍是目前的候選，且狀態都沒變
+
+    檢查過的路徑包含找到的檔案與所有優先權更高（當時不存在）的路徑，
+    所以更高優先的安裝出現時這裡會回傳 False
+    """
+    if not isinstance(entry, dict):
+        return False
+    checked = entry.get('checked')
+    if not isinstance(checked, list) or not checked or len(checked) > len(candidates):
+        return False
+    for item, (_, candidate) in zip(checked, candidates):
+        if not isinstance(item, list) or len(item) != 2:
+            return False
+        path, stamp = item
+        if path != candidate or _stamp(candidate) != stamp:
+            return False
+    return True
+
+
+def detect_voice_assistant(use_cache: bool = True) -> Dict[str, Any]:
+    """
+    自動偵測可用的語音助理
+    返回最佳的語音助理路徑和使用方式
+
+    Args:
+        use_cache: 是否使用 discovery.json 中的偵測結果
+    """
+    cwd = os.getcwd()
+    candidates = _candidates(cwd)
+
+    if use_cache:
+        entry = _discovery_memo.get(cwd)
+        if entry is not None and _cache_entry_valid(entry, candidates):
+            return _assistant_info(entry['type'], entry['path'])
+
+    cache = _load_discovery_cache() if use_cache else {}
+    entry = cache.get(cwd)
+    if _cache_entry_valid(entry, candidates):
+        _discovery_memo[cwd] = entry
+        return _assistant_info(entry.get('type'), entry.get('path'))
+
+    # 依優先順序檢查，找到就停止
+    checked = []
+    found_type, found_path = 'none', None
+    for assistant_type, path in candidates:
+        stamp = _stamp(path)
+        checked.append([path, stamp])
+        if stamp is not None:
+            found_type, found_path = assistant_type, path
+            break
+
+    if use_cache:
+        # 重新插入，讓最近使用的工作目錄排在最後
+        cache.pop(cwd, None)
+        cache[cwd] = {'type': found_type, 'path': found_path, 'checked': checked}
+        _store_discovery_cache(cache)
+        _discovery_memo[cwd] = cache[cwd]
+    return _assistant_info(found_type, found_path)
+
+
+def get_voice_notify_argv(message: str, emotion: str = 'gentle') -> Tuple[Optional[List[str]], Dict[str, Any]]:
+    """
+    取得語音通知的命令參數（直接執行，不經過 shell）
     """
     assistant_info = detect_voice_assistant()
-    
     if assistant_info['type'] == 'none':
         return None, assistant_info
-    
-    if assistant_info['type'] == 'global':
-        cmd = f'python3 ~/Documents/claude-code-voice/claude_notify.py "{message}" "{emotion}"'
-    elif assistant_info['type'] == 'local':
-        cmd = f'python3 .claude-voice/claude_notify.py "{message}" "{emotion}"'
-    elif assistant_info['type'] == 'direct':
-        cmd = f'python3 ~/Documents/claude-code-voice/claude_notify_direct.py "{message}" "{emotion}"'
-    else:
-        cmd = None
-    
+    return [sys.executable, str(assistant_info['path']), message, emotion], assistant_info
+
+
+def get_voice_notify_command(message, emotion="gentle"):
+    """
+    取得語音通知的完整命令（顯示用的 shell 字串）
+    """
+    argv, assistant_info = get_voice_notify_argv(message, emotion)
+    if argv is None:
+        return None, assistant_info
+    cmd = ' '.join(shlex.quote(arg) for arg in ['python3'] + argv[1:])
     return cmd, assistant_info
 
+
+def run_notifier(path: Path, message: str, emotion: str = 'gentle') -> int:
+    """
+    在目前的行程內執行語音通知工具（不另外啟動 shell 與 Python 直譯器）
+
+    Returns:
+        結束碼
+    """
+    import runpy
+
+    saved_argv, saved_path = sys.argv, list(sys.path)
+    sys.argv = [str(path), message, emotion]
+    try:
+        runpy.run_path(str(path), run_name='__main__')
+    except SystemExit as e:
+        return e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    finally:
+        sys.argv = saved_argv
+        sys.path[:] = saved_path
+    return 0
+
+
 def main():
     """主函數 - 顯示偵測結果"""
     if len(sys.argv) > 1 and sys.argv[1] == 'test':
         # 測試模式
         message = sys.argv[2] if len(sys.argv) > 2 else "測試語音助理偵測"
         emotion = sys.argv[3] if len(sys.argv) > 3 else "gentle"
-        
-        cmd, info = get_voice_notify_command(message, emotion)
-        if cmd:
-            print(f"🔊 執行語音通知: {cmd}")
-            import subprocess
-            subprocess.run(cmd, shell=True)
+
+        info = detect_voice_assistant()
+        if info['path']:
+            print(f"🔊 執行語音通知: {info['path']}")
+            sys.exit(run_notifier(info['path'], message, emotion))
         else:
             print(f"❌ {info['description']}")
             if 'setup_hint' in info:
@@ -107,4 +233,4 @@ def main():
             print(f"💡 設置建議: {info['setup_hint']}")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+libespeak-ng 的 ctypes 綁定
+在行程內把文字合成為 16-bit 單聲道 PCM，不啟動子行程也不寫入暫存檔
+找不到函式庫時 load() 回傳 None，由呼叫端改用 espeak 命令
+"""
+import io
+import wave
+import ctypes
+import ctypes.util
+import threading
+from typing import Optional
+
+# speak_lib.h 中的常數
+AUDIO_OUTPUT_SYNCHRONOUS = 2
+ESPEAK_INITIALIZE_DONT_EXIT = 0x8000
+ESPEAK_RATE = 1
+ESPEAK_CHARS_UTF8 = 1
+POS_CHARACTER = 1
+EE_OK = 0
+
+# espeak 命令沒有指定語音時使用的預設值
+DEFAULT_VOICE = 'en'
+
+LIBRARY_NAMES = [
+    'libespeak-ng.so.1',
+    'libespeak-ng.so',
+    'libespeak-ng.1.dylib',
+    'libespeak-ng.dylib',
+    'libespeak-ng.dll'
+]
+
+# int SynthCallback(short *wav, int numsamples, espeak_EVENT *events)
+_SYNTH_CALLBACK = ctypes.CFUNCTYPE(ctypes.c_int, ctypes.POINTER(ctypes.c_short),
+                                   ctypes.c_int, ctypes.c_void_p)
+
+
+class EspeakLibrary:
+    """已初始化的 libespeak-ng（同步模式，合成結果由回呼函式收集）"""
+
+    def __init__(self, lib: ctypes.CDLL):
+        self._lib = lib
+        self._declare()
+
+        self.sample_rate = lib.espeak_Initialize(AUDIO_OUTPUT_SYNCHRONOUS, 0, None,
+                                                 ESPEAK_INITIALIZE_DONT_EXIT)
+        if self.sample_rate <= 0:
+            raise OSError('espeak_Initialize 失敗')
+
+        # 保留回呼函式的參照，避免被垃圾回收
+        self._callback = _SYNTH_CALLBACK(self._on_samples)
+        lib.espeak_SetSynthCallback(self._callback)
+
+        # 函式庫有全域狀態，同一時間只能合成一段
+        self._lock = threading.Lock()
+        self._chunks = None
+        self._voice = None
+
+    def _declare(self):
+        lib = self._lib
+        lib.espeak_Initialize.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_char_p, ctypes.c_int]
+        lib.espeak_Initialize.restype = ctypes.c_int
+        lib.espeak_SetSynthCallback.argtypes = [_SYNTH_CALLBACK]
+        lib.espeak_SetSynthCallback.restype = None
+        lib.espeak_SetParameter.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_int]
+        lib.espeak_SetParameter.restype = ctypes.c_int
+        lib.espeak_SetVoiceByName.argtypes = [ctypes.c_char_p]
+        lib.espeak_SetVoiceByName.restype = ctypes.c_int
+        lib.espeak_Synth.argtypes = [ctypes.c_void_p, ctypes.c_size_t, ctypes.c_uint, ctypes.c_int,
+                                     ctypes.c_uint, ctypes.c_uint, ctypes.POINTER(ctypes.c_uint),
+                                     ctypes.c_void_p]
+        lib.espeak_Synth.restype = ctypes.c_int
+        lib.espeak_Synchronize.argtypes = []
+        lib.espeak_Synchronize.restype = ctypes.c_int
+
+    def _on_samples(self, wav, numsamples, events) -> int:
+        """合成回呼：收集 PCM 片段，回傳 0 表示繼續"""
+        if wav and numsamples > 0 and self._chunks is not None:
+            self._chunks.append(ctypes.string_at(wav, numsamples * 2))
+        return 0
+
+    def synthesize(self, text: str, rate: int, voice: Optional[str] = None) -> bytes:
+        """
+        合成文字
+
+        Returns:
+            16-bit 單聲道 PCM（取樣率為 sample_rate）
+
+        Raises:
+            OSError: 設定語音或合成失敗
+        """
+        data = ctypes.create_string_buffer(text.encode('utf-8'))
+        with self._lock:
+            voice = voice or DEFAULT_VOICE
+            if voice != self._voice:
+                if self._lib.espeak_SetVoiceByName(voice.encode('utf-8')) != EE_OK:
+                    raise OSError(f'找不到 espeak 語音: {voice}')
+                self._voice = voice
+            self._lib.espeak_SetParameter(ESPEAK_RATE, int(rate), 0)
+
+            self._chunks = []
+            try:
+                result = self._lib.espeak_Synth(data, len(data), 0, POS_CHARACTER, 0,
+                                                ESPEAK_CHARS_UTF8, None, None)
+                self._lib.espeak_Synchronize()
+                if result != EE_OK:
+                    raise OSError(f'espeak_Synth 失敗 ({result})')
+                return b''.join(self._chunks)
+            finally:
+                self._chunks = None
+
+    def to_wav(self, pcm: bytes) -> bytes:
+        """把 PCM 包成 WAV"""
+        buffer = io.BytesIO()
+        with wave.open(buffer, 'wb') as wav_file:
+            wav_file.setnchannels(1)
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(self.sample_rate)
+            wav_file.writeframes(pcm)
+        return buffer.getvalue()
+
+
+_library = None
+_load_failed = False
+_load_lock = threading.Lock()
+
+
+def _open_library() -> Optional[ctypes.CDLL]:
+    names = LIBRARY_NAMES
+    found = ctypes.util.find_library('espeak-ng')
+    if found:
+        names = [found] + names
+    for name in names:
+        try:
+            return ctypes.CDLL(name)
+        except OSError:
+            continue
+    return None
+
+
+def load() -> Optional[EspeakLibrary]:
+    """載入並初始化 libespeak-ng（每個行程一次），無法使用時回傳 None"""
+    global _library, _load_failed
+    with _load_lock:
+        if _library is None and not _load_failed:
+            lib = _open_library()
+            try:
+                _library = EspeakLibrary(lib) if lib is not None else None
+            except (OSError, AttributeError):
+                # 版本不符（缺少函式）或初始化失敗
+                _library = None
+            _load_failed = _library is None
+        return _library
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+串流讀取 hook 的 JSON payload
+Claude Code 把 hook 資料以 JSON 從 stdin 傳入，工具輸出可能有數十 MB。
+這裡以固定大小的區塊讀取、逐塊解析 JSON 字串，只把工具結果欄位下的字串內容交給分類器，
+比對到決定性的規則後就停止解析，剩餘的輸入只讀取、保留最後 RAW_TAIL_BYTES 個位元組，
+讀完後從這段原始 JSON 反向找出工具結果的結尾供擷取重點行；
+記憶體用量只和區塊大小有關，與輸出大小無關。
+"""
+import re
+import json
+import codecs
+from typing import BinaryIO, Callable, Iterable, Optional, Tuple
+
+# 每次從 stdin 讀取的位元組數
+CHUNK_SIZE = 64 * 1024
+
+# 工具結果所在的最上層欄位
+RESULT_FIELDS = ('tool_response', 'tool_result')
+
+# 停止解析後保留的 payload 結尾位元組數（跳脫序列與 UTF-8 中文都比解碼後長，取重點行視窗的 4 倍）
+RAW_TAIL_BYTES = 128 * 1024
+
+# 字串內容：一般字元與完整的跳脫序列（不完整的跳脫序列留到下一個區塊）
+_STRING_BODY = re.compile(r'[^"\\]*(?:\\(?:u[0-9a-fA-F]{4}|[^u])[^"\\]*)*')
+# 結尾的高位代理（surrogate pair 的前半）需要等下一半一起解碼
+_TRAILING_HIGH_SURROGATE = re.compile(r'\\u[dD][89abAB][0-9a-fA-F]{2}$')
+
+
+class PayloadScanner:
+    """
+    逐塊解析 JSON，把指定最上層欄位下的字串值交給 on_text
+
+    只追蹤容器層級與物件的 key，不建立任何資料結構。
+    輸入不是 JSON 物件或陣列時，整段視為純文字。
+    """
+
+    def __init__(self, on_text: Callable[[str], bool], fields: Iterable[str] = RESULT_FIELDS):
+        """
+        Args:
+            on_text: 收到字串內容時呼叫，回傳 True 表示不需要再解析
+            fields: 要擷取的最上層欄位
+        """
+        self.on_text = on_text
+        self.fields = set(fields)
+        self.done = False
+
+        self._raw = None  # 第一個非空白字元決定是否為 JSON
+        self._pending = ''  # 上一個區塊結尾不完整的跳脫序列
+        self._stack = []
+        self._expect_key = False
+        self._in_string = False
+        self._is_key = False
+        self._capture = False
+        self._key_parts = []
+        self._top_key = None
+
+    def feed(self, data: str):
+        """送入一段已解碼的文字"""
+        if self.done or not data:
+            return
+
+        if self._raw is None:
+            stripped = data.lstrip()
+            if not stripped:
+                return
+            self._raw = stripped[0] not in '{['
+        if self._raw:
+            self._emit(data)
+            return
+
+        data = self._pending + data
+        self._pending = ''
+        pos = 0
+        end = len(data)
+        while pos < end and not self.done:
+            if not self._in_string:
+                quote = data.find('"', pos)
+                self._structure(data[pos:end if quote < 0 else quote])
+                if quote < 0:
+                    return
+                self._begin_string()
+                pos = quote + 1
+                continue
+
+            body_end = _STRING_BODY.match(data, pos).end()
+            if body_end == end or (data[body_end] == '\\' and end - body_end < 6):
+                # 字串延續到下一個區塊；結尾不完整的 \uXXXX、單獨的反斜線
+                # 與 surrogate pair 的前半留到下一個區塊
+                trailing = _TRAILING_HIGH_SURROGATE.search(data, max(pos, body_end - 6), body_end)
+                if trailing:
+                    body_end = trailing.start()
+                self._pending = data[body_end:]
+                self._string_text(data[pos:body_end])
+                return
+
+            self._string_text(data[pos:body_end])
+            if data[body_end] == '"':
+                self._end_string()
+                pos = body_end + 1
+            else:
+                # 無效的 \u 跳脫序列，保留原文
+                self._string_text('\\\\')
+                pos = body_end + 1
+
+    def _structure(self, segment: str):
+        """處理字串之間的結構字元"""
+        for char in segment:
+            if char == '{':
+                self._stack.append('{')
+                self._expect_key = True
+            elif char == '[':
+                self._stack.append('[')
+            elif char in '}]':
+                if self._stack:
+                    self._stack.pop()
+                self._expect_key = False
+            elif char == ',':
+                self._expect_key = bool(self._stack) and self._stack[-1] == '{'
+            elif char == ':':
+                self._expect_key = False
+
+    def _begin_string(self):
+        self._in_string = True
+        self._is_key = bool(self._stack) and self._stack[-1] == '{' and self._expect_key
+        self._key_parts = []
+        self._capture = (not self._is_key and bool(self._stack)
+                         and self._top_key in self.fields)
+
+    def _string_text(self, body: str):
+        if not body:
+            return
+        if self._is_key:
+            self._key_parts.append(_decode(body))
+        elif self._capture:
+            self._emit(_decode(body))
+
+    def _end_string(self):
+        self._in_string = False
+        if self._is_key:
+            if len(self._stack) == 1:
+                self._top_key = ''.join(self._key_parts)
+            self._key_parts = []
+        elif self._capture:
+            # 分隔相鄰的字串值，避免前後拼成關鍵字
+            self._emit('\n')
+
+    def _emit(self, text: str):
+        if text and self.on_text(text):
+            self.done = True
+
+
+def _decode(body: str) -> str:
+    """解碼 JSON 字串內容（不含引號）"""
+    if '\\' not in body:
+        return body
+    try:
+        return json.loads(f'"{body}"')
+    except ValueError:
+        return body
+
+
+def _escaped(raw: str, index: int) -> bool:
+    """raw[index] 前面是否有奇數個反斜線（也就是被跳脫）"""
+    count = 0
+    while index > count and raw[index - count - 1] == '\\':
+        count += 1
+    return count % 2 == 1
+
+
+def _after_first_newline(body: str) -> str:
+    """從被截斷的字串內容中，取第一個 \\n 跳脫序列之後的部分（開頭可能是不完整的跳脫序列）"""
+    for match in re.finditer(r'(\\+)n', body):
+        if match.start() > 0 and len(match.group(1)) % 2 == 1:
+            return body[match.end():]
+    return ''
+
+
+def result_tail(raw: str, fields: Iterable[str] = RESULT_FIELDS) -> str:
+    """
+    從 payload 結尾的原始 JSON 反向找出工具結果欄位下的字串值
+
+    JSON 字串中沒被跳脫的引號一定是字串的邊界，所以可以從文件結尾往前切出字串，
+    後面接冒號的是 key，並以括號計算層級找出最上層的 key。
+    raw 的開頭在字串中間時，被截斷的字串從第一個換行之後開始算；
+    視窗內找不到最上層的 key 時，視為整段都在工具結果內（工具結果通常是 payload 最後一個大欄位）。
+
+    Returns:
+        解碼後的字串值（依原順序，每個值後面接換行，與 PayloadScanner 送出的文字相同）
+    """
+    fields = set(fields)
+    bodies = []  # 由後往前收集的字串內容（尚未解碼）
+    depth = 0
+    pos = len(raw)
+    while pos > 0:
+        close = raw.rfind('"', 0, pos)
+        segment = raw[close + 1:pos]
+        for char in reversed(segment):
+            if char in '}]':
+                depth += 1
+            elif char in '{[':
+                depth -= 1
+        if close < 0:
+            break
+
+        is_key = segment.lstrip().startswith(':')
+        start = close
+        while True:
+            start = raw.rfind('"', 0, start)
+            if start < 0 or not _escaped(raw, start):
+                break
+        if start < 0:
+            # 被截斷的字串：是 key 時無從判斷是哪個欄位，當作工具結果的 key
+            if not is_key:
+                bodies.append(_after_first_newline(raw[:close]))
+            break
+        body = raw[start + 1:close]
+        if not is_key:
+            bodies.append(body)
+        elif depth == 1:
+            if _decode(body) in fields:
+                break
+            # 其他最上層欄位的值
+            bodies = []
+        pos = start
+    return ''.join(_decode(body) + '\n' for body in reversed(bodies))
+
+
+def scan_stream(stream: BinaryIO, classifier, fields: Iterable[str] = RESULT_FIELDS,
+                chunk_size: int = CHUNK_SIZE) -> Tuple[Optional[object], Optional[str]]:
+    """
+    從串流讀取 hook payload 並分類工具結果
+
+    比對到決定性的規則後停止解析，剩餘的輸入只讀取並保留結尾的原始位元組：
+    摘要（pytest 的統計、失敗的測試）在輸出最後面，在比對位置停下會擷取到錯誤的詳情，
+    所以讀完後以 result_tail() 取出工具結果的結尾再擷取重點行
+
+    Args:
+        stream: 二進位串流（通常是 sys.stdin.buffer）
+        classifier: ResultClassifier
+        fields: 工具結果所在的最上層欄位
+        chunk_size: 每次讀取的位元組數
+
+    Returns:
+        (ResultMatch 或 None, 通知詳情：輸出結尾的重點行，或比對位置附近的文字)
+    """
+    from result_classifier import StreamingClassifier
+    from salient_lines import TAIL_CHARS, extract
+
+    streaming = StreamingClassifier(classifier, chunk_size, tail_chars=TAIL_CHARS)
+    scanner = PayloadScanner(streaming.feed, fields)
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    # payload 最後的原始位元組（停止解析後用來取工具結果的結尾）
+    window = bytearray()
+
+    while True:
+        data = stream.read(chunk_size)
+        if not data:
+            if not scanner.done:
+                scanner.feed(decoder.decode(b'', final=True))
+            break
+        window += data
+        if len(window) > 2 * RAW_TAIL_BYTES:
+            del window[:-RAW_TAIL_BYTES]
+        if not scanner.done:
+            scanner.feed(decoder.decode(data))
+
+    match = streaming.close()
+    if match is None:
+        return None, None
+    tail = streaming.tail
+    if scanner.done:
+        raw = bytes(window[-RAW_TAIL_BYTES:]).decode('utf-8', 'replace')
+        tail = (raw if scanner._raw else result_tail(raw, fields))[-TAIL_CHARS:]
+    return match, extract(tail, match.context) or streaming.details
+
+
+def drain(stream: BinaryIO, chunk_size: int = CHUNK_SIZE):
+    """讀完並丟棄剩餘資料，避免寫入端（Claude Code）收到 EPIPE"""
+    buffer = bytearray(chunk_size)
+    readinto = getattr(stream, 'readinto', None)
+    try:
+        if readinto is not None:
+            while readinto(buffer):
+                pass
+        else:
+            while stream.read(chunk_size):
+                pass
+    except OSError:
+        pass
@@ -5,13 +5,17 @@ Claude Code會話開始hook
 """
 import sys
 import os
+import time
 from pathlib import Path
 
 # 添加語音助理路徑
+VOICE_DIR = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(Path.home() / '.claude-code-tools'))
+sys.path.insert(0, str(VOICE_DIR))
 
 def handle_session_start():
     """處理會話開始事件"""
+    started = time.time()
     try:
         project_path = sys.argv[1] if len(sys.argv) > 1 else os.getcwd()
         
@@ -21,9 +25,11 @@ def handle_session_start():
         # 註冊實例
         from claude_instances import register_current_instance, send_notification_to_daemon
         
-        instance_id = register_current_instance()
+        instance_id = register_current_instance(project_path)
         
         if instance_id:
+            from voice_trace import start as start_trace
+            start_trace('hook', ts=started)
             project_name = Path(project_path).name
             send_notification_to_daemon(
                 f"Claude Code會話已啟動：{project_name}",
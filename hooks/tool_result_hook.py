@@ -1,62 +1,79 @@
 #!/usr/bin/env python3
 """
 工具執行結果檢查hook
-檢查是否有錯誤或需要用戶注意的結果
+依 result_rules 規則表單次掃描工具輸出，比對到時發送對應情境（測試失敗、Git 衝突…）的語音通知
+工具輸出可由 stdin 的 hook JSON payload 傳入，以固定大小的區塊串流解析，記憶體用量不隨輸出大小增加
 """
 import sys
 import os
-import json
+import time
 from pathlib import Path
 
 # 添加語音助理路徑
+VOICE_DIR = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(Path.home() / '.claude-code-tools'))
+sys.path.insert(0, str(VOICE_DIR))
 
 def check_tool_result():
     """檢查工具執行結果"""
+    started = time.time()
+    stream = None
     try:
-        # 從環境變數或標準輸入讀取工具結果
+        # 舊版以環境變數傳入工具結果；新版的 hook payload 從 stdin 傳入
         tool_data = os.getenv('CLAUDE_TOOL_RESULT', '')
+        if not tool_data and not sys.stdin.isatty():
+            stream = sys.stdin.buffer
         
-        if not tool_data:
+        if not tool_data and stream is None:
             return
         
-        # 檢查是否有錯誤關鍵字
-        error_keywords = ['error', 'failed', 'exception', 'timeout', '❌', '失敗']
-        help_keywords = ['需要', 'help', 'assist', '協助', '檢查']
+        from voice_config import load_snapshot
+        from result_classifier import ResultClassifier
         
-        should_notify = False
-        emotion = "gentle"
+        config = load_snapshot(VOICE_DIR / 'config.json')
+        classifier = ResultClassifier(config.get('result_rules', []))
         
-        tool_lower = tool_data.lower()
+        if stream is not None:
+            # 逐塊解析 payload，比對到決定性的規則後停止解析，只保留 payload 結尾供擷取重點行
+            from hook_payload import scan_stream
+            match, details = scan_stream(stream, classifier)
+        else:
+            match = classifier.classify(tool_data)
+            details = None
+            if match is not None:
+                # 輸出結尾的重點行（失敗的測試、第一個編譯錯誤…），認不出格式時用比對位置附近的輸出
+                from salient_lines import extract
+                details = extract(tool_data, match.context) or ResultClassifier.snippet(tool_data, match)
         
-        for keyword in error_keywords:
-            if keyword in tool_lower:
-                should_notify = True
-                emotion = "urgent"
-                break
+        if match is None:
+            return
         
-        if not should_notify:
-            for keyword in help_keywords:
-                if keyword in tool_lower:
-                    should_notify = True
-                    emotion = "gentle"
-                    break
+        # 只追蹤需要通知的結果；追蹤 ID 經由環境變數帶到 daemon 與語音播放
+        from voice_trace import start as start_trace, mark
+        trace_id = start_trace('hook', ts=started)
+        mark(trace_id, 'classified')
         
-        if should_notify:
-            from claude_instances import send_notification_to_daemon
-            
-            # 截取前100字符作為通知訊息
-            message = tool_data[:100] + "..." if len(tool_data) > 100 else tool_data
-            
-            send_notification_to_daemon(
-                f"工具執行需要注意: {message}",
-                emotion=emotion,
-                context="tool_result"
-            )
+        # 優先交給常駐 daemon
+        from voice_client import send_notification
+        if send_notification(emotion=match.emotion, context=match.context, details=details):
+            return
+        
+        # 沒有 daemon，直接使用語音助理
+        from voice_assistant import ClaudeVoiceAssistant
+        ClaudeVoiceAssistant().notify(context=match.context, emotion=match.emotion, details=details,
+                                      trace_id=trace_id)
             
     except Exception as e:
         # 靜默失敗，不影響正常流程
         pass
+    finally:
+        if stream is not None:
+            # 解析中途出錯時仍要讀完 stdin，避免 Claude Code 寫入時收到 EPIPE
+            try:
+                from hook_payload import drain
+                drain(stream)
+            except Exception:
+                pass
 
 if __name__ == "__main__":
     check_tool_result()
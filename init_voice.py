@@ -9,6 +9,8 @@ import sys
 import json
 from pathlib import Path
 
+from project_registry import register_project
+
 def find_claude_voice_source():
     """
     檢查系統級語音工具是否存在
@@ -196,6 +198,8 @@ def main():
     print(f"\n⚙️ 創建語音配置...")
     if create_voice_config(project_dir):
         success_count += 1
+        # 登錄專案，批次更新時不必掃描磁碟
+        register_project(str(project_dir), 'init_voice.py')
 
     # 總結
     print("\n" + "=" * 50)
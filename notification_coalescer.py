@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+通知合併與去重
+同一時間窗內指紋相同（情境、專案、正規化後的訊息）的通知合併為一則，
+例如建置失敗時 hook 連續觸發多次，只會說一次「X 專案發生 3 次：…」
+"""
+import re
+import time
+import threading
+from typing import Callable, Dict, List, Optional, Any, Tuple
+
+DEFAULT_FIELDS = ['context', 'project', 'message']
+
+_HEX_RE = re.compile(r'\b(?:0x[0-9a-f]+|[0-9a-f]{7,})\b')
+_DIGITS_RE = re.compile(r'\d+')
+_SPACE_RE = re.compile(r'\s+')
+
+
+class CoalesceEntry:
+    """時間窗內的一組相同通知"""
+
+    __slots__ = ('fingerprint', 'context', 'project', 'message', 'emotion', 'details',
+                 'first_at', 'count', 'announced', 'item', 'speak', 'config')
+
+    def __init__(self, fingerprint: Tuple, context: Optional[str], project: str, message: str):
+        self.fingerprint = fingerprint
+        self.context = context
+        self.project = project
+        self.message = message
+        self.emotion = None
+        self.details = None
+        self.first_at = time.time()
+        self.count = 1
+        # 已經反映在語音中的次數
+        self.announced = 1
+        # 第一則通知排入語音佇列的項目
+        self.item = None
+        self.speak = False
+        # 第一則通知套用的設定（專案設定），合併後的訊息沿用同一份
+        self.config = None
+
+
+class NotificationCoalescer:
+    """以指紋與時間窗合併重複通知"""
+
+    def __init__(self, window_seconds: float = 10.0, fields: Optional[List[str]] = None,
+                 normalize: Optional[Dict[str, Any]] = None,
+                 on_window_closed: Optional[Callable[[CoalesceEntry], None]] = None):
+        """
+        Args:
+            window_seconds: 預設的合併時間窗（秒），從第一則通知開始計算；submit() 可逐則指定
+            fields: 組成指紋的欄位（context / project / message）
+            normalize: 訊息正規化規則
+            on_window_closed: 時間窗結束且有尚未說出的重複次數時呼叫
+        """
+        self.window_seconds = window_seconds
+        self.fields = fields or DEFAULT_FIELDS
+        self.normalize_rules = normalize or {}
+        self.on_window_closed = on_window_closed
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def normalize(self, message: str) -> str:
+        """正規化訊息，讓只差在數字、雜湊或空白的訊息視為相同"""
+        rules = self.normalize_rules
+        text = message or ''
+        if rules.get('lowercase', True):
+            text = text.lower()
+        if rules.get('hex', True):
+            text = _HEX_RE.sub('#', text)
+        if rules.get('digits', True):
+            text = _DIGITS_RE.sub('#', text)
+        if rules.get('whitespace', True):
+            text = _SPACE_RE.sub(' ', text).strip()
+        max_length = rules.get('max_length', 80)
+        if max_length:
+            text = text[:max_length]
+        return text
+
+    def fingerprint(self, context: Optional[str], project: str, message: str) -> Tuple:
+        """計算通知指紋"""
+        values = {
+            'context': context or '',
+            'project': project or '',
+            'message': self.normalize(message),
+        }
+        return tuple(values[field] for field in self.fields if field in values)
+
+    def submit(self, context: Optional[str], project: str, message: str,
+               window_seconds: Optional[float] = None) -> Tuple[CoalesceEntry, bool]:
+        """
+        登記一則通知
+
+        Args:
+            window_seconds: 這則通知適用的時間窗（預設為建立時的設定），呼叫端傳入目前設定的值
+
+        Returns:
+            (所屬的合併組, 是否為時間窗內的重複通知)
+        """
+        if window_seconds is None:
+            window_seconds = self.window_seconds
+        fingerprint = self.fingerprint(context, project, message)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(fingerprint)
+            if entry is not None and now - entry.first_at <= window_seconds:
+                entry.count += 1
+                return entry, True
+
+            entry = CoalesceEntry(fingerprint, context, project, message)
+            self._entries[fingerprint] = entry
+
+        timer = threading.Timer(window_seconds, self._close, (entry,))
+        timer.daemon = True
+        timer.start()
+        return entry, False
+
+    def _close(self, entry: CoalesceEntry):
+        """時間窗結束，有未說出的重複次數時交給回呼函式"""
+        with self._lock:
+            if self._entries.get(entry.fingerprint) is entry:
+                del self._entries[entry.fingerprint]
+        if entry.count > entry.announced and self.on_window_closed:
+            try:
+                self.on_window_closed(entry)
+            except Exception as e:
+                print(f'⚠️ 發送合併通知失敗: {e}')
+
+    def pending(self) -> int:
+        """目前仍在時間窗內的合併組數量"""
+        with self._lock:
+            return len(self._entries)
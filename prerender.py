@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+預先合成常用語音
+把所有 prefixes × contextual_messages 的組合平行合成到語音快取，
+讓當天第一則通知就能直接播放快取
+"""
+import os
+import sys
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Tuple
+
+# 添加工具路徑
+sys.path.insert(0, str(Path(__file__).parent))
+
+
+def build_texts(config) -> List[str]:
+    """
+    列出 notify() 可能說出的所有固定訊息
+
+    與 notify() 的組合方式一致：已替換 {name} 的情境訊息，再加上情緒前綴
+
+    Args:
+        config: 設定快照（ConfigSnapshot）
+    """
+    messages = list(config.messages.values())
+
+    prefixes = ['']
+    if config.get('emotional_prefix', True):
+        prefixes += [prefix for prefix in config.get('prefixes', {}).values() if prefix]
+
+    texts = []
+    seen = set()
+    for prefix in prefixes:
+        for message in messages:
+            text = f'{prefix}{message}'
+            if text not in seen:
+                seen.add(text)
+                texts.append(text)
+    return texts
+
+
+def _render_one(job: Tuple[str, int, Optional[str], str, str, str, int]) -> Tuple[str, bool]:
+    """在子行程中合成單一語音並存入快取"""
+    text, rate, voice, backend, ext, cache_dir, max_bytes = job
+
+    from tts_cache import TTSCache
+    from tts_backends import create_backend
+
+    cache = TTSCache(Path(cache_dir), max_bytes)
+    key = cache.make_key(text, voice, rate, backend)
+    temp_path = cache.new_temp_path(key, ext)
+    try:
+        if not create_backend(backend).synthesize_to_file(text, rate, voice, temp_path):
+            return text, False
+        cache.store(key, ext, temp_path)
+        return text, True
+    finally:
+        if temp_path.exists():
+            temp_path.unlink()
+
+
+def prerender_all(assistant, workers: Optional[int] = None, force: bool = False) -> Dict[str, Any]:
+    """
+    平行合成所有固定訊息
+
+    只合成快取中還沒有的項目；文字、語音、語速或後端有變動時快取鍵不同，會自動重新合成
+
+    Args:
+        assistant: ClaudeVoiceAssistant 實例
+        workers: 平行行程數（預設使用設定檔，0 表示 CPU 核心數）
+        force: 忽略既有快取，全部重新合成
+
+    Returns:
+        合成報告
+    """
+    config = assistant.config
+    backend = assistant._get_tts_backend()
+    cache = assistant._get_tts_cache()
+    report = {'total': 0, 'rendered': 0, 'skipped': 0, 'failed': 0,
+              'workers': 0, 'wall_time': 0.0, 'clips_per_second': 0.0}
+    if backend is None or cache is None:
+        report['error'] = '目前平台沒有可輸出音訊檔的語音後端'
+        return report
+    if not backend.supports_cache:
+        report['error'] = f'語音後端 {backend.name} 直接串流播放，不使用快取'
+        return report
+
+    rate = config['voice_rate']
+    voice = assistant._get_voice_for_language()
+    ext = backend.audio_ext
+
+    texts = build_texts(config)
+    report['total'] = len(texts)
+
+    pending = []
+    for text in texts:
+        key = cache.make_key(text, voice, rate, backend.cache_name)
+        if not force and cache.contains(key, ext):
+            report['skipped'] += 1
+        else:
+            pending.append((text, rate, voice, backend.cache_name, ext, str(cache.cache_dir),
+                            cache.max_bytes))
+
+    if workers is None:
+        workers = config.get('prerender', {}).get('workers', 0)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(pending) or 1))
+    report['workers'] = workers
+
+    start = time.perf_counter()
+    if pending:
+        # spawn 避免在多執行緒的 daemon 中 fork
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            futures = [pool.submit(_render_one, job) for job in pending]
+            for future in as_completed(futures):
+                try:
+                    _, ok = future.result()
+                except Exception:
+                    ok = False
+                report['rendered' if ok else 'failed'] += 1
+
+    wall_time = time.perf_counter() - start
+    report['wall_time'] = round(wall_time, 3)
+    if report['rendered'] and wall_time > 0:
+        report['clips_per_second'] = round(report['rendered'] / wall_time, 2)
+    return report
+
+
+def print_report(report: Dict[str, Any]):
+    """顯示合成報告"""
+    if report.get('error'):
+        print(f"❌ {report['error']}")
+        return
+    print('🎼 預先合成完成:')
+    print(f"  訊息總數: {report['total']}")
+    print(f"  新合成: {report['rendered']}  已快取: {report['skipped']}  失敗: {report['failed']}")
+    print(f"  行程數: {report['workers']}")
+    print(f"  耗時: {report['wall_time']:.2f} 秒  速度: {report['clips_per_second']:.2f} 段/秒")
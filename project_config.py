@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+專案層級的語音設定
+由工作目錄往上逐層尋找專案設定，覆蓋全域 config.json：
+
+    全域 config.json
+      < 較上層目錄的 .claude-voice/config.json < .claude-voice-config.json
+      < …
+      < 工作目錄的 .claude-voice/config.json < .claude-voice-config.json
+
+專案設定只能覆蓋 PROJECT_KEYS 中的項目（啟用與否、模式、語速、語音、前綴）。
+每個檔案的內容依 (mtime_ns, 大小) 快取，每個目錄的合併結果也會保留，
+設定檔沒有變動時只需要 stat。
+
+is_voice_enabled() 是 claude_notify.py 常用路徑的一部分，只依賴 os，不匯入 json
+"""
+from __future__ import annotations
+
+import os
+
+# 每個目錄中的專案設定檔，後者優先
+PROJECT_CONFIG_FILES = (os.path.join('.claude-voice', 'config.json'), '.claude-voice-config.json')
+
+# 全域設定檔
+GLOBAL_CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config.json')
+
+# 專案設定可以覆蓋的項目
+PROJECT_KEYS = ('voice_enabled', 'mode', 'voice_rate', 'voice_language', 'voice',
+                'emotional_prefix', 'prefixes')
+
+VALID_MODES = ('full', 'silent', 'off')
+
+# {路徑: ((mtime_ns, 大小), 值)}
+_enabled_cache = {}
+_layer_cache = {}
+# {(工作目錄, 全域設定路徑): (全域快照, 各層戳記, 合併後快照)}
+_resolved_cache = {}
+
+
+def _stamp(path: str):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def project_config_paths(cwd: str | None = None) -> list:
+    """由近到遠列出可能的專案設定檔（同一目錄中優先者在前）"""
+    directory = os.path.abspath(cwd or os.getcwd())
+    paths = []
+    while True:
+        for name in reversed(PROJECT_CONFIG_FILES):
+            paths.append(os.path.join(directory, name))
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            return paths
+        directory = parent
+
+
+def scan_voice_enabled(data: bytes):
+    """
+    不解析 JSON，直接在設定檔內容中找 "voice_enabled": true/false
+
+    Returns:
+        True / False；沒有此欄位時回傳 'missing'；欄位出現多次或值不是布林時回傳 None，交給 json 判斷
+    """
+    key = b'"voice_enabled"'
+    count = data.count(key)
+    if count == 0:
+        return 'missing'
+    if count > 1:
+        return None
+
+    rest = data[data.index(key) + len(key):].lstrip()
+    if not rest.startswith(b':'):
+        return None
+    rest = rest[1:].lstrip()
+    if rest.startswith(b'true'):
+        return True
+    if rest.startswith(b'false'):
+        return False
+    return None
+
+
+def _read_voice_enabled(path: str):
+    """單一設定檔的 voice_enabled：True / False，沒有設定或無法讀取時為 None"""
+    stamp = _stamp(path)
+    if stamp is None:
+        return None
+    cached = _enabled_cache.get(path)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except OSError as e:
+        print(f'⚠️ 檢查語音設定失敗: {e}')
+        return None
+
+    enabled = scan_voice_enabled(data)
+    if enabled == 'missing':
+        enabled = None
+    elif enabled is None:
+        # 無法直接判讀時才解析完整 JSON
+        try:
+            import json
+            value = json.loads(data.decode('utf-8')).get('voice_enabled')
+            enabled = value if isinstance(value, bool) else None
+        except Exception as e:
+            print(f'⚠️ 檢查語音設定失敗: {e}')
+            enabled = None
+
+    _enabled_cache[path] = (stamp, enabled)
+    return enabled
+
+
+def is_voice_enabled(cwd: str | None = None, global_path: str = GLOBAL_CONFIG_PATH) -> bool:
+    """
+    目前專案是否啟用語音通知：由工作目錄往上，最近一個設定 voice_enabled 的檔案為準，
+    都沒有設定時看全域 config.json，預設啟用
+    """
+    for path in project_config_paths(cwd) + [global_path]:
+        enabled = _read_voice_enabled(path)
+        if enabled is not None:
+            return enabled
+    return True
+
+
+def _project_layer(path: str):
+    """讀取單一專案設定檔中可覆蓋的項目，回傳 (戳記, 覆蓋項目)"""
+    stamp = _stamp(path)
+    if stamp is None:
+        return None, None
+    cached = _layer_cache.get(path)
+    if cached is not None and cached[0] == stamp:
+        return cached
+
+    import json
+
+    overrides = {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f'⚠️ 讀取專案語音設定失敗 {path}: {e}')
+        data = {}
+    if isinstance(data, dict):
+        for key in PROJECT_KEYS:
+            if key not in data:
+                continue
+            value = data[key]
+            # 舊版 set_voice.sh 以 mode 記錄通知方式（"direct"），不是語音模式
+            if key == 'mode' and value not in VALID_MODES:
+                continue
+            overrides[key] = value
+
+    _layer_cache[path] = (stamp, overrides)
+    return stamp, overrides
+
+
+def resolve_config(cwd: str | None = None, global_path=GLOBAL_CONFIG_PATH):
+    """
+    取得工作目錄適用的設定快照（全域設定加上各層專案設定）
+
+    Args:
+        cwd: 工作目錄（預設為目前目錄；daemon 使用發出通知的客戶端目錄）
+        global_path: 全域設定檔
+
+    Returns:
+        ConfigSnapshot；沒有任何專案設定時就是全域快照本身
+    """
+    from voice_config import ConfigSnapshot, load_snapshot, merge_config
+
+    base = load_snapshot(global_path)
+    cwd = os.path.abspath(cwd or os.getcwd())
+
+    # 由遠到近套用
+    stamps = []
+    layers = []
+    for path in reversed(project_config_paths(cwd)):
+        stamp, overrides = _project_layer(path)
+        if stamp is None:
+            continue
+        stamps.append((path, stamp))
+        if overrides:
+            layers.append(overrides)
+
+    if not layers:
+        return base
+
+    cache_key = (cwd, str(global_path))
+    cached = _resolved_cache.get(cache_key)
+    stamps = tuple(stamps)
+    if cached is not None and cached[0] is base and cached[1] == stamps:
+        return cached[2]
+
+    merged = base.to_dict()
+    for overrides in layers:
+        merged = merge_config(overrides, merged)
+    snapshot = ConfigSnapshot(merged, stamp=base.stamp)
+    _resolved_cache[cache_key] = (base, stamps, snapshot)
+    return snapshot
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+專案登錄表
+記錄所有設定過語音通知的專案，批次命令（update_all_projects.sh、setup_claude_md.py --batch）
+直接讀取登錄表，不再以 `find ~` 掃描整個家目錄。
+
+- init_voice.py、project_setup.py、set_voice.sh 設定專案時會自動登錄
+- rescan 用來找出登錄表建立前就設定好的專案：略過 node_modules、隱藏目錄等，
+  並記錄每個目錄的修改時間與子目錄；再次掃描時修改時間沒變的目錄不必重新列出內容，
+  只需要 stat
+
+用法:
+    python3 project_registry.py list [--base 目錄] [--rescan]
+    python3 project_registry.py add [專案路徑] [--source 來源]
+    python3 project_registry.py remove 專案路徑
+    python3 project_registry.py rescan [根目錄 ...] [--full]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional
+
+from voice_paths import STATE_DIR
+
+# 登錄表與掃描索引
+REGISTRY_PATH = os.path.join(STATE_DIR, 'projects.json')
+SCAN_INDEX_PATH = os.path.join(STATE_DIR, 'projects-scan.json')
+
+# 目錄中有這些項目就是已設定語音通知的專案
+PROJECT_MARKERS = ('.claude-voice', '.claude-voice-config.json')
+
+# 掃描時略過的目錄（另外所有隱藏目錄都會略過）
+IGNORED_DIRS = frozenset({
+    'node_modules', '__pycache__', 'venv', 'site-packages', 'bower_components',
+    'target', 'build', 'dist', 'Library', 'Applications', 'snap',
+})
+
+# 掃描的最大深度（相對於根目錄）
+MAX_DEPTH = 8
+
+
+@contextmanager
+def _locked():
+    """同時有多個設定程序登錄專案時，避免互相覆蓋"""
+    os.makedirs(STATE_DIR, mode=0o700, exist_ok=True)
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+    from voice_config import lock_exclusive
+
+    with open(REGISTRY_PATH + '.lock', 'a') as lock:
+        lock_exclusive(lock, 'projects')
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _load(path: str) -> Dict[str, Any]:
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _store(path: str, data: Dict[str, Any]):
+    """先寫入暫存檔再替換，讀取端不會看到寫到一半的檔案"""
+    os.makedirs(STATE_DIR, mode=0o700, exist_ok=True)
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=1)
+        os.replace(temp_path, path)
+    except OSError:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def _projects(registry: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    projects = registry.get('projects')
+    if not isinstance(projects, dict):
+        projects = registry['projects'] = {}
+    return projects
+
+
+def has_marker(path: str) -> bool:
+    """目錄是否仍然設定了語音通知"""
+    return any(os.path.exists(os.path.join(path, marker)) for marker in PROJECT_MARKERS)
+
+
+def register_project(path: Optional[str] = None, source: str = 'manual') -> str:
+    """
+    登錄專案（已登錄時只更新來源與時間）
+
+    Args:
+        path: 專案目錄（預設為目前目錄）
+        source: 登錄來源，例如 init_voice.py
+
+    Returns:
+        登錄的絕對路徑
+    """
+    path = os.path.realpath(path or os.getcwd())
+    with _locked():
+        registry = _load(REGISTRY_PATH)
+        _projects(registry)[path] = {
+            'name': os.path.basename(path),
+            'source': source,
+            'registered': time.strftime('%Y-%m-%d %H:%M:%S'),
+        }
+        _store(REGISTRY_PATH, registry)
+    return path
+
+
+def unregister_project(path: str) -> bool:
+    """移除登錄，回傳是否原本有登錄"""
+    path = os.path.realpath(path)
+    with _locked():
+        registry = _load(REGISTRY_PATH)
+        if _projects(registry).pop(path, None) is None:
+            return False
+        _store(REGISTRY_PATH, registry)
+    return True
+
+
+def list_projects(base: Optional[str] = None, prune: bool = True) -> List[str]:
+    """
+    列出已登錄的專案
+
+    Args:
+        base: 只列出此目錄之下的專案
+        prune: 移除已不存在或已移除語音設定的專案
+    """
+    projects = _projects(_load(REGISTRY_PATH))
+    paths = sorted(projects)
+
+    if prune:
+        stale = [path for path in paths if not has_marker(path)]
+        if stale:
+            with _locked():
+                registry = _load(REGISTRY_PATH)
+                for path in stale:
+                    # 鎖定後重新確認，期間可能剛被重新設定
+                    if not has_marker(path):
+                        _projects(registry).pop(path, None)
+                _store(REGISTRY_PATH, registry)
+            paths = [path for path in paths if path not in stale]
+
+    if base:
+        base = os.path.realpath(base)
+        prefix = base.rstrip(os.sep) + os.sep
+        paths = [path for path in paths if path == base or path.startswith(prefix)]
+    return paths
+
+
+def _ignored(name: str, ignore: frozenset) -> bool:
+    return name.startswith('.') or name in ignore
+
+
+def _walk(root: str, old_dirs: Dict[str, list], new_dirs: Dict[str, list],
+          found: List[str], ignore: frozenset, stats: Dict[str, int]):
+    """
+    由 root 往下找專案
+
+    目錄的修改時間只在直接子項目新增、刪除或改名時改變：
+    修改時間與索引相同時沿用記錄的子目錄與標記，不必 scandir；
+    每個子目錄仍會 stat，較深層的變動不會遺漏。
+    """
+    stack = [(root, 0)]
+    while stack:
+        path, depth = stack.pop()
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            continue
+        stats['dirs'] += 1
+
+        cached = old_dirs.get(path)
+        if cached is not None and cached[0] == mtime:
+            subdirs, marker = cached[1], cached[2]
+            stats['reused'] += 1
+        else:
+            subdirs, marker = [], False
+            try:
+                with os.scandir(path) as entries:
+                    for entry in entries:
+                        if entry.name in PROJECT_MARKERS:
+                            marker = True
+                        elif not _ignored(entry.name, ignore) and entry.is_dir(follow_symlinks=False):
+                            subdirs.append(entry.name)
+            except OSError:
+                continue
+            stats['listed'] += 1
+
+        new_dirs[path] = [mtime, subdirs, marker]
+        if marker:
+            found.append(path)
+        if depth < MAX_DEPTH:
+            for name in subdirs:
+                stack.append((os.path.join(path, name), depth + 1))
+
+
+def rescan(roots: Optional[Iterable[str]] = None, full: bool = False,
+           ignore: Iterable[str] = IGNORED_DIRS) -> Dict[str, Any]:
+    """
+    掃描磁碟，把找到的專案加入登錄表並移除失效的專案
+
+    Args:
+        roots: 掃描的根目錄（預設為家目錄）
+        full: 忽略掃描索引，重新列出每個目錄
+        ignore: 略過的目錄名稱
+
+    Returns:
+        {'dirs', 'listed', 'reused', 'found', 'added', 'removed', 'seconds'}
+    """
+    started = time.perf_counter()
+    roots = [os.path.realpath(os.path.expanduser(root)) for root in (roots or ['~'])]
+    ignore = frozenset(ignore)
+
+    index = {} if full else _load(SCAN_INDEX_PATH)
+    old_dirs = index.get('dirs') if isinstance(index.get('dirs'), dict) else {}
+
+    stats = {'dirs': 0, 'listed': 0, 'reused': 0}
+    new_dirs: Dict[str, list] = {}
+    found: List[str] = []
+    for root in roots:
+        _walk(root, old_dirs, new_dirs, found, ignore, stats)
+
+    # 保留其他根目錄的索引
+    prefixes = tuple(root.rstrip(os.sep) + os.sep for root in roots)
+    for path, entry in old_dirs.items():
+        if path not in new_dirs and path not in roots and not path.startswith(prefixes):
+            new_dirs[path] = entry
+    _store(SCAN_INDEX_PATH, {'roots': sorted(set(index.get('roots', [])) | set(roots)),
+                             'dirs': new_dirs})
+
+    added = removed = 0
+    with _locked():
+        registry = _load(REGISTRY_PATH)
+        projects = _projects(registry)
+        for path in found:
+            if path not in projects:
+                projects[path] = {'name': os.path.basename(path), 'source': 'scan',
+                                  'registered': time.strftime('%Y-%m-%d %H:%M:%S')}
+                added += 1
+        for path in list(projects):
+            if not has_marker(path):
+                del projects[path]
+                removed += 1
+        if added or removed or not os.path.exists(REGISTRY_PATH):
+            _store(REGISTRY_PATH, registry)
+
+    stats.update(found=len(found), added=added, removed=removed,
+                 seconds=time.perf_counter() - started)
+    return stats
+
+
+def main():
+    """命令列介面"""
+    parser = argparse.ArgumentParser(description='語音通知專案登錄表')
+    sub = parser.add_subparsers(dest='command')
+
+    list_parser = sub.add_parser('list', help='列出已登錄的專案（每行一個路徑）')
+    list_parser.add_argument('--base', help='只列出此目錄之下的專案')
+    list_parser.add_argument('--rescan', action='store_true', help='先增量掃描家目錄')
+
+    add_parser = sub.add_parser('add', help='登錄專案')
+    add_parser.add_argument('path', nargs='?', help='專案路徑（預設為當前目錄）')
+    add_parser.add_argument('--source', default='manual', help='登錄來源')
+
+    remove_parser = sub.add_parser('remove', help='移除登錄')
+    remove_parser.add_argument('path')
+
+    scan_parser = sub.add_parser('rescan', help='掃描磁碟尋找專案')
+    scan_parser.add_argument('roots', nargs='*', help='掃描的根目錄（預設為家目錄）')
+    scan_parser.add_argument('--full', action='store_true', help='忽略索引重新掃描')
+
+    args = parser.parse_args()
+
+    if args.command == 'add':
+        print(f"✅ 已登錄專案: {register_project(args.path, args.source)}")
+    elif args.command == 'remove':
+        if unregister_project(args.path):
+            print(f"✅ 已移除登錄: {args.path}")
+        else:
+            print(f"⚠️ 專案未登錄: {args.path}")
+    elif args.command == 'rescan':
+        stats = rescan(args.roots, full=args.full)
+        print(f"🔍 掃描 {stats['dirs']} 個目錄（重新列出 {stats['listed']} 個）"
+              f"，耗時 {stats['seconds']:.2f} 秒")
+        print(f"📁 找到 {stats['found']} 個專案，新增 {stats['added']}，移除 {stats['removed']}")
+    elif args.command == 'list':
+        # 第一次使用時掃描一次，納入登錄表建立前就設定好的專案
+        if args.rescan or not os.path.exists(SCAN_INDEX_PATH):
+            stats = rescan()
+            print(f"🔍 已掃描 {stats['dirs']} 個目錄，找到 {stats['found']} 個專案",
+                  file=sys.stderr)
+        for path in list_projects(args.base):
+            print(path)
+    else:
+        parser.print_help()
+
+
+if __name__ == '__main__':
+    main()
@@ -3,12 +3,50 @@
 專案快速設定語音助理腳本
 為新的 Claude Code 專案快速設置語音通知功能
 """
-import os
 import sys
 import json
-import shutil
 from pathlib import Path
 
+from project_registry import register_project
+
+# 本地語音助理需要複製的核心檔案
+CORE_FILES = [
+    'claude_notify_direct.py',
+    'voice_assistant.py', 
+    'voice_paths.py',
+    'voice_config.py',
+    'project_config.py',
+    'voice_client.py',
+    'tts_cache.py',
+    'tts_backends.py',
+    'espeak_lib.py',
+    'audio_detector.py',
+    'voice_metrics.py',
+    'voice_trace.py',
+    'text_chunker.py',
+    'speech_queue.py',
+    'notification_coalescer.py',
+    'prerender.py',
+    'config.json'
+]
+
+# 本地語音通知入口（.claude-voice/claude_notify.py）
+LOCAL_NOTIFY_SCRIPT = '''#!/usr/bin/env python3
+"""
+專案本地語音通知工具
+"""
+import sys
+from pathlib import Path
+
+# 添加當前目錄到路徑
+sys.path.insert(0, str(Path(__file__).parent))
+
+from claude_notify_direct import main
+
+if __name__ == "__main__":
+    main()
+'''
+
 def setup_project_voice(project_path=None):
     """為專案設置語音助理功能"""
     
@@ -57,22 +95,20 @@ def copy_voice_files_to_project(source_dir, local_voice_dir):
     # 建立目錄
     local_voice_dir.mkdir(exist_ok=True)
     
-    # 需要複製的核心檔案
-    core_files = [
-        'claude_notify_direct.py',
-        'voice_assistant.py', 
-        'config.json'
-    ]
+    from provision import copy_if_changed
     
     print(f"📦 複製語音助理檔案...")
     
-    for file_name in core_files:
+    for file_name in CORE_FILES:
         source_file = source_dir / file_name
         dest_file = local_voice_dir / file_name
         
         if source_file.exists():
-            shutil.copy2(source_file, dest_file)
-            print(f"  ✅ {file_name}")
+            # 內容相同的檔案不重寫
+            if copy_if_changed(source_file, dest_file):
+                print(f"  ✅ {file_name}")
+            else:
+                print(f"  ✓ {file_name} (未變更)")
         else:
             print(f"  ⚠️  跳過 {file_name} (不存在)")
     
@@ -82,27 +118,14 @@ def copy_voice_files_to_project(source_dir, local_voice_dir):
 def create_local_notify_script(local_voice_dir):
     """建立本地語音通知腳本"""
     
-    notify_script = local_voice_dir / 'claude_notify.py'
+    from provision import write_if_changed
     
-    with open(notify_script, 'w', encoding='utf-8') as f:
-        f.write('''#!/usr/bin/env python3
-"""
-專案本地語音通知工具
-"""
-import sys
-from pathlib import Path
-
-# 添加當前目錄到路徑
-sys.path.insert(0, str(Path(__file__).parent))
-
-from claude_notify_direct import main
-
-if __name__ == "__main__":
-    main()
-''')
+    notify_script = local_voice_dir / 'claude_notify.py'
     
-    os.chmod(notify_script, 0o755)
-    print(f"  ✅ claude_notify.py (本地入口)")
+    if write_if_changed(notify_script, LOCAL_NOTIFY_SCRIPT.encode('utf-8'), 0o755):
+        print(f"  ✅ claude_notify.py (本地入口)")
+    else:
+        print(f"  ✓ claude_notify.py (本地入口，未變更)")
 
 def create_project_config(project_dir, voice_type):
     """建立專案語音設定檔"""
@@ -124,6 +147,9 @@ def create_project_config(project_dir, voice_type):
     
     print(f"📋 建立專案設定檔: {config_file}")
 
+    # 登錄專案，批次更新時不必掃描磁碟
+    register_project(str(project_dir), 'project_setup.py')
+
 def detect_and_setup():
     """自動偵測並設置最佳的語音助理配置"""
     
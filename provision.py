@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+"""
+批次佈署語音通知到多個專案
+
+先為每個專案算出應有的檔案內容（本地語音助理檔案、CLAUDE.md 說明、.claude/hooks.json），
+以 SHA-256 比對現有檔案，只寫入有差異的檔案。各專案在執行緒池中平行處理，
+最後列出每個專案的結果與耗時；--dry-run 只顯示差異不寫入。
+
+用法:
+    python3 provision.py                     # 登錄表中的所有專案
+    python3 provision.py 專案路徑 ...
+    python3 provision.py --dry-run --hooks --jobs 8
+"""
+import os
+import sys
+import json
+import time
+import difflib
+import hashlib
+import argparse
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional, Union
+
+# 語音助理原始碼位置
+SOURCE_DIR = Path(__file__).resolve().parent
+
+# 預設平行處理的專案數
+DEFAULT_JOBS = 8
+
+# dry-run 時每個檔案最多顯示的差異行數
+DIFF_MAX_LINES = 60
+
+PathLike = Union[str, Path]
+
+
+def file_digest(path: PathLike) -> Optional[str]:
+    """檔案內容的 SHA-256，檔案不存在時回傳 None"""
+    digest = hashlib.sha256()
+    try:
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+
+def _file_mode(path: PathLike) -> Optional[int]:
+    try:
+        return os.stat(path).st_mode & 0o777
+    except OSError:
+        return None
+
+
+class FileChange:
+    """單一檔案的目標狀態與比對結果"""
+
+    __slots__ = ('path', 'content', 'mode', 'action')
+
+    def __init__(self, path: PathLike, content: bytes, mode: Optional[int] = None):
+        self.path = Path(path)
+        self.content = content
+        self.mode = mode
+
+        current = file_digest(self.path)
+        if current is None:
+            self.action = 'create'
+        elif current != hashlib.sha256(content).hexdigest():
+            self.action = 'update'
+        elif mode is not None and _file_mode(self.path) != mode:
+            self.action = 'chmod'
+        else:
+            self.action = 'unchanged'
+
+    @property
+    def changed(self) -> bool:
+        return self.action != 'unchanged'
+
+    def apply(self):
+        """寫入檔案（先寫暫存檔再替換）"""
+        if self.action == 'unchanged':
+            return
+        if self.action == 'chmod':
+            os.chmod(self.path, self.mode)
+            return
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.path.with_name(f'.{self.path.name}.{os.getpid()}.tmp')
+        try:
+            with open(temp_path, 'wb') as f:
+                f.write(self.content)
+            mode = self.mode if self.mode is not None else _file_mode(self.path)
+            if mode is not None:
+                os.chmod(temp_path, mode)
+            os.replace(temp_path, self.path)
+        except OSError:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
+
+    def diff(self, max_lines: int = DIFF_MAX_LINES) -> List[str]:
+        """目前內容與目標內容的差異"""
+        if self.action == 'chmod':
+            return [f'mode {oct(_file_mode(self.path) or 0)} -> {oct(self.mode)}']
+        try:
+            new_text = self.content.decode('utf-8')
+            old_text = self.path.read_text(encoding='utf-8') if self.action == 'update' else ''
+        except (OSError, UnicodeDecodeError):
+            return [f'(二進位檔案，{len(self.content)} bytes)']
+
+        lines = list(difflib.unified_diff(old_text.splitlines(), new_text.splitlines(),
+                                          str(self.path), str(self.path), lineterm=''))
+        if len(lines) > max_lines:
+            lines = lines[:max_lines] + [f'... (還有 {len(lines) - max_lines} 行)']
+        return lines
+
+
+def write_if_changed(path: PathLike, content: bytes, mode: Optional[int] = None) -> bool:
+    """內容或權限不同時才寫入，回傳是否有寫入"""
+    change = FileChange(path, content, mode)
+    change.apply()
+    return change.changed
+
+
+def copy_if_changed(source: PathLike, dest: PathLike) -> bool:
+    """內容不同時才複製（保留權限），回傳是否有複製"""
+    with open(source, 'rb') as f:
+        content = f.read()
+    return write_if_changed(dest, content, _file_mode(source))
+
+
+def plan_project(project_dir: PathLike, source_dir: PathLike = SOURCE_DIR,
+                 hooks: bool = False) -> List[FileChange]:
+    """
+    算出專案應有的檔案並與現有檔案比對
+
+    - 有 .claude-voice/ 的專案：更新本地語音助理檔案與入口腳本
+    - CLAUDE.md：缺少語音通知說明時加入
+    - hooks=True：合併語音助理的 hooks 到 .claude/hooks.json
+    """
+    from project_setup import CORE_FILES, LOCAL_NOTIFY_SCRIPT
+    from setup_claude_md import has_voice_instructions, with_voice_instructions
+
+    project_dir = Path(project_dir)
+    source_dir = Path(source_dir)
+    changes = []
+
+    local_voice_dir = project_dir / '.claude-voice'
+    if local_voice_dir.is_dir():
+        for file_name in CORE_FILES:
+            source_file = source_dir / file_name
+            if source_file.exists():
+                changes.append(FileChange(local_voice_dir / file_name, source_file.read_bytes(),
+                                          _file_mode(source_file)))
+        changes.append(FileChange(local_voice_dir / 'claude_notify.py',
+                                  LOCAL_NOTIFY_SCRIPT.encode('utf-8'), 0o755))
+
+    template_path = source_dir / 'claude_md_template.md'
+    if template_path.exists():
+        claude_md = project_dir / 'CLAUDE.md'
+        template = template_path.read_text(encoding='utf-8')
+        if not claude_md.exists():
+            changes.append(FileChange(claude_md, template.encode('utf-8')))
+        else:
+            content = claude_md.read_text(encoding='utf-8')
+            if not has_voice_instructions(content):
+                changes.append(FileChange(
+                    claude_md, with_voice_instructions(content, template).encode('utf-8')))
+
+    if hooks:
+        from setup_hooks import voice_hooks_config
+
+        hooks_file = project_dir / '.claude' / 'hooks.json'
+        existing = {}
+        if hooks_file.exists():
+            try:
+                existing = json.loads(hooks_file.read_text(encoding='utf-8'))
+            except (OSError, ValueError):
+                existing = {}
+        existing.update(voice_hooks_config(project_dir))
+        changes.append(FileChange(hooks_file, json.dumps(existing, indent=2,
+                                                         ensure_ascii=False).encode('utf-8')))
+
+    return changes
+
+
+def provision_project(project_dir: PathLike, source_dir: PathLike = SOURCE_DIR,
+                      hooks: bool = False, dry_run: bool = False) -> Dict[str, Any]:
+    """
+    處理單一專案
+
+    Returns:
+        {'project', 'changes', 'counts', 'seconds', 'error'}
+    """
+    started = time.perf_counter()
+    result = {'project': str(project_dir), 'changes': [], 'counts': {}, 'error': None}
+    try:
+        changes = plan_project(project_dir, source_dir, hooks)
+        for change in changes:
+            result['counts'][change.action] = result['counts'].get(change.action, 0) + 1
+            if not change.changed:
+                continue
+            if not dry_run:
+                change.apply()
+            result['changes'].append(change)
+    except Exception as e:
+        result['error'] = str(e)
+    result['seconds'] = time.perf_counter() - started
+    return result
+
+
+def provision(projects: List[PathLike], source_dir: PathLike = SOURCE_DIR, hooks: bool = False,
+              dry_run: bool = False, jobs: int = DEFAULT_JOBS, on_result=None) -> List[Dict[str, Any]]:
+    """
+    平行處理多個專案
+
+    Args:
+        on_result: 每個專案完成時呼叫（用於顯示進度）
+
+    Returns:
+        依專案路徑排序的結果
+    """
+    results = []
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        futures = [executor.submit(provision_project, project, source_dir, hooks, dry_run)
+                   for project in projects]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            if on_result is not None:
+                on_result(result)
+    return sorted(results, key=lambda result: result['project'])
+
+
+def _print_result(result: Dict[str, Any], dry_run: bool):
+    name = Path(result['project']).name
+    elapsed = f"{result['seconds'] * 1000:.1f}ms"
+    if result['error']:
+        print(f"❌ {name}: {result['error']} ({elapsed})")
+        return
+
+    counts = result['counts']
+    changed = len(result['changes'])
+    summary = ', '.join(f'{action} {count}' for action, count in sorted(counts.items())) or '無檔案'
+    icon = '✓' if not changed else ('📝' if dry_run else '✅')
+    print(f"{icon} {name}: {summary} ({elapsed})")
+    if dry_run:
+        for change in result['changes']:
+            print(f"   {change.action}: {change.path}")
+            for line in change.diff():
+                print(f"     {line}")
+
+
+def main():
+    """主函數"""
+    parser = argparse.ArgumentParser(description='批次佈署語音通知到多個專案')
+    parser.add_argument('projects', nargs='*', help='專案路徑（預設為登錄表中的所有專案）')
+    parser.add_argument('--dry-run', '-n', action='store_true', help='只顯示差異，不寫入')
+    parser.add_argument('--hooks', action='store_true', help='同時更新 .claude/hooks.json')
+    parser.add_argument('--jobs', '-j', type=int, default=DEFAULT_JOBS, help='平行處理的專案數')
+    parser.add_argument('--source', default=str(SOURCE_DIR), help='語音助理原始碼位置')
+    args = parser.parse_args()
+
+    projects = args.projects
+    if not projects:
+        from project_registry import list_projects
+        projects = list_projects()
+    if not projects:
+        print("❌ 沒有要處理的專案（可執行 python3 project_registry.py rescan）")
+        sys.exit(1)
+
+    print(f"🚀 {'預覽' if args.dry_run else '佈署'} {len(projects)} 個專案（{args.jobs} 個並行）")
+    started = time.perf_counter()
+    results = provision([os.path.abspath(project) for project in projects], args.source,
+                        hooks=args.hooks, dry_run=args.dry_run, jobs=args.jobs)
+    for result in results:
+        _print_result(result, args.dry_run)
+
+    changed = sum(1 for result in results if result['changes'])
+    failed = sum(1 for result in results if result['error'])
+    files = sum(len(result['changes']) for result in results)
+    verb = '需要更新' if args.dry_run else '已更新'
+    print(f"\n📊 {len(results)} 個專案，{verb} {changed} 個（{files} 個檔案），失敗 {failed} 個，"
+          f"共 {time.perf_counter() - started:.2f} 秒")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
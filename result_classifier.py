@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+工具執行結果分類
+把規則表（config.json 的 result_rules）編譯一次，直接對應到 contextual_messages 的情境
+（test_failed、git_conflict、permission_denied…）
+
+規則依順序決定優先權。文字只轉一次小寫，之後依規則順序以 str.find 探測，
+第一條比對到的規則就是結果，後面的規則不再掃描。
+長文字（ANCHOR_MIN_CHARS 以上）先找錨點：第一次分類長文字時替關鍵字挑出共用的錨點子字串
+（例如 failed、build failed、tests failed 共用 fail），整段文字先找錨點，錨點不存在時共用它的關鍵字都不必再掃描；
+每個字串在一次分類中最多只搜尋一次。
+（在 CPython 中，把所有關鍵字合成一個正規表示式（即使以字首樹合併、或加上 IGNORECASE 直接比對原文）
+都比逐一搜尋慢好幾倍，見 benchmarks/bench_result_classifier.py）
+
+關鍵字以小寫比對；patterns 為進階用的正規表示式，以 IGNORECASE 比對原文。
+比對位置一律換算回原文的位置（少數字元轉小寫後會變長，例如 İ）。
+"""
+import re
+from typing import Any, Dict, List, Optional
+
+# 通知內容擷取比對位置前後的字元數
+SNIPPET_RADIUS = 80
+
+# 文字長度達此值才先找錨點（短文字直接搜尋關鍵字，省下挑選錨點的時間）
+ANCHOR_MIN_CHARS = 32 * 1024
+
+# 錨點子字串的長度範圍（太短的錨點在一般輸出中幾乎一定出現，過濾不了什麼；更長則只增加編譯時間）
+MIN_ANCHOR_CHARS = 4
+MAX_ANCHOR_CHARS = 8
+
+# 轉小寫後長度會改變的字元（Unicode 中只有 U+0130 İ → i̇）
+_EXPANDING_CHAR = '\u0130'
+
+
+def _original_offset(text: str, index: int) -> int:
+    """把 text.lower() 中的位置換算回 text 中的位置"""
+    shift = 0
+    position = text.find(_EXPANDING_CHAR)
+    while 0 <= position and position + shift < index:
+        shift += 1
+        position = text.find(_EXPANDING_CHAR, position + 1)
+    return index - shift
+
+
+def _choose_anchors(keywords: List[str]) -> Dict[str, str]:
+    """
+    替每個關鍵字挑選錨點：關鍵字一定包含它的錨點，所以錨點不在文字中時關鍵字也不在
+
+    貪婪地挑出被最多個關鍵字共用的子字串（同樣多時取較長者）；沒有共用子字串的關鍵字以自己為錨點。
+    """
+    anchors = {}
+    # 每個關鍵字的所有子字串 → 包含它的關鍵字
+    owners: Dict[str, set] = {}
+    for keyword in keywords:
+        for i in range(len(keyword) - MIN_ANCHOR_CHARS + 1):
+            for j in range(i + MIN_ANCHOR_CHARS, min(i + MAX_ANCHOR_CHARS, len(keyword)) + 1):
+                owners.setdefault(keyword[i:j], set()).add(keyword)
+    shared = {substring: group for substring, group in owners.items() if len(group) >= 2}
+    while shared:
+        anchor = max(shared, key=lambda substring: (len(shared[substring]), len(substring),
+                                                    substring))
+        for keyword in shared[anchor]:
+            anchors[keyword] = anchor
+        covered = shared[anchor]
+        shared = {substring: group - covered for substring, group in shared.items()}
+        shared = {substring: group for substring, group in shared.items() if len(group) >= 2}
+    for keyword in keywords:
+        anchors.setdefault(keyword, keyword)
+    return anchors
+
+
+class ResultMatch:
+    """分類結果"""
+
+    __slots__ = ('context', 'emotion', 'keyword', 'rank', 'start', 'end')
+
+    def __init__(self, context: str, emotion: Optional[str], keyword: str, rank: int,
+                 start: int, end: int):
+        self.context = context
+        self.emotion = emotion
+        self.keyword = keyword
+        # 規則在表中的順序（越小越優先）
+        self.rank = rank
+        self.start = start
+        self.end = end
+
+    def __repr__(self) -> str:
+        return f'ResultMatch({self.context!r}, keyword={self.keyword!r}, at={self.start})'
+
+
+class ResultClassifier:
+    """以規則表編譯的分類器"""
+
+    def __init__(self, rules: List[Dict[str, Any]]):
+        """
+        Args:
+            rules: [{'context': ..., 'emotion': ..., 'keywords': [...], 'patterns': [...]}, ...]
+        """
+        self.rules = list(rules)
+
+        # 每條規則編譯成 (小寫關鍵字, 已編譯的正規表示式)
+        self._probes = []
+        seen = set()
+        for rule in self.rules:
+            keywords = []
+            for keyword in rule.get('keywords', []):
+                keyword = keyword.lower()
+                # 同一關鍵字只歸屬於第一條規則
+                if keyword and keyword not in seen:
+                    seen.add(keyword)
+                    keywords.append(keyword)
+            patterns = [re.compile(pattern, re.IGNORECASE) for pattern in rule.get('patterns', [])]
+            self._probes.append((keywords, patterns))
+
+        # 串流掃描時相鄰區塊需要重疊的長度
+        self.max_keyword_length = max((len(keyword) for keyword in seen), default=0)
+        # 關鍵字 → 錨點子字串；第一次分類長文字時才挑選（短文字直接搜尋關鍵字，省下編譯時間）
+        self._anchors: Optional[Dict[str, str]] = None
+
+    def is_decisive(self, rank: int) -> bool:
+        """比對到此規則後是否可以停止讀取（第一條規則或標記 decisive 的規則）"""
+        return rank == 0 or bool(self.rules[rank].get('decisive'))
+
+    def classify(self, text: str, max_rank: Optional[int] = None) -> Optional[ResultMatch]:
+        """
+        回傳優先權最高的比對結果，沒有任何比對時回傳 None
+
+        Args:
+            text: 工具輸出
+            max_rank: 只檢查優先權高於此順序的規則（串流掃描時已有結果可略過較低的規則）
+        """
+        if not text:
+            return None
+
+        lowered = text.lower()
+        # 純 ASCII 的文字不可能含有中文或表情符號的關鍵字
+        ascii_only = lowered.isascii()
+        # 轉小寫後長度不變時，小寫文字中的位置就是原文的位置
+        same_offsets = len(lowered) == len(text)
+        anchors: Dict[str, str] = {}
+        if len(lowered) >= ANCHOR_MIN_CHARS:
+            if self._anchors is None:
+                self._anchors = _choose_anchors([keyword for keywords, _ in self._probes
+                                                 for keyword in keywords])
+            anchors = self._anchors
+
+        # 錨點與關鍵字第一次出現的位置（-1 表示不存在），同一字串只搜尋一次
+        positions: Dict[str, int] = {}
+
+        def first(needle: str) -> int:
+            start = positions.get(needle)
+            if start is None:
+                start = positions[needle] = lowered.find(needle)
+            return start
+
+        for rank, (keywords, patterns) in enumerate(self._probes):
+            if max_rank is not None and rank >= max_rank:
+                break
+
+            # 同一條規則內取最早出現的位置，作為通知詳情的擷取點
+            best_start = None
+            best_keyword = None
+            for keyword in keywords:
+                if ascii_only and not keyword.isascii():
+                    continue
+                if first(anchors.get(keyword, keyword)) < 0:
+                    continue
+                start = first(keyword)
+                if start >= 0 and (best_start is None or start < best_start):
+                    best_start, best_keyword = start, keyword
+            best_end = None
+            if best_start is not None:
+                best_end = best_start + len(best_keyword)
+                if not same_offsets:
+                    best_start = _original_offset(text, best_start)
+                    best_end = _original_offset(text, best_end)
+            for pattern in patterns:
+                match = pattern.search(text)
+                if match and (best_start is None or match.start() < best_start):
+                    best_start, best_end, best_keyword = match.start(), match.end(), match.group()
+
+            if best_start is not None:
+                rule = self.rules[rank]
+                return ResultMatch(rule['context'], rule.get('emotion'), best_keyword, rank,
+                                   best_start, best_end)
+        return None
+
+    @staticmethod
+    def snippet(text: str, match: ResultMatch, radius: int = SNIPPET_RADIUS) -> str:
+        """擷取比對位置附近的文字作為通知詳情"""
+        start = max(0, match.start - radius)
+        end = min(len(text), match.end + radius)
+        excerpt = ' '.join(text[start:end].split())
+        if start > 0:
+            excerpt = '...' + excerpt
+        if end < len(text):
+            excerpt += '...'
+        return excerpt
+
+
+class StreamingClassifier:
+    """
+    逐段送入文字的分類器
+
+    文字累積到 chunk_size 才分類一次，區塊之間保留 max_keyword_length - 1 個字元的重疊，
+    關鍵字被切在兩個區塊之間也比對得到（patterns 只保證在同一區塊內比對）。
+    已有結果後只檢查優先權更高的規則；比對到決定性的規則後 feed() 回傳 True，之後送入的文字不再分類。
+    另外保留最後 tail_chars 個字元（tail）供擷取重點行，有決定性的結果後仍會繼續更新，
+    摘要（pytest 的統計、失敗的測試）通常在輸出的最後面。
+    同時保留的文字不超過兩個區塊加上 tail，與輸入總長度無關。
+    """
+
+    def __init__(self, classifier: ResultClassifier, chunk_size: int = 64 * 1024,
+                 tail_chars: int = 0):
+        self.classifier = classifier
+        self.chunk_size = chunk_size
+        self.tail_chars = tail_chars
+        self.match: Optional[ResultMatch] = None
+        self.details: Optional[str] = None
+        self.decisive = False
+        # 目前為止（或停止讀取前）的最後 tail_chars 個字元
+        self.tail = ''
+
+        self._overlap = max(classifier.max_keyword_length - 1, 0)
+        self._carry = ''
+        self._parts: List[str] = []
+        self._size = 0
+
+    def feed(self, text: str) -> bool:
+        """送入一段文字，回傳是否已有決定性的結果"""
+        if self.decisive and not self.tail_chars:
+            return True
+        self._parts.append(text)
+        self._size += len(text)
+        if self.decisive:
+            # 只更新 tail；累積到 tail 的長度才合併一次，避免每段短文字都複製整個 tail
+            if self._size >= self.tail_chars:
+                self._keep_tail()
+        elif self._size >= self.chunk_size:
+            self._scan()
+        return self.decisive
+
+    def close(self) -> Optional[ResultMatch]:
+        """分類剩餘的文字並回傳最終結果"""
+        if self._parts:
+            if self.decisive:
+                self._keep_tail()
+            else:
+                self._scan()
+        return self.match
+
+    def _keep_tail(self):
+        self.tail = (self.tail + ''.join(self._parts))[-self.tail_chars:]
+        self._parts = []
+        self._size = 0
+
+    def _scan(self):
+        text = ''.join(self._parts)
+        chunk = self._carry + text
+        self._parts = []
+        self._size = 0
+
+        max_rank = self.match.rank if self.match is not None else None
+        match = self.classifier.classify(chunk, max_rank=max_rank)
+        if match is not None:
+            self.match = match
+            self.details = ResultClassifier.snippet(chunk, match)
+            self.decisive = self.classifier.is_decisive(match.rank)
+
+        self._carry = chunk[-self._overlap:] if self._overlap else ''
+        if self.tail_chars:
+            self.tail = (self.tail + text)[-self.tail_chars:]
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+從工具輸出擷取重點行
+pytest 的失敗測試與統計、cargo 的第一個 error[E...]、git 的 CONFLICT 行…作為通知詳情。
+
+只看輸出結尾固定長度的視窗（摘要幾乎都在最後），行數也有上限，
+不論輸出多大，擷取時間都是固定的。
+"""
+import re
+from typing import Callable, List, Optional
+
+# 只掃描結尾的字元數與行數
+TAIL_CHARS = 32 * 1024
+MAX_LINES = 500
+
+# 詳情最大長度
+MAX_LENGTH = 160
+
+# pytest
+_PYTEST_SUMMARY = re.compile(r'^=+ (.*\b\d+ (?:failed|errors?)\b.*?) in [\d.]+s\b.*=+$')
+_PYTEST_FAILED = re.compile(r'^(?:FAILED|ERROR) (\S+)(?: - (.*))?$')
+
+# cargo
+_CARGO_ERROR = re.compile(r'^error(\[E\d{4}\])?: (.+)$')
+_CARGO_LOCATION = re.compile(r'^\s*--> (\S+)')
+_CARGO_TEST_RESULT = re.compile(r'^test result: FAILED\. (.*?);? finished in')
+_CARGO_FAILED_TEST = re.compile(r'^---- (\S+) stdout ----$')
+
+# git
+_GIT_CONFLICT = re.compile(r'^CONFLICT \([^)]+\): .+$')
+
+# npm 與 jest
+_NPM_ERROR = re.compile(r'^npm (?:ERR!|error) (.+)$')
+_NPM_NOISE = ('code ', 'errno ', 'path ', 'syscall ', 'A complete log', 'Log files were written',
+              'enoent This is related', 'While resolving')
+_JEST_SUMMARY = re.compile(r'^Tests:\s+(.*\b\d+ failed\b.*)$')
+_JEST_FAILED = re.compile(r'^\s*● (.+)$')
+
+# Python traceback 的最後一行（pytest 以 "E   " 開頭）
+_EXCEPTION = re.compile(r'^(?:E\s+)?([A-Za-z_][\w.]*(?:Error|Exception|Exit|Failure)(?::.*)?)$')
+
+
+def tail_lines(text: str, max_chars: int = TAIL_CHARS, max_lines: int = MAX_LINES) -> List[str]:
+    """回傳結尾視窗內的行（由舊到新）"""
+    start = max(0, len(text) - max_chars)
+    lines = text[start:].splitlines()
+    if start > 0 and lines:
+        # 視窗的第一行可能被截斷
+        lines = lines[1:]
+    return lines[-max_lines:]
+
+
+def _pytest(lines: List[str]) -> Optional[str]:
+    """第一個失敗的測試與統計，例如 tests/test_a.py::test_x - AssertionError（2 failed, 5 passed）"""
+    counts = None
+    failures = []
+    for line in reversed(lines):
+        if counts is None and not failures:
+            match = _PYTEST_SUMMARY.match(line)
+            if match:
+                counts = match.group(1)
+                continue
+        match = _PYTEST_FAILED.match(line)
+        if match:
+            failures.append(match)
+        elif failures:
+            # 已離開 short test summary 區塊
+            break
+
+    if not failures:
+        return counts
+    nodeid, reason = failures[-1].groups()
+    first = f'{nodeid} - {reason}' if reason else nodeid
+    return f'{first}（{counts}）' if counts else first
+
+
+def _cargo_test(lines: List[str]) -> Optional[str]:
+    """cargo test 的統計與第一個失敗的測試"""
+    counts = None
+    first = None
+    for line in lines:
+        match = _CARGO_FAILED_TEST.match(line)
+        if match and first is None:
+            first = match.group(1)
+        match = _CARGO_TEST_RESULT.match(line)
+        if match:
+            counts = match.group(1)
+    if counts is None:
+        return None
+    return f'{first} 失敗（{counts}）' if first else counts
+
+
+def _cargo(lines: List[str]) -> Optional[str]:
+    """第一個 error[E...]（沒有錯誤代碼時取第一個 error:）與其位置"""
+    fallback = None
+    for index, line in enumerate(lines):
+        match = _CARGO_ERROR.match(line)
+        if not match:
+            continue
+        if match.group(1) is None:
+            fallback = fallback or line
+            continue
+        for following in lines[index + 1:index + 4]:
+            location = _CARGO_LOCATION.match(following)
+            if location:
+                return f'{line}（{location.group(1)}）'
+        return line
+    return fallback
+
+
+def _git(lines: List[str]) -> Optional[str]:
+    """第一個 CONFLICT 行與衝突數量"""
+    conflicts = [line for line in lines if _GIT_CONFLICT.match(line)]
+    if not conflicts:
+        return None
+    if len(conflicts) > 1:
+        return f'{conflicts[0]}（共 {len(conflicts)} 個衝突）'
+    return conflicts[0]
+
+
+def _jest(lines: List[str]) -> Optional[str]:
+    """jest（npm test）的第一個失敗的測試與統計"""
+    counts = None
+    first = None
+    for line in lines:
+        match = _JEST_FAILED.match(line)
+        if match and first is None:
+            first = match.group(1)
+        match = _JEST_SUMMARY.match(line)
+        if match:
+            counts = match.group(1)
+    if counts is None:
+        return None
+    return f'{first}（{counts}）' if first else counts
+
+
+def _npm(lines: List[str]) -> Optional[str]:
+    """npm 的錯誤代碼與第一行說明"""
+    code = None
+    message = None
+    for line in lines:
+        match = _NPM_ERROR.match(line)
+        if not match:
+            continue
+        body = match.group(1).strip()
+        if body.startswith('code ') and code is None:
+            code = body[len('code '):]
+        elif body and message is None and not body.startswith(_NPM_NOISE):
+            message = body
+    if code is None and message is None:
+        return None
+    if code and message:
+        return f'{code}: {message}'
+    return code or message
+
+
+def _traceback(lines: List[str]) -> Optional[str]:
+    """最後一個例外訊息"""
+    for line in reversed(lines):
+        match = _EXCEPTION.match(line.strip())
+        if match:
+            return match.group(1)
+    return None
+
+
+# (名稱, 擷取函式)，依序嘗試
+EXTRACTORS = [
+    ('git', _git),
+    ('pytest', _pytest),
+    ('cargo_test', _cargo_test),
+    ('cargo', _cargo),
+    ('jest', _jest),
+    ('npm', _npm),
+    ('traceback', _traceback),
+]
+
+# 情境優先使用的擷取器
+CONTEXT_EXTRACTORS = {
+    'git_conflict': ['git'],
+    'test_failed': ['pytest', 'cargo_test', 'jest'],
+    'build_error': ['cargo'],
+    'dependency_issue': ['npm', 'traceback'],
+}
+
+
+def _ordered(context: Optional[str]) -> List[Callable[[List[str]], Optional[str]]]:
+    preferred = CONTEXT_EXTRACTORS.get(context, [])
+    extractors = dict(EXTRACTORS)
+    order = preferred + [name for name, _ in EXTRACTORS if name not in preferred]
+    return [extractors[name] for name in order]
+
+
+def extract(text: str, context: Optional[str] = None, max_length: int = MAX_LENGTH) -> Optional[str]:
+    """
+    擷取工具輸出的重點行
+
+    Args:
+        text: 工具輸出（只會看結尾的 TAIL_CHARS 個字元）
+        context: 分類結果的情境，決定優先嘗試的擷取器
+        max_length: 詳情最大長度
+
+    Returns:
+        重點行；沒有認得的輸出格式時回傳 None
+    """
+    if not text:
+        return None
+
+    lines = tail_lines(text)
+    for extractor in _ordered(context):
+        found = extractor(lines)
+        if found:
+            found = ' '.join(found.split())
+            if len(found) > max_length:
+                found = found[:max_length - 3] + '...'
+            return found
+    return None
@@ -7,6 +7,7 @@ echo "📁 設置有組織的語音通知系統..."
 PROJECT_DIR="${1:-$(pwd)}"
 PROJECT_NAME=$(basename "$PROJECT_DIR")
 TOOLS_DIR="$HOME/.claude-code-tools"
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 
 # 創建語音通知專用資料夾
 VOICE_DIR="$PROJECT_DIR/.claude-voice"
@@ -40,6 +41,10 @@ cat > "$VOICE_DIR/config.json" << EOF
 }
 EOF
 
+# 登錄專案，批次更新時不必掃描磁碟
+python3 "$SCRIPT_DIR/project_registry.py" add "$PROJECT_DIR" --source set_voice.sh > /dev/null \
+    || echo "⚠️ 專案登錄失敗，可稍後執行: python3 $SCRIPT_DIR/project_registry.py rescan"
+
 # 2.5. 創建詳細語音指示檔
 echo "📋 創建詳細語音指示檔..."
 cat > "$VOICE_DIR/voice_instructions.md" << 'EOF'
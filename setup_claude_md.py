@@ -8,6 +8,20 @@ import shutil
 from pathlib import Path
 import argparse
 
+from project_registry import list_projects, rescan
+
+def has_voice_instructions(content):
+    """CLAUDE.md 是否已包含語音通知說明"""
+    return 'claude_notify.py' in content or '語音通知' in content
+
+def with_voice_instructions(existing_content, template_content):
+    """在現有 CLAUDE.md 內容後追加語音通知說明"""
+    separator = "\n\n" + "="*80 + "\n"
+    separator += "# 🔊 語音通知系統設定\n"
+    separator += "="*80 + "\n\n"
+    
+    return existing_content + separator + template_content
+
 def setup_claude_md(project_path=None, force=False):
     """為專案設置 CLAUDE.md 語音通知說明"""
     
@@ -35,7 +49,7 @@ def setup_claude_md(project_path=None, force=False):
         try:
             with open(claude_md, 'r', encoding='utf-8') as f:
                 content = f.read()
-                if 'claude_notify.py' in content or '語音通知' in content:
+                if has_voice_instructions(content):
                     print(f"✅ CLAUDE.md 已包含語音通知說明")
                     return True
                 else:
@@ -83,11 +97,7 @@ def append_voice_instructions(claude_md, template_path):
             existing_content = f.read()
         
         # 在現有內容後追加語音通知說明
-        separator = "\n\n" + "="*80 + "\n"
-        separator += "# 🔊 語音通知系統設定\n"
-        separator += "="*80 + "\n\n"
-        
-        combined_content = existing_content + separator + template_content
+        combined_content = with_voice_instructions(existing_content, template_content)
         
         # 寫入檔案
         with open(claude_md, 'w', encoding='utf-8') as f:
@@ -113,8 +123,17 @@ def show_usage_instructions():
     print(f"🔊 測試語音通知:")
     print(f"  python3 ~/Documents/claude-code-voice/claude_notify.py \"專案設置完成\" \"excited\"")
 
-def setup_all_projects(base_path=None):
-    """批量設置多個專案的 CLAUDE.md"""
+def find_git_projects(base_dir):
+    """base_dir 下一層包含 .git 的目錄（可能是尚未設定語音通知的專案）"""
+    return sorted(item for item in base_dir.iterdir() if item.is_dir() and (item / '.git').exists())
+
+def setup_all_projects(base_path=None, scan=False):
+    """
+    批量設置多個專案的 CLAUDE.md
+    專案來自 project_registry 登錄表（base_path 之下、已設定語音通知的專案）；
+    登錄表中沒有位於 base_path 下的專案或指定 scan 時改為掃描目錄：
+    以 rescan 登錄找到的語音通知專案，並加入下一層的 Git 專案
+    """
     
     if base_path:
         base_dir = Path(base_path)
@@ -125,16 +144,20 @@ def setup_all_projects(base_path=None):
         print(f"❌ 基礎目錄不存在: {base_dir}")
         return
     
-    print(f"🔍 搜尋 {base_dir} 下的專案...")
+    projects_found = [] if scan else [Path(path) for path in list_projects(str(base_dir))]
     
-    # 尋找包含 .git 的目錄（可能是專案）
-    projects_found = []
-    for item in base_dir.iterdir():
-        if item.is_dir() and (item / '.git').exists():
-            projects_found.append(item)
+    if not projects_found:
+        if not scan:
+            print(f"ℹ️  登錄表中沒有位於 {base_dir} 下的專案，改為掃描目錄")
+        print(f"🔍 掃描 {base_dir} 下的專案...")
+        rescan([str(base_dir)])
+        projects_found = [Path(path) for path in list_projects(str(base_dir))]
+        registered = set(projects_found)
+        projects_found += [project for project in find_git_projects(base_dir)
+                           if project.resolve() not in registered]
     
     if not projects_found:
-        print(f"❌ 在 {base_dir} 下沒有找到 Git 專案")
+        print(f"❌ 在 {base_dir} 下沒有找到專案")
         return
     
     print(f"📁 找到 {len(projects_found)} 個專案:")
@@ -164,12 +187,14 @@ def main():
     parser.add_argument('--force', '-f', action='store_true',
                        help='強制覆蓋現有 CLAUDE.md')
     parser.add_argument('--batch', '-b', 
-                       help='批量設置指定目錄下的所有專案')
+                       help='批量設置指定目錄下的所有專案（取自專案登錄表，登錄表中沒有時掃描目錄）')
+    parser.add_argument('--scan', action='store_true',
+                       help='批量設置前一律掃描目錄：登錄尚未登錄的語音通知專案，並加入下一層的 Git 專案')
     
     args = parser.parse_args()
     
     if args.batch:
-        setup_all_projects(args.batch)
+        setup_all_projects(args.batch, args.scan)
     else:
         setup_claude_md(args.project_path, args.force)
 
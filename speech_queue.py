@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+語音播放優先佇列
+notify()/say() 只把語音排入佇列就返回，由背景執行緒依優先權依序播放
+高優先權（例如 urgent、git_conflict）的訊息可以打斷正在播放的低優先權語音
+每則語音都有期限，過期的在合成前丟棄；佇列過深時依策略合併或丟棄低優先權項目
+"""
+import time
+import heapq
+import itertools
+import threading
+from collections import deque
+from typing import Callable, Dict, Optional, Any
+
+# 情緒與情境的預設優先權（數字越大越優先）
+DEFAULT_PRIORITIES = {
+    # 情緒
+    'urgent': 100,
+    'worried': 70,
+    'thinking': 40,
+    'excited': 40,
+    'gentle': 20,
+    # 情境
+    'git_conflict': 100,
+    'error': 80,
+    'test_failed': 70,
+    'build_error': 70,
+    'permission_denied': 70,
+    'blocked': 60,
+    'dependency_issue': 60,
+    'need_help': 50,
+    'need_user_input': 50,
+    'file_not_found': 50,
+    'review_required': 40,
+    'deployment_ready': 40,
+    'task_completed': 30,
+    'long_running': 10
+}
+DEFAULT_PRIORITY = 50
+
+# 語音的有效期限（秒），過期後不再播放
+DEFAULT_TTLS = {
+    'long_running': 30,
+    'thinking': 60,
+    'task_completed': 120,
+    'review_required': 300,
+    'git_conflict': 600,
+    'urgent': 600
+}
+DEFAULT_TTL = 180
+
+# 佇列過深時的處理策略
+OVERFLOW_POLICIES = ('merge', 'drop_oldest', 'drop_lowest')
+
+# 最近幾筆的等待時間，用於統計
+WAIT_SAMPLES = 200
+
+
+class SpeechItem:
+    """佇列中的一段語音"""
+
+    __slots__ = ('text', 'priority', 'rate', 'voice', 'seq', 'enqueued_at', 'deadline',
+                 'cancelled', 'started', 'count', 'trace_id')
+
+    def __init__(self, text: str, priority: int, rate: Optional[int], seq: int,
+                 ttl: Optional[float] = None, voice: Optional[str] = None,
+                 trace_id: Optional[str] = None):
+        self.text = text
+        self.priority = priority
+        self.rate = rate
+        self.voice = voice
+        self.seq = seq
+        self.enqueued_at = time.time()
+        self.deadline = self.enqueued_at + ttl if ttl else None
+        # 被打斷時設定，播放端在啟動音訊行程前檢查
+        self.cancelled = threading.Event()
+        self.started = False
+        # 合併後代表的通知則數
+        self.count = 1
+        # 端到端追蹤 ID（見 voice_trace），播放時交給播放函式
+        self.trace_id = trace_id
+
+
+class SpeechQueue:
+    """依優先權播放語音的佇列"""
+
+    def __init__(self, speak: Callable[[str, Optional[int], threading.Event, Optional[str],
+                                        Optional[str]], None],
+                 stop: Callable[[], None], preempt_priority: int = 90,
+                 max_depth: int = 20, overflow_policy: str = 'merge',
+                 overflow_max_priority: int = 50,
+                 merge_template: str = '另有 {count} 則較低優先的通知'):
+        """
+        Args:
+            speak: 播放函式 speak(text, rate, cancelled, voice, trace_id)，阻塞直到播放結束或被中斷
+            stop: 中斷目前播放的函式
+            preempt_priority: 達到此優先權的訊息可以打斷較低優先權的播放
+            max_depth: 佇列深度上限，超過時處理低優先權項目（0 表示不限制）
+            overflow_policy: merge（合併成一則）、drop_oldest 或 drop_lowest
+            overflow_max_priority: 只有不高於此優先權的項目會被合併或丟棄
+            merge_template: 合併後的語音內容，{count} 為合併的則數
+        """
+        self._speak = speak
+        self._stop = stop
+        self.preempt_priority = preempt_priority
+        self.max_depth = max_depth
+        self.overflow_policy = overflow_policy if overflow_policy in OVERFLOW_POLICIES else 'merge'
+        self.overflow_max_priority = overflow_max_priority
+        self.merge_template = merge_template
+
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._worker_running = False
+        self._current = None
+
+        self.spoken = 0
+        self.preempted = 0
+        self.expired = 0
+        self.dropped = 0
+        self.merged = 0
+        self._waits = deque(maxlen=WAIT_SAMPLES)
+
+    def put(self, text: str, priority: int = DEFAULT_PRIORITY, rate: Optional[int] = None,
+            ttl: Optional[float] = DEFAULT_TTL, voice: Optional[str] = None,
+            trace_id: Optional[str] = None) -> SpeechItem:
+        """排入一段語音，必要時打斷目前的低優先權播放（rate、voice 為 None 時使用播放端的預設值）"""
+        with self._cond:
+            item = SpeechItem(text, priority, rate, next(self._seq), ttl, voice, trace_id)
+            heapq.heappush(self._heap, (-priority, item.seq, item))
+            if self.max_depth and len(self._heap) > self.max_depth:
+                self._relieve_pressure()
+
+            current = self._current
+            if (current is not None and priority >= self.preempt_priority
+                    and priority > current.priority):
+                self.preempted += 1
+                current.cancelled.set()
+                self._stop()
+
+            # 工作執行緒在佇列清空後會結束，需要時再啟動
+            # （非 daemon 執行緒，短命的 CLI 行程會等語音播完才結束）
+            if not self._worker_running:
+                self._worker_running = True
+                threading.Thread(target=self._run, name='speech-queue').start()
+
+            self._cond.notify_all()
+            return item
+
+    def _relieve_pressure(self):
+        """佇列過深：先清掉過期項目，再依策略合併或丟棄低優先權項目（需持有鎖）"""
+        now = time.time()
+        alive = []
+        for entry in self._heap:
+            item = entry[2]
+            if item.deadline is not None and now > item.deadline:
+                self.expired += 1
+            else:
+                alive.append(entry)
+
+        excess = len(alive) - self.max_depth
+        low = [entry for entry in alive if entry[2].priority <= self.overflow_max_priority]
+        if excess > 0 and low:
+            if self.overflow_policy == 'merge' and len(low) > 1:
+                # 所有低優先權項目合併成一則，保留最高優先權與最晚期限
+                keep = [entry for entry in alive if entry[2].priority > self.overflow_max_priority]
+                items = [entry[2] for entry in low]
+                for item in items:
+                    item.started = True  # 已移出佇列，不再接受改寫
+                deadlines = [item.deadline for item in items]
+                first = min(items, key=lambda item: item.seq)
+                count = sum(item.count for item in items)
+                merged = SpeechItem(self.merge_template.format(count=count),
+                                    max(item.priority for item in items), first.rate, first.seq,
+                                    voice=first.voice, trace_id=first.trace_id)
+                merged.enqueued_at = first.enqueued_at
+                merged.deadline = None if None in deadlines else max(deadlines)
+                merged.count = count
+                keep.append((-merged.priority, merged.seq, merged))
+                # 計算因合併而少播的則數
+                self.merged += len(items) - 1
+                alive = keep
+            else:
+                if self.overflow_policy == 'drop_lowest':
+                    # 優先權最低者先丟，同優先權時丟最舊的
+                    low.sort(key=lambda entry: (entry[2].priority, entry[2].seq))
+                else:
+                    low.sort(key=lambda entry: entry[2].seq)
+                for entry in low[:excess]:
+                    entry[2].started = True  # 已移出佇列，不再接受改寫
+                doomed = {id(entry) for entry in low[:excess]}
+                self.dropped += len(doomed)
+                alive = [entry for entry in alive if id(entry) not in doomed]
+
+        heapq.heapify(alive)
+        self._heap = alive
+
+    def _run(self):
+        """依優先權播放，佇列清空後結束執行緒"""
+        while True:
+            with self._cond:
+                if not self._heap:
+                    self._current = None
+                    self._worker_running = False
+                    self._cond.notify_all()
+                    return
+                _, _, item = heapq.heappop(self._heap)
+                now = time.time()
+                if item.deadline is not None and now > item.deadline:
+                    # 過期的語音在合成前丟棄
+                    self.expired += 1
+                    continue
+                item.started = True
+                self._current = item
+                self._waits.append(now - item.enqueued_at)
+
+            try:
+                self._speak(item.text, item.rate, item.cancelled, item.voice, item.trace_id)
+            except Exception as e:
+                print(f'語音播放失敗: {e}')
+
+            with self._cond:
+                self._current = None
+                self.spoken += 1
+
+    def update_text(self, item: SpeechItem, text: str) -> bool:
+        """修改尚未開始播放的項目內容，回傳是否成功"""
+        with self._cond:
+            if item.started:
+                return False
+            item.text = text
+            return True
+
+    def wait_until_idle(self, timeout: Optional[float] = None) -> bool:
+        """等待佇列播放完畢，回傳是否已清空"""
+        deadline = None if timeout is None else time.time() + timeout
+        with self._cond:
+            while self._heap or self._current is not None:
+                remaining = None if deadline is None else deadline - time.time()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        """佇列深度與等待時間統計"""
+        with self._cond:
+            waits = sorted(self._waits)
+            current = self._current
+            depth = len(self._heap)
+
+        def percentile(p: float) -> float:
+            if not waits:
+                return 0.0
+            index = min(len(waits) - 1, int(round(p * (len(waits) - 1))))
+            return round(waits[index] * 1000, 1)
+
+        return {
+            'depth': depth,
+            'playing': current.text if current else None,
+            'playing_priority': current.priority if current else None,
+            'spoken': self.spoken,
+            'preempted': self.preempted,
+            'expired': self.expired,
+            'dropped': self.dropped,
+            'merged': self.merged,
+            'wait_ms_avg': round(sum(waits) / len(waits) * 1000, 1) if waits else 0.0,
+            'wait_ms_p95': percentile(0.95),
+            'wait_ms_max': round(waits[-1] * 1000, 1) if waits else 0.0,
+        }
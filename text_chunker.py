@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+把長訊息切成適合分段合成的片段
+
+優先在句尾（。！？；… 與換行、後面接空白的 . ! ? ;）切開，句子太長時再依子句（，、： 與後面接空白的 , :）、
+以空白分隔的詞、最後逐字切開。相鄰的短句會合併到同一段，避免為每個短句各啟動一次合成。
+第一段的上限較短：播放端只要等第一段合成完就能開始出聲，之後各段在播放前一段時合成。
+"""
+import re
+from typing import Callable, List
+
+# 第一段與其餘各段的長度上限（字元數）
+FIRST_MAX_CHARS = 40
+MAX_CHARS = 100
+
+# 切點後面一併帶走的右引號、右括號與空白
+_TRAILING = r'[」』）》〉】"\')\]]*\s*'
+
+# 中日韓標點本身就是切點；半形標點要後面接空白或結尾才算（避免切開 3.14、1,000、12:30）
+_SENTENCE_RE = re.compile(r'(?:[。！？；…\n]+|[.!?;]+(?=\s|$))' + _TRAILING)
+_CLAUSE_RE = re.compile(r'(?:[，、：]+|[,:]+(?=\s|$))' + _TRAILING)
+_WORD_RE = re.compile(r'\S+\s*')
+
+
+def _split_after(pattern) -> Callable[[str], List[str]]:
+    """在符合 pattern 的位置之後切開，保留標點"""
+
+    def split(text: str) -> List[str]:
+        pieces = []
+        start = 0
+        for match in pattern.finditer(text):
+            if match.end() > start:
+                pieces.append(text[start:match.end()])
+                start = match.end()
+        if start < len(text):
+            pieces.append(text[start:])
+        return pieces
+
+    return split
+
+
+# 依序嘗試的切法：句子 → 子句 → 詞 → 逐字
+_SPLITTERS = (
+    _split_after(_SENTENCE_RE),
+    _split_after(_CLAUSE_RE),
+    _WORD_RE.findall,
+    list,
+)
+
+
+def split_chunks(text: str, max_chars: int = MAX_CHARS,
+                 first_max_chars: int = FIRST_MAX_CHARS) -> List[str]:
+    """
+    把文字切成依序播放的片段
+
+    Args:
+        text: 要說的文字
+        max_chars: 每段的長度上限
+        first_max_chars: 第一段的長度上限（決定開始出聲前要等多久）
+
+    Returns:
+        片段清單（已去掉前後空白）；文字不超過第一段上限時只有一段
+    """
+    max_chars = max(1, max_chars)
+    first_max_chars = max(1, min(first_max_chars, max_chars))
+    chunks: List[str] = []
+    buffer = ''
+
+    def flush():
+        nonlocal buffer
+        if buffer.strip():
+            chunks.append(buffer.strip())
+        buffer = ''
+
+    def add(piece: str, level: int):
+        nonlocal buffer
+        limit = max_chars if chunks else first_max_chars
+        if len(buffer) + len(piece.rstrip()) <= limit:
+            buffer += piece
+            return
+        flush()
+        limit = max_chars if chunks else first_max_chars
+        if len(piece.rstrip()) <= limit or level >= len(_SPLITTERS):
+            buffer = piece
+            return
+        for sub_piece in _SPLITTERS[level](piece):
+            add(sub_piece, level + 1)
+
+    add(text, 0)
+    flush()
+    return chunks
@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+"""
+語音合成後端
+每個後端負責：直接播放文字、把文字合成為音訊檔、播放音訊檔
+Linux 預設使用常駐的 espeak 行程，透過 stdin 逐行送出文字，省去每則訊息啟動行程的時間；
+語音快取與預先合成仍由一次性的 espeak 合成音訊檔，常駐行程只播放快取中沒有的訊息
+"""
+import re
+import shutil
+import platform
+import subprocess
+import threading
+from pathlib import Path
+from typing import Callable, List, Optional
+
+# 估計朗讀時間用：每個中日韓文字約一個音節，其餘以空白分隔的詞計算
+_CJK_RE = re.compile(r'[\u3040-\u30ff\u3400-\u9fff\uf900-\ufaff]')
+
+
+def _run_blocking(cmd: List[str], input_data: Optional[bytes] = None) -> int:
+    """預設的音訊命令執行方式（不可中斷）"""
+    return subprocess.run(cmd, check=True, input=input_data, stdout=subprocess.DEVNULL,
+                          stderr=subprocess.DEVNULL).returncode
+
+
+class TTSBackend:
+    """語音合成後端介面"""
+
+    name = 'base'
+    audio_ext = '.wav'
+    # True 表示 speak() 把文字交出去就返回，不等播放結束
+    streaming = False
+    install_hint = ''
+
+    def __init__(self, run_audio: Optional[Callable[..., int]] = None):
+        """
+        Args:
+            run_audio: run_audio(cmd, input_data=None) 執行會發出聲音的命令（由助理提供可中斷的版本）
+        """
+        self.run_audio = run_audio or _run_blocking
+
+    @property
+    def supports_cache(self) -> bool:
+        """是否使用語音快取播放"""
+        return not self.streaming
+
+    @property
+    def cache_name(self) -> str:
+        """快取鍵與預先合成使用的後端名稱（實際合成音訊檔的後端）"""
+        return self.name
+
+    def available(self) -> bool:
+        """後端所需的命令是否存在"""
+        return False
+
+    def voice_for(self, language: str) -> Optional[str]:
+        """語言設定對應的語音名稱"""
+        return None
+
+    def speak(self, text: str, rate: int, voice: Optional[str] = None):
+        """直接播放文字（streaming 後端交出文字後立即返回）"""
+        raise NotImplementedError
+
+    def estimate_duration(self, text: str, rate: int) -> float:
+        """估計朗讀所需秒數（rate 為每分鐘字數）"""
+        cjk = len(_CJK_RE.findall(text))
+        words = len(_CJK_RE.sub(' ', text).split())
+        return (cjk + words) * 60.0 / max(rate, 1) + 0.3
+
+    def synthesize_to_file(self, text: str, rate: int, voice: Optional[str], output: Path) -> bool:
+        """把文字合成為音訊檔，成功回傳 True"""
+        return False
+
+    def play_file(self, path: Path) -> bool:
+        """播放音訊檔，成功回傳 True"""
+        return False
+
+    def stop(self):
+        """中斷目前的播放（一次性後端由助理終止行程，不需處理）"""
+
+    def close(self):
+        """釋放資源"""
+
+
+class SayBackend(TTSBackend):
+    """macOS say 命令"""
+
+    name = 'say'
+    audio_ext = '.aiff'
+    install_hint = 'macOS 需要內建的 say 命令'
+
+    VOICES = {
+        'zh-TW': 'Mei-Jia',      # 台灣中文
+        'zh-CN': 'Ting-Ting',    # 簡體中文
+        'en-US': 'Samantha',     # 美式英文
+        'ja-JP': 'Kyoko'         # 日文
+    }
+
+    def available(self) -> bool:
+        return shutil.which('say') is not None
+
+    def voice_for(self, language: str) -> Optional[str]:
+        return self.VOICES.get(language)
+
+    def _command(self, text: str, rate: int, voice: Optional[str]) -> List[str]:
+        if voice:
+            return ['say', '-v', voice, '-r', str(rate), text]
+        return ['say', '-r', str(rate), text]
+
+    def speak(self, text: str, rate: int, voice: Optional[str] = None):
+        self.run_audio(self._command(text, rate, voice))
+
+    def synthesize_to_file(self, text: str, rate: int, voice: Optional[str], output: Path) -> bool:
+        cmd = self._command(text, rate, voice)
+        cmd[-1:-1] = ['-o', str(output)]
+        return _synthesize(cmd, output)
+
+    def play_file(self, path: Path) -> bool:
+        return _play_with(self.run_audio, [['afplay', str(path)]])
+
+
+class SapiBackend(TTSBackend):
+    """Windows PowerShell + System.Speech"""
+
+    name = 'sapi'
+    install_hint = 'Windows 需要 PowerShell 與 System.Speech'
+
+    def available(self) -> bool:
+        return shutil.which('powershell') is not None
+
+    @staticmethod
+    def _script(text: str, rate: int, output: Optional[Path] = None) -> str:
+        escaped_text = text.replace('"', '`"')
+        output_line = f'$speak.SetOutputToWaveFile("{output}")' if output else ''
+        return f'''
+                Add-Type -AssemblyName System.Speech
+                $speak = New-Object System.Speech.Synthesis.SpeechSynthesizer
+                $speak.Rate = {rate // 20 - 10}  # 調整範圍到 -10 到 10
+                {output_line}
+                $speak.Speak("{escaped_text}")
+                $speak.Dispose()
+                '''
+
+    def speak(self, text: str, rate: int, voice: Optional[str] = None):
+        self.run_audio(['powershell', '-Command', self._script(text, rate)])
+
+    def synthesize_to_file(self, text: str, rate: int, voice: Optional[str], output: Path) -> bool:
+        return _synthesize(['powershell', '-Command', self._script(text, rate, output)], output)
+
+    def play_file(self, path: Path) -> bool:
+        return _play_with(self.run_audio, [[
+            'powershell', '-Command', f'(New-Object Media.SoundPlayer "{path}").PlaySync()'
+        ]])
+
+
+class EspeakBackend(TTSBackend):
+    """Linux espeak / espeak-ng，每則訊息啟動一次行程"""
+
+    name = 'espeak'
+    install_hint = 'Linux 系統需要安裝 espeak: sudo apt-get install espeak'
+
+    @staticmethod
+    def binary() -> str:
+        """優先使用 espeak-ng"""
+        return shutil.which('espeak-ng') or shutil.which('espeak') or 'espeak'
+
+    def available(self) -> bool:
+        return bool(shutil.which('espeak-ng') or shutil.which('espeak'))
+
+    def _command(self, rate: int, voice: Optional[str]) -> List[str]:
+        cmd = [self.binary(), '-s', str(rate)]
+        if voice:
+            cmd += ['-v', voice]
+        return cmd
+
+    def speak(self, text: str, rate: int, voice: Optional[str] = None):
+        self.run_audio(self._command(rate, voice) + [text])
+
+    def synthesize_to_file(self, text: str, rate: int, voice: Optional[str], output: Path) -> bool:
+        return _synthesize(self._command(rate, voice) + ['-w', str(output), text], output)
+
+    def play_file(self, path: Path) -> bool:
+        return _play_with(self.run_audio, [['aplay', '-q', str(path)], ['paplay', str(path)]])
+
+
+class PersistentEspeakBackend(EspeakBackend):
+    """
+    常駐 espeak 行程
+
+    espeak 沒有指定文字時會從 stdin 逐行讀取並朗讀，因此只需啟動一次，
+    之後每則訊息寫入一行即可。行程意外結束時自動重新啟動；
+    語速或語音改變時以新參數重新啟動。重新啟動後仍無法寫入時改用一次性的 espeak。
+
+    快取的音訊檔與 espeak 後端共用（synthesize_to_file / play_file 沿用 EspeakBackend），
+    已快取的訊息直接播放檔案，常駐行程只處理快取中沒有的訊息。
+    """
+
+    name = 'espeak-persistent'
+    streaming = True
+
+    def __init__(self, run_audio: Optional[Callable[..., int]] = None):
+        super().__init__(run_audio)
+        self._proc = None
+        self._params = None
+        self._lock = threading.Lock()
+        self.restarts = 0
+
+    @property
+    def supports_cache(self) -> bool:
+        return True
+
+    @property
+    def cache_name(self) -> str:
+        return EspeakBackend.name
+
+    def _ensure_process(self, rate: int, voice: Optional[str]) -> subprocess.Popen:
+        """確保常駐行程存在且參數一致（需持有鎖）"""
+        params = (rate, voice)
+        if self._proc is not None and self._proc.poll() is None and self._params == params:
+            return self._proc
+
+        if self._proc is not None:
+            if self._proc.poll() is not None:
+                self.restarts += 1
+            self._terminate()
+
+        self._proc = subprocess.Popen(
+            self._command(rate, voice),
+            stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            bufsize=0
+        )
+        self._params = params
+        return self._proc
+
+    def speak(self, text: str, rate: int, voice: Optional[str] = None):
+        if not self.streaming:
+            # 常駐行程無法重新啟動，已改用一次性的 espeak
+            super().speak(text, rate, voice)
+            return
+
+        line = (' '.join(text.split()) + '\n').encode('utf-8')
+        with self._lock:
+            for _ in range(2):
+                try:
+                    proc = self._ensure_process(rate, voice)
+                    proc.stdin.write(line)
+                    proc.stdin.flush()
+                    return
+                except (BrokenPipeError, OSError):
+                    # 行程已結束（或無法啟動），重新啟動後再試一次
+                    self._proc = None
+                    self.restarts += 1
+
+        # 重新啟動後仍無法寫入：之後每則訊息啟動一次 espeak（播放完才返回，不再是串流）
+        self.streaming = False
+        super().speak(text, rate, voice)
+
+    def stop(self):
+        """中斷播放：結束行程（包含尚未唸完的文字），下次播放時重新啟動"""
+        with self._lock:
+            self._terminate()
+
+    def _terminate(self):
+        proc, self._proc = self._proc, None
+        if proc is None:
+            return
+        try:
+            if proc.stdin:
+                proc.stdin.close()
+        except OSError:
+            pass
+        if proc.poll() is None:
+            proc.terminate()
+            try:
+                proc.wait(timeout=1)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+    def close(self):
+        """正常結束：關閉 stdin 讓 espeak 唸完剩下的文字後自行結束"""
+        with self._lock:
+            proc, self._proc = self._proc, None
+            if proc is not None and proc.stdin:
+                try:
+                    proc.stdin.close()
+                except OSError:
+                    pass
+
+
+class EspeakLibBackend(EspeakBackend):
+    """
+    透過 ctypes 呼叫 libespeak-ng，在行程內合成為 PCM
+
+    合成不需要子行程也不寫暫存檔；播放時把記憶體中的 WAV 經由 stdin 交給 aplay。
+    找不到函式庫時 available() 為 False，select_backend() 會改用 espeak 命令
+    """
+
+    name = 'espeak-lib'
+    install_hint = 'espeak-lib 需要 libespeak-ng: sudo apt-get install libespeak-ng1'
+
+    @staticmethod
+    def _library():
+        try:
+            import espeak_lib
+        except ImportError:
+            return None
+        return espeak_lib.load()
+
+    def available(self) -> bool:
+        return self._library() is not None
+
+    def synthesize_wav(self, text: str, rate: int, voice: Optional[str] = None) -> bytes:
+        """合成為記憶體中的 WAV"""
+        library = self._library()
+        if library is None:
+            raise FileNotFoundError('libespeak-ng')
+        return library.to_wav(library.synthesize(text, rate, voice))
+
+    def speak(self, text: str, rate: int, voice: Optional[str] = None):
+        wav_data = self.synthesize_wav(text, rate, voice)
+        if not _play_with(self.run_audio, [['aplay', '-q', '-'], ['paplay']], wav_data):
+            raise RuntimeError('aplay / paplay 無法播放')
+
+    def synthesize_to_file(self, text: str, rate: int, voice: Optional[str], output: Path) -> bool:
+        try:
+            output.write_bytes(self.synthesize_wav(text, rate, voice))
+        except OSError:
+            return False
+        return output.stat().st_size > 0
+
+
+BACKENDS = {
+    'say': SayBackend,
+    'sapi': SapiBackend,
+    'espeak': EspeakBackend,
+    'espeak-persistent': PersistentEspeakBackend,
+    'espeak-lib': EspeakLibBackend
+}
+
+# 各平台的後端候選順序（前面的優先，最後一個為一次性的備援）
+# espeak-lib 需要在設定中指定，函式庫不存在時依此順序退回
+PLATFORM_BACKENDS = {
+    'Darwin': ['say'],
+    'Windows': ['sapi'],
+    'Linux': ['espeak-persistent', 'espeak']
+}
+
+
+def create_backend(name: str, run_audio: Optional[Callable[..., int]] = None) -> Optional[TTSBackend]:
+    """依名稱建立後端"""
+    backend_class = BACKENDS.get(name)
+    return backend_class(run_audio) if backend_class else None
+
+
+def select_backend(preference: str = 'auto',
+                   run_audio: Optional[Callable[..., int]] = None,
+                   system: Optional[str] = None) -> Optional[TTSBackend]:
+    """
+    選擇可用的後端
+
+    指定的後端不可用時依平台順序改用其他後端；全部不可用時回傳平台的一次性後端，
+    讓呼叫端可以顯示安裝提示
+    """
+    candidates = list(PLATFORM_BACKENDS.get(system or platform.system(), []))
+    if preference and preference != 'auto' and preference in BACKENDS:
+        candidates = [preference] + [name for name in candidates if name != preference]
+    if not candidates:
+        return None
+
+    for name in candidates:
+        backend = create_backend(name, run_audio)
+        if backend.available():
+            return backend
+    return create_backend(candidates[-1], run_audio)
+
+
+def _synthesize(cmd: List[str], output: Path) -> bool:
+    """執行合成命令並確認輸出檔存在"""
+    try:
+        subprocess.run(cmd, check=True, capture_output=True)
+        return output.exists() and output.stat().st_size > 0
+    except (subprocess.CalledProcessError, FileNotFoundError):
+        return False
+
+
+def _play_with(run_audio: Callable[..., int], players: List[List[str]],
+               input_data: Optional[bytes] = None) -> bool:
+    """依序嘗試播放器，第一個成功的為準"""
+    for cmd in players:
+        try:
+            if input_data is None:
+                run_audio(cmd)
+            else:
+                run_audio(cmd, input_data)
+            return True
+        except (subprocess.CalledProcessError, FileNotFoundError):
+            continue
+    return False
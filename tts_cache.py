@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+TTS 語音快取
+以 (文字, 語音, 語速, 後端) 的雜湊值存放合成好的音訊檔，重複的訊息直接播放快取
+超過容量上限時依最近使用時間（LRU）淘汰
+命中統計以單行紀錄附加到快取目錄的 stats.log（與 voice_metrics 的紀錄檔相同），讀取時再加總，
+多個行程同時查詢也不會互相覆蓋計數。附加時持有紀錄檔的共享鎖（fcntl.flock），
+合併紀錄時持有排他鎖並就地改寫，合併期間不會有紀錄遺失或重複計算
+"""
+import os
+import json
+import hashlib
+from pathlib import Path
+from typing import Dict, Optional, Any
+
+from voice_paths import STATE_DIR
+
+DEFAULT_CACHE_DIR = Path(STATE_DIR) / 'tts_cache'
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024
+
+STATS_FILE = 'stats.log'
+# 舊版整份改寫的統計檔（不算快取項目，清空快取時一併刪除）
+LEGACY_STATS_FILE = 'stats.json'
+# 統計紀錄超過此大小時合併成一行
+STATS_MAX_BYTES = 64 * 1024
+
+
+def _flock(fd: int, operation: str):
+    """取得檔案鎖（LOCK_SH / LOCK_EX）；沒有 fcntl 的平台直接略過"""
+    try:
+        import fcntl
+    except ImportError:
+        return
+    fcntl.flock(fd, getattr(fcntl, operation))
+
+
+class TTSCache:
+    """內容定址的語音檔快取"""
+
+    def __init__(self, cache_dir: Optional[Path] = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = Path(cache_dir or DEFAULT_CACHE_DIR)
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def make_key(text: str, voice: Optional[str], rate: int, backend: str) -> str:
+        """計算快取鍵"""
+        raw = json.dumps([text, voice, rate, backend], ensure_ascii=False)
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def path_for(self, key: str, ext: str) -> Path:
+        """快取鍵對應的檔案路徑"""
+        return self.cache_dir / f'{key}{ext}'
+
+    def lookup(self, key: str, ext: str) -> Optional[Path]:
+        """
+        查詢快取，命中時更新使用時間
+
+        Returns:
+            命中時回傳音訊檔路徑，否則 None
+        """
+        path = self.path_for(key, ext)
+        try:
+            os.utime(path, None)
+        except OSError:
+            self._bump('misses')
+            return None
+        self._bump('hits')
+        return path
+
+    def contains(self, key: str, ext: str) -> bool:
+        """檢查是否已快取（不影響命中統計與 LRU 順序）"""
+        return self.path_for(key, ext).exists()
+
+    def store(self, key: str, ext: str, source: Path) -> Path:
+        """把合成好的檔案移入快取，必要時淘汰舊檔"""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self.path_for(key, ext)
+        os.replace(str(source), str(path))
+        self.evict()
+        return path
+
+    def new_temp_path(self, key: str, ext: str) -> Path:
+        """合成用的暫存檔路徑（與快取同目錄，確保 os.replace 為原子操作）"""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        return self.cache_dir / f'.{key}.{os.getpid()}.tmp{ext}'
+
+    def _entries(self):
+        """列出快取檔 (mtime, size, path)"""
+        entries = []
+        if not self.cache_dir.exists():
+            return entries
+        for entry in os.scandir(self.cache_dir):
+            if (entry.name.startswith('.') or entry.name in (STATS_FILE, LEGACY_STATS_FILE)
+                    or not entry.is_file()):
+                continue
+            st = entry.stat()
+            entries.append((st.st_mtime, st.st_size, Path(entry.path)))
+        return entries
+
+    def evict(self) -> int:
+        """淘汰最久未使用的檔案直到低於容量上限，回傳淘汰數量"""
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            return 0
+
+        removed = 0
+        for _, size, path in sorted(entries, key=lambda e: e[0]):
+            if total <= self.max_bytes:
+                break
+            try:
+                path.unlink()
+                total -= size
+                removed += 1
+            except OSError:
+                pass
+        if removed:
+            self._bump('evictions', removed)
+        return removed
+
+    def clear(self) -> int:
+        """清空快取與統計，回傳刪除的檔案數"""
+        removed = 0
+        for _, _, path in self._entries():
+            try:
+                path.unlink()
+                removed += 1
+            except OSError:
+                pass
+        for name in (STATS_FILE, LEGACY_STATS_FILE):
+            try:
+                (self.cache_dir / name).unlink()
+            except OSError:
+                pass
+        return removed
+
+    @staticmethod
+    def _sum_counters(lines) -> Dict[str, int]:
+        """加總統計紀錄（每行一個 JSON 物件，例如 {"hits": 1}）"""
+        counters: Dict[str, int] = {}
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # 寫到一半的行
+                continue
+            for counter, amount in record.items():
+                if isinstance(amount, int):
+                    counters[counter] = counters.get(counter, 0) + amount
+        return counters
+
+    def _load_counters(self) -> Dict[str, int]:
+        try:
+            with open(self.cache_dir / STATS_FILE, 'r', encoding='utf-8') as f:
+                _flock(f.fileno(), 'LOCK_SH')
+                return self._sum_counters(f)
+        except OSError:
+            return {}
+
+    def _append_counters(self, counters: Dict[str, int]) -> int:
+        """
+        附加一行統計（單次 write，多個行程同時附加也不會交錯），回傳檔案大小
+
+        寫入時持有共享鎖：附加端之間不互相等待，只和合併紀錄的行程互斥
+        """
+        line = (json.dumps(counters) + '\n').encode('utf-8')
+        fd = os.open(str(self.cache_dir / STATS_FILE), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+        try:
+            _flock(fd, 'LOCK_SH')
+            os.write(fd, line)
+            return os.fstat(fd).st_size
+        finally:
+            os.close(fd)
+
+    def _compact_counters(self):
+        """
+        把統計紀錄合併成一行
+
+        持有排他鎖讀取、加總後就地改寫同一個檔案（不改名），附加端在合併期間等待鎖，
+        之後的紀錄附加在合併結果之後；鎖正被其他行程持有時這次不合併，下次附加時再試
+        """
+        try:
+            import fcntl
+        except ImportError:
+            # 沒有 fcntl 的平台無法與附加端互斥，不合併
+            return
+        fd = os.open(str(self.cache_dir / STATS_FILE), os.O_RDWR)
+        try:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return
+            with open(fd, 'r+b', closefd=False) as f:
+                counters = self._sum_counters(f.read().decode('utf-8', 'replace').splitlines())
+                f.seek(0)
+                f.truncate()
+                if counters:
+                    f.write((json.dumps(counters) + '\n').encode('utf-8'))
+        finally:
+            os.close(fd)
+
+    def _bump(self, counter: str, amount: int = 1):
+        """累加命中統計（跨行程共用，附加到快取目錄的 stats.log）"""
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            if self._append_counters({counter: amount}) > STATS_MAX_BYTES:
+                self._compact_counters()
+        except OSError:
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        """快取統計資訊"""
+        entries = self._entries()
+        counters = self._load_counters()
+        hits = counters.get('hits', 0)
+        misses = counters.get('misses', 0)
+        lookups = hits + misses
+        return {
+            'path': str(self.cache_dir),
+            'entries': len(entries),
+            'bytes': sum(size for _, size, _ in entries),
+            'max_bytes': self.max_bytes,
+            'hits': hits,
+            'misses': misses,
+            'evictions': counters.get('evictions', 0),
+            'hit_rate': round(hits / lookups, 3) if lookups else 0.0,
+        }
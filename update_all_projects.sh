@@ -2,6 +2,9 @@
 
 # 更新所有專案的語音通知系統路徑
 # 從錯誤的 ~/.claude-code-tools 改為 ~/Documents/claude-code-voice
+#
+# 專案清單來自 project_registry.py 的登錄表，不掃描整個家目錄；
+# 加上 --rescan 會先增量掃描，找出登錄表以外的專案
 
 echo "🔧 開始更新所有專案的語音通知系統..."
 
@@ -15,12 +18,19 @@ NC='\033[0m' # No Color
 updated=0
 failed=0
 
-# 找出所有包含 .claude-voice 的專案
-echo -e "${BLUE}🔍 掃描專案...${NC}"
-projects=$(find ~ -name ".claude-voice" -type d 2>/dev/null | grep -v "Library/Caches")
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 
-for project_voice_dir in $projects; do
-    project_dir=$(dirname "$project_voice_dir")
+# 從登錄表取得包含 .claude-voice 的專案
+echo -e "${BLUE}🔍 讀取專案登錄表...${NC}"
+list_args=()
+if [ "$1" = "--rescan" ]; then
+    list_args+=(--rescan)
+fi
+projects=$(python3 "$SCRIPT_DIR/project_registry.py" list "${list_args[@]}")
+
+while IFS= read -r project_dir; do
+    project_voice_dir="$project_dir/.claude-voice"
+    [ -d "$project_voice_dir" ] || continue
     project_name=$(basename "$project_dir")
 
     echo -e "\n${BLUE}📁 處理專案: $project_name${NC}"
@@ -85,7 +95,7 @@ for project_voice_dir in $projects; do
 
     ((updated++))
     echo -e "   ${GREEN}✅ 專案更新完成${NC}"
-done
+done <<< "$projects"
 
 echo -e "\n${GREEN}===========================================
 ✅ 更新完成！
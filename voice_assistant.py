@@ -7,12 +7,20 @@ Claude Code 語音助理
 import os
 import sys
 import json
+import time
 import subprocess
 import platform
+import threading
+from contextlib import nullcontext
 from datetime import datetime
 from pathlib import Path
 from typing import Dict, Optional, List, Any
 
+# 添加工具路徑
+sys.path.insert(0, str(Path(__file__).parent))
+
+from voice_config import DEFAULT_CONFIG, ConfigSnapshot, load_snapshot, update_config_file
+
 
 class ClaudeVoiceAssistant:
     """Claude Code 語音助理主類別"""
@@ -26,81 +34,59 @@ class ClaudeVoiceAssistant:
         """
         self.base_dir = Path(__file__).parent
         self.config_path = config_path or self.base_dir / 'config.json'
-        self.config = self.load_config()
         
-        # 延遲載入音訊偵測器（避免循環依賴）
+        # 延遲載入音訊偵測器（避免循環依賴）；只有常駐的 daemon 監聽裝置變更，一次性的行程只查詢一次
         self.audio_detector = None
+        self.watch_audio_devices = False
         
-    def load_config(self) -> Dict[str, Any]:
-        """載入設定檔"""
-        default_config = {
-            'assistant_name': '小西',  # 助理的名字
-            'mode': 'full',  # 'full', 'silent', 'off'
-            'voice_rate': 180,
-            'voice_language': 'zh-TW',
-            'emotional_prefix': True,
-            'auto_detect_audio': True,
-            'prefixes': {
-                'urgent': '快來看看！',
-                'gentle': '嗨，打擾一下，',
-                'excited': '太棒了！',
-                'worried': '糟糕，',
-                'thinking': '嗯...讓我想想，'
-            },
-            'hotkey_mode': True,  # 使用按鍵啟動模式
-            'hotkey': 'F5',  # 預設熱鍵
-            'contextual_messages': {
-                # 通用訊息
-                'blocked': '{name}被阻塞了，需要您的協助',
-                'need_help': '{name}需要您的協助',
-                'task_completed': '{name}已完成任務',
-                'error': '{name}遇到錯誤，需要您檢查',
-                
-                # 特定情境訊息
-                'git_conflict': '發現 Git 衝突，需要您決定如何處理',
-                'test_failed': '測試失敗了，需要您檢查錯誤訊息',
-                'build_error': '建置過程出錯，可能需要調整設定',
-                'dependency_issue': '套件相依性問題，需要您確認版本',
-                'permission_denied': '權限不足，需要您授權',
-                'file_not_found': '找不到必要的檔案，需要您提供路徑',
-                'need_user_input': '需要您提供更多資訊才能繼續',
-                'review_required': '程式碼變更完成，請您檢視',
-                'deployment_ready': '部署準備就緒，需要您確認',
-                'long_running': '任務執行時間較長，請耐心等待'
-            }
-        }
-        
-        try:
-            if self.config_path.exists():
-                with open(self.config_path, 'r', encoding='utf-8') as f:
-                    user_config = json.load(f)
-                    # 深度合併設定
-                    for key, value in user_config.items():
-                        if isinstance(value, dict) and key in default_config:
-                            default_config[key].update(value)
-                        else:
-                            default_config[key] = value
-        except Exception as e:
-            print(f'載入設定檔失敗: {e}')
+        # 延遲建立語音快取與語音合成後端
+        self.tts_cache = None
+        self.tts_backend = None
+        self._tts_backend_preference = None
         
-        # 儲存預設設定（如果檔案不存在）
-        if not self.config_path.exists():
-            self.save_config(default_config)
+        # 語音播放佇列與通知合併器（延遲建立）及目前播放中的音訊行程
+        self.speech_queue = None
+        self.coalescer = None
+        self._audio_proc = None
+        self._audio_lock = threading.Lock()
+        self._cancelled = None
         
-        return default_config
+    @property
+    def config(self) -> ConfigSnapshot:
+        """目前的設定快照（設定檔變更時自動重新載入）"""
+        return load_snapshot(self.config_path)
     
-    def save_config(self, config: Optional[Dict] = None):
-        """儲存設定檔"""
-        config = config or self.config
+    def config_for(self, cwd: Optional[str] = None) -> ConfigSnapshot:
+        """工作目錄適用的設定：全域設定加上由 cwd 往上找到的專案設定（見 project_config）"""
         try:
-            self.config_path.parent.mkdir(parents=True, exist_ok=True)
-            with open(self.config_path, 'w', encoding='utf-8') as f:
-                json.dump(config, f, ensure_ascii=False, indent=2)
+            from project_config import resolve_config
+        except ImportError:
+            # 舊版本地副本沒有專案設定模組
+            return self.config
+        return resolve_config(cwd, self.config_path)
+    
+    def load_config(self) -> Dict[str, Any]:
+        """載入設定檔，回傳可修改的副本"""
+        return self.config.to_dict()
+    
+    def save_config(self, changes: Optional[Dict[str, Any]] = None, mutate=None) -> bool:
+        """
+        把變更的設定項目寫回設定檔（檔案鎖內讀取、修改、以 rename 替換）
+
+        Args:
+            changes: 要設定的項目
+            mutate: 依設定檔目前內容修改的函式，見 update_config_file
+        """
+        try:
+            update_config_file(self.config_path, changes, mutate)
+            return True
         except Exception as e:
             print(f'儲存設定檔失敗: {e}')
+            return False
     
     def notify(self, message: str = None, context: str = None, 
-               emotion: str = None, details: str = None):
+               emotion: str = None, details: str = None, force_voice: bool = False,
+               project: str = None, cwd: str = None, trace_id: str = None):
         """
         發送通知
         
@@ -109,20 +95,49 @@ class ClaudeVoiceAssistant:
             context: 情境類型（對應 contextual_messages 的 key）
             emotion: 情緒類型（對應 prefixes 的 key）
             details: 額外詳情
+            force_voice: 即使在靜音模式也播放語音（off 模式除外）
+            project: 發出通知的專案名稱（預設為工作目錄名稱，用於合併重複通知）
+            cwd: 發出通知的工作目錄，套用該專案的設定（預設為目前目錄）
+            trace_id: 端到端追蹤 ID（預設沿用環境變數 CLAUDE_VOICE_TRACE_ID，見 voice_trace）
         """
-        if self.config['mode'] == 'off':
+        with self._trace(trace_id), self._timer('notify'):
+            self._mark('notify_start')
+            self._notify(message, context, emotion, details, force_voice, project, cwd)
+    
+    def _notify(self, message: Optional[str], context: Optional[str], emotion: Optional[str],
+                details: Optional[str], force_voice: bool, project: Optional[str],
+                cwd: Optional[str]):
+        with self._timer('config'):
+            config = self.config_for(cwd)
+        self._configure_metrics(config)
+        if config['mode'] == 'off':
             return
         
+        # 處理訊息（情境訊息已預先替換名字佔位符）
+        if message:
+            message = message.format(name=config.get('assistant_name', 'Claude Code'))
+        else:
+            message = config.message(context)
+        
+        # 合併時間窗內的重複通知
+        entry = None
+        coalescer = self._get_coalescer(config)
+        if coalescer is not None:
+            entry, duplicate = coalescer.submit(
+                context, project or Path(cwd or Path.cwd()).name, message,
+                window_seconds=config.get('coalesce', {}).get('window_seconds', 10))
+            if duplicate:
+                self._mark('coalesced')
+                self._merge_duplicate(entry)
+                return
+            entry.config = config
+        
         # 自動偵測耳機並調整模式
-        effective_mode = self.config['mode']
-        if self.config['mode'] == 'silent' and self.config.get('auto_detect_audio', True):
+        effective_mode = 'full' if force_voice else config['mode']
+        if effective_mode == 'silent' and config.get('auto_detect_audio', True):
             try:
-                if self.audio_detector is None:
-                    from audio_detector import AudioDeviceDetector
-                    # 傳遞統一設定檔給音訊偵測器
-                    self.audio_detector = AudioDeviceDetector(self.config_path)
-                
-                audio_check = self.audio_detector.should_enable_voice()
+                with self._timer('audio_detect'):
+                    audio_check = self._get_audio_detector().should_enable_voice()
                 if audio_check['enable']:
                     effective_mode = 'full'
                     print(f"🎧 {audio_check['reason']}，自動啟用語音")
@@ -130,29 +145,71 @@ class ClaudeVoiceAssistant:
                 # 如果音訊偵測模組不可用，繼續使用原模式
                 pass
         
-        # 處理訊息
-        if not message:
-            if context:
-                message = self.config['contextual_messages'].get(
-                    context, 
-                    self.config['contextual_messages']['need_help']
-                )
-            else:
-                message = self.config['contextual_messages']['need_help']
-        
-        # 替換名字佔位符
-        assistant_name = self.config.get('assistant_name', 'Claude Code')
-        message = message.format(name=assistant_name)
+        speak = effective_mode == 'full' and config.get('voice_enabled', True)
+        item = self._deliver_notification(message, emotion, context, details, speak=speak,
+                                          config=config)
+        if entry is not None:
+            entry.emotion = emotion
+            entry.details = details
+            entry.speak = speak
+            entry.item = item
+    
+    def _timer(self, stage: str, backend: Optional[str] = None):
+        """
+        階段計時（見 voice_metrics），區塊內可改寫 label['backend']
+        舊版本地副本沒有統計模組時不計時
+        """
+        try:
+            from voice_metrics import timer
+        except ImportError:
+            return nullcontext({'backend': backend})
+        return timer(stage, backend)
+    
+    def _trace(self, trace_id: Optional[str]):
+        """在區塊內以 trace_id 作為目前執行緒的追蹤 ID"""
+        try:
+            from voice_trace import activate
+        except ImportError:
+            return nullcontext()
+        return activate(trace_id)
+    
+    def _mark(self, hop: str, backend: Optional[str] = None):
+        """記錄目前追蹤的通知經過某一站"""
+        try:
+            from voice_trace import mark_current
+        except ImportError:
+            return
+        mark_current(hop, backend)
+    
+    def _current_trace(self) -> Optional[str]:
+        try:
+            from voice_trace import current
+        except ImportError:
+            return None
+        return current()
+    
+    def _configure_metrics(self, config: ConfigSnapshot):
+        try:
+            from voice_metrics import configure
+        except ImportError:
+            return
+        configure(config)
+    
+    def _deliver_notification(self, message: str, emotion: Optional[str], context: Optional[str],
+                              details: Optional[str], speak: bool,
+                              config: Optional[ConfigSnapshot] = None):
+        """顯示、發送系統通知並排入語音，回傳語音佇列項目"""
+        config = config or self.config
         
         # 加入情緒化前綴
-        if self.config['emotional_prefix'] and emotion:
-            prefix = self.config['prefixes'].get(emotion, '')
+        if config['emotional_prefix'] and emotion:
+            prefix = config['prefixes'].get(emotion, '')
             if prefix:
                 message = f"{prefix}{message}"
         
         # 顯示訊息
         timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        assistant_name = self.config.get('assistant_name', 'Claude Code')
+        assistant_name = config.get('assistant_name', 'Claude Code')
         print('\n' + '=' * 50)
         print('🔔 Claude Voice Assistant')
         print(f'時間: {timestamp}')
@@ -165,66 +222,457 @@ class ClaudeVoiceAssistant:
         if platform.system() == 'Darwin':
             self._send_system_notification(message, assistant_name, interactive=False)
         
-        # 語音通知
-        if effective_mode == 'full':
-            self.speak(message)
+        # 語音通知（排入佇列，不等待播放結束）
+        if speak:
+            return self._enqueue_speech(message, emotion=emotion, context=context, config=config)
+        return None
     
-    def speak(self, text: str, rate: Optional[int] = None):
+    def _get_coalescer(self, config: Optional[ConfigSnapshot] = None):
+        """
+        取得通知合併器（延遲建立，依目前設定停用時回傳 None）
+        
+        時間窗每則通知從設定快照讀取（見 _notify），設定變更後立即生效
+        """
+        coalesce_config = (config or self.config).get('coalesce', {})
+        if not coalesce_config.get('enabled', True):
+            return None
+        if self.coalescer is None:
+            try:
+                from notification_coalescer import NotificationCoalescer
+            except ImportError:
+                return None
+            self.coalescer = NotificationCoalescer(
+                window_seconds=coalesce_config.get('window_seconds', 10),
+                fields=coalesce_config.get('fingerprint'),
+                normalize=coalesce_config.get('normalize'),
+                on_window_closed=self._announce_merged
+            )
+        return self.coalescer
+    
+    def _merged_message(self, entry) -> str:
+        """組合合併後的訊息，例如「X 專案發生 3 次：…」（套用第一則通知的專案設定）"""
+        config = entry.config or self.config
+        template = config.get('coalesce', {}).get(
+            'merged_template', '{project} 專案發生 {count} 次：{message}')
+        return template.format(project=entry.project, count=entry.count,
+                               message=entry.message, context=entry.context or '')
+    
+    def _merge_duplicate(self, entry):
+        """重複通知：尚未播放時直接改寫佇列中的語音，否則等時間窗結束再合併說出"""
+        print(f'🔁 合併重複通知（{entry.count} 次）: {entry.message}')
+        if entry.item is None or self.speech_queue is None:
+            return
+        
+        config = entry.config or self.config
+        message = self._merged_message(entry)
+        if config['emotional_prefix'] and entry.emotion:
+            message = f"{config['prefixes'].get(entry.emotion, '')}{message}"
+        if self.speech_queue.update_text(entry.item, message):
+            entry.announced = entry.count
+    
+    def _announce_merged(self, entry):
+        """時間窗結束時說出尚未播報的重複次數"""
+        self._deliver_notification(self._merged_message(entry), entry.emotion, entry.context,
+                                   entry.details, speak=entry.speak, config=entry.config)
+    
+    def speak(self, text: str, rate: Optional[int] = None, voice: Optional[str] = None):
         """
         播放語音
         
         Args:
             text: 要說的文字
             rate: 語速（預設使用設定檔的值）
+            voice: 語音名稱（預設依設定檔的語言選擇）
         """
         rate = rate or self.config['voice_rate']
-        system = platform.system()
+        backend = self._get_tts_backend()
+        if backend is None:
+            return
+        voice = voice or self._get_voice_for_language()
+        started = time.perf_counter()
         
+        with self._timer('speak', backend.name):
+            # 長訊息分段：第一段合成好就開始播放，其餘各段在播放前一段時合成
+            chunks = self._split_for_speech(text, rate, voice, backend)
+            if len(chunks) > 1:
+                spoken = self._speak_chunks(chunks, rate, voice, backend, started)
+                if spoken == len(chunks):
+                    return
+                # 某一段失敗：剩下的文字改用整段播放
+                if spoken:
+                    started = None
+                text = ' '.join(chunks[spoken:])
+            
+            # 優先播放快取的音訊檔（未命中時先合成到快取）
+            if self._cache_enabled(backend):
+                clip = self._render_to_cache(text, rate, voice)
+                if clip:
+                    self._audio_started(backend, started)
+                    with self._timer('play', backend.name):
+                        played = backend.play_file(clip)
+                    if played:
+                        self._mark('audio_end', backend.name)
+                        return
+            
+            if self._is_cancelled():
+                return
+            
+            try:
+                self._audio_started(backend, started)
+                with self._timer('play', backend.name):
+                    backend.speak(text, rate, voice)
+                if backend.streaming and self._cancelled is not None:
+                    # 常駐行程不回報播放結束，依估計的朗讀時間等待，期間可被打斷
+                    self._cancelled.wait(backend.estimate_duration(text, rate))
+                self._mark('audio_end', backend.name)
+            except FileNotFoundError:
+                print(backend.install_hint)
+            except Exception as e:
+                print(f'語音播放失敗: {e}')
+    
+    def _split_for_speech(self, text: str, rate: int, voice: Optional[str], backend) -> List[str]:
+        """
+        依設定把長訊息切段（見 text_chunker）
+        
+        常駐行程的後端本來就邊合成邊播放，整段已在快取中（例如預先合成的訊息）時直接播放整段，都不切
+        """
+        chunking = self.config.get('speech_chunking', {})
+        if not chunking.get('enabled', True) or backend.streaming:
+            return [text]
         try:
-            if system == 'Darwin':  # macOS
-                voice = self._get_voice_for_language()
-                if voice:
-                    cmd = ['say', '-v', voice, '-r', str(rate), text]
-                else:
-                    cmd = ['say', '-r', str(rate), text]
-                subprocess.run(cmd, check=True)
-                
-            elif system == 'Windows':
-                # Windows 使用 PowerShell
-                escaped_text = text.replace('"', '`"')
-                ps_script = f'''
-                Add-Type -AssemblyName System.Speech
-                $speak = New-Object System.Speech.Synthesis.SpeechSynthesizer
-                $speak.Rate = {rate // 20 - 10}  # 調整範圍到 -10 到 10
-                $speak.Speak("{escaped_text}")
-                '''
-                subprocess.run(['powershell', '-Command', ps_script], check=True)
-                
-            elif system == 'Linux':
-                # Linux 使用 espeak
+            from text_chunker import split_chunks
+        except ImportError:
+            # 舊版本地副本可能沒有分段模組
+            return [text]
+        
+        chunks = split_chunks(text, chunking.get('max_chars', 100), chunking.get('first_max_chars', 40))
+        if len(chunks) > 1 and self._cache_enabled(backend):
+            cache = self._get_tts_cache()
+            if cache is not None and cache.contains(cache.make_key(text, voice, rate, backend.cache_name),
+                                                    backend.audio_ext):
+                return [text]
+        return chunks
+    
+    def _speak_chunks(self, chunks: List[str], rate: int, voice: Optional[str], backend,
+                      started: Optional[float]) -> int:
+        """
+        依序播放各段
+        
+        使用語音快取時由背景執行緒依序把各段合成到快取（已快取的段落直接沿用），
+        第一段好了就開始播放，播放前一段時後面幾段已在合成；
+        不使用快取時逐段直接播放。某一段合成或播放失敗時停止
+        
+        Returns:
+            已播放（或被打斷而不必再播）的段數，小於段數時由呼叫端播放剩下的文字
+        """
+        if not self._cache_enabled(backend):
+            for index, chunk in enumerate(chunks):
+                if self._is_cancelled():
+                    return len(chunks)
+                if index == 0:
+                    self._audio_started(backend, started)
                 try:
-                    subprocess.run(['espeak', text, '-s', str(rate)], check=True)
-                except FileNotFoundError:
-                    print('Linux 系統需要安裝 espeak: sudo apt-get install espeak')
-                    
-        except Exception as e:
-            print(f'語音播放失敗: {e}')
-    
-    def _get_voice_for_language(self) -> Optional[str]:
-        """根據語言設定取得對應的語音"""
-        voice_map = {
-            'zh-TW': 'Mei-Jia',      # 台灣中文
-            'zh-CN': 'Ting-Ting',    # 簡體中文
-            'en-US': 'Samantha',     # 美式英文
-            'ja-JP': 'Kyoko'         # 日文
-        }
-        return voice_map.get(self.config['voice_language'])
+                    with self._timer('play', backend.name):
+                        backend.speak(chunk, rate, voice)
+                except Exception:
+                    return index
+            self._mark('audio_end', backend.name)
+            return len(chunks)
+        
+        import queue
+        
+        lookahead = max(1, int(self.config.get('speech_chunking', {}).get('lookahead', 2)))
+        clips = queue.Queue(maxsize=lookahead)
+        done = threading.Event()
+        trace_id = self._current_trace()
+        
+        def render():
+            with self._trace(trace_id):
+                for chunk in chunks:
+                    if done.is_set():
+                        return
+                    try:
+                        clip = self._render_to_cache(chunk, rate, voice)
+                    except Exception:
+                        clip = None
+                    # 播放端最多領先 lookahead 段；播放端提早結束時不再等待
+                    while not done.is_set():
+                        try:
+                            clips.put(clip, timeout=0.1)
+                            break
+                        except queue.Full:
+                            continue
+                    if clip is None:
+                        return
+        
+        threading.Thread(target=render, name='speech-render', daemon=True).start()
+        try:
+            for index in range(len(chunks)):
+                clip = None
+                while True:
+                    if self._is_cancelled():
+                        return len(chunks)
+                    try:
+                        clip = clips.get(timeout=0.1)
+                        break
+                    except queue.Empty:
+                        continue
+                if clip is None:
+                    return index
+                if index == 0:
+                    self._audio_started(backend, started)
+                with self._timer('play', backend.name):
+                    played = backend.play_file(clip)
+                if not played:
+                    return index
+        finally:
+            done.set()
+        self._mark('audio_end', backend.name)
+        return len(chunks)
+    
+    def _cache_enabled(self, backend) -> bool:
+        """後端可輸出音訊檔且設定啟用語音快取"""
+        return backend.supports_cache and self.config.get('tts_cache', {}).get('enabled', True)
+    
+    def _is_cancelled(self) -> bool:
+        """語音佇列是否要求中斷目前這一則"""
+        return self._cancelled is not None and self._cancelled.is_set()
+    
+    def _audio_started(self, backend, started: Optional[float]):
+        """記錄開始出聲：追蹤的 audio_start 與從 speak() 開始的等待時間（first_audio）"""
+        self._mark('audio_start', backend.name)
+        if started is None:
+            return
+        try:
+            from voice_metrics import observe
+        except ImportError:
+            return
+        observe('first_audio', time.perf_counter() - started, backend.name)
+    
+    def _get_tts_backend(self):
+        """取得語音合成後端（延遲建立，設定變更時重新選擇）"""
+        preference = self.config.get('tts_backend', 'auto')
+        if self.tts_backend is None or self._tts_backend_preference != preference:
+            try:
+                from tts_backends import select_backend
+            except ImportError:
+                # 舊版本地副本可能沒有後端模組
+                return None
+            if self.tts_backend is not None:
+                self.tts_backend.close()
+            self.tts_backend = select_backend(preference, self._run_audio_command)
+            self._tts_backend_preference = preference
+        return self.tts_backend
+    
+    def _get_audio_detector(self):
+        """取得音訊偵測器（延遲建立，傳入統一設定檔）"""
+        if self.audio_detector is None:
+            from audio_detector import AudioDeviceDetector
+            self.audio_detector = AudioDeviceDetector(self.config_path,
+                                                      watch=self.watch_audio_devices)
+        return self.audio_detector
+    
+    def close(self):
+        """釋放常駐資源：停止音訊裝置監聽（pactl subscribe）並關閉語音後端"""
+        if self.audio_detector is not None:
+            self.audio_detector.close()
+            self.audio_detector = None
+        if self.tts_backend is not None:
+            self.tts_backend.close()
+    
+    def _get_tts_cache(self):
+        """取得語音快取（延遲建立）"""
+        if self.tts_cache is None:
+            try:
+                from tts_cache import TTSCache
+            except ImportError:
+                # 舊版本地副本可能沒有快取模組
+                return None
+            max_mb = self.config.get('tts_cache', {}).get('max_mb', 50)
+            self.tts_cache = TTSCache(max_bytes=int(max_mb * 1024 * 1024))
+        return self.tts_cache
+    
+    def _render_to_cache(self, text: str, rate: int, voice: Optional[str] = None) -> Optional[Path]:
+        """
+        取得文字對應的快取音訊檔，未命中時合成後存入快取
+        
+        常駐行程的後端未命中時不合成：邊合成邊播放比先合成到檔案更快出聲，快取由預先合成填入
+        
+        Returns:
+            音訊檔路徑；後端無法輸出檔案或常駐行程未命中時回傳 None（改用直接播放）
+        """
+        backend = self._get_tts_backend()
+        if backend is None or not backend.supports_cache:
+            return None
+        
+        cache = self._get_tts_cache()
+        if cache is None:
+            return None
+        
+        voice = voice or self._get_voice_for_language()
+        key = cache.make_key(text, voice, rate, backend.cache_name)
+        
+        clip = cache.lookup(key, backend.audio_ext)
+        if clip or backend.streaming:
+            return clip
+        
+        temp_path = cache.new_temp_path(key, backend.audio_ext)
+        try:
+            with self._timer('synthesize', backend.name):
+                synthesized = backend.synthesize_to_file(text, rate, voice, temp_path)
+            if not synthesized:
+                return None
+            self._mark('synthesized', backend.name)
+            return cache.store(key, backend.audio_ext, temp_path)
+        finally:
+            if temp_path.exists():
+                temp_path.unlink()
+    
+    def _run_audio_command(self, cmd: List[str], input_data: Optional[bytes] = None) -> int:
+        """
+        執行會發出聲音的命令，可被 stop_speaking() 中斷
+        
+        Args:
+            cmd: 命令
+            input_data: 寫入命令 stdin 的資料（例如記憶體中的 WAV）
+        
+        Returns:
+            行程結束碼；被打斷時為負值
+        
+        Raises:
+            subprocess.CalledProcessError: 命令執行失敗
+        """
+        with self._audio_lock:
+            if self._cancelled is not None and self._cancelled.is_set():
+                return -1
+            proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                    stdin=subprocess.PIPE if input_data is not None else None)
+            self._audio_proc = proc
+        try:
+            if input_data is not None:
+                proc.communicate(input_data)
+                returncode = proc.returncode
+            else:
+                returncode = proc.wait()
+        finally:
+            with self._audio_lock:
+                self._audio_proc = None
+        if returncode > 0:
+            raise subprocess.CalledProcessError(returncode, cmd)
+        return returncode
+    
+    def stop_speaking(self):
+        """中斷目前播放中的語音"""
+        with self._audio_lock:
+            proc = self._audio_proc
+            if proc is not None and proc.poll() is None:
+                proc.terminate()
+        if self.tts_backend is not None and self.tts_backend.streaming:
+            self.tts_backend.stop()
+    
+    def _get_speech_queue(self):
+        """取得語音播放佇列（延遲建立）"""
+        if self.speech_queue is None:
+            try:
+                from speech_queue import SpeechQueue
+            except ImportError:
+                return None
+            queue_config = self.config.get('speech_queue', {})
+            self.speech_queue = SpeechQueue(
+                self._speak_queued,
+                self.stop_speaking,
+                preempt_priority=queue_config.get('preempt_priority', 90),
+                max_depth=queue_config.get('max_depth', 20),
+                overflow_policy=queue_config.get('overflow_policy', 'merge'),
+                overflow_max_priority=queue_config.get('overflow_max_priority', 50),
+                merge_template=queue_config.get('overflow_merge_template', '另有 {count} 則較低優先的通知')
+            )
+        return self.speech_queue
+    
+    def _speech_priority(self, emotion: Optional[str] = None, context: Optional[str] = None) -> int:
+        """依情緒與情境決定播放優先權（取兩者較高者）"""
+        from speech_queue import DEFAULT_PRIORITIES, DEFAULT_PRIORITY
+        
+        priorities = dict(DEFAULT_PRIORITIES)
+        priorities.update(self.config.get('speech_queue', {}).get('priorities', {}))
+        candidates = [priorities[key] for key in (emotion, context) if key in priorities]
+        return max(candidates) if candidates else DEFAULT_PRIORITY
+    
+    def _speech_ttl(self, emotion: Optional[str] = None, context: Optional[str] = None) -> float:
+        """依情境（其次是情緒）決定語音有效期限"""
+        from speech_queue import DEFAULT_TTLS, DEFAULT_TTL
+        
+        ttls = dict(DEFAULT_TTLS)
+        ttls.update(self.config.get('speech_queue', {}).get('ttl_seconds', {}))
+        for key in (context, emotion):
+            if key in ttls:
+                return ttls[key]
+        return ttls.get('default', DEFAULT_TTL)
+    
+    def _enqueue_speech(self, text: str, emotion: Optional[str] = None,
+                        context: Optional[str] = None, config: Optional[ConfigSnapshot] = None):
+        """
+        把語音排入佇列並回傳佇列項目；停用佇列時直接播放
+        
+        Args:
+            config: 專案設定（決定語速與語音），預設為全域設定
+        """
+        rate = voice = None
+        if config is not None:
+            rate = config['voice_rate']
+            voice = self._get_voice_for_language(config)
+        
+        queue = None
+        if self.config.get('speech_queue', {}).get('enabled', True):
+            queue = self._get_speech_queue()
+        if queue is None:
+            self.speak(text, rate, voice)
+            return None
+        # 先記錄再排入：工作執行緒可能立即開始播放
+        self._mark('speech_queued')
+        return queue.put(text, self._speech_priority(emotion, context), rate=rate,
+                         ttl=self._speech_ttl(emotion, context), voice=voice,
+                         trace_id=self._current_trace())
+    
+    def _speak_queued(self, text: str, rate: Optional[int], cancelled: threading.Event,
+                      voice: Optional[str] = None, trace_id: Optional[str] = None):
+        """佇列工作執行緒呼叫的播放函式"""
+        self._cancelled = cancelled
+        try:
+            with self._trace(trace_id):
+                self._mark('speech_start')
+                self.speak(text, rate, voice)
+        finally:
+            self._cancelled = None
+    
+    def wait_until_idle(self, timeout: Optional[float] = None) -> bool:
+        """等待佇列中的語音全部播放完畢"""
+        if self.speech_queue is None:
+            return True
+        return self.speech_queue.wait_until_idle(timeout)
+    
+    def speech_stats(self) -> Dict[str, Any]:
+        """語音佇列統計（深度、等待時間、打斷次數）"""
+        if self.speech_queue is None:
+            return {'depth': 0, 'playing': None, 'playing_priority': None, 'spoken': 0,
+                    'preempted': 0, 'expired': 0, 'dropped': 0, 'merged': 0,
+                    'wait_ms_avg': 0.0, 'wait_ms_p95': 0.0, 'wait_ms_max': 0.0}
+        return self.speech_queue.stats()
+    
+    def _get_voice_for_language(self, config: Optional[ConfigSnapshot] = None) -> Optional[str]:
+        """指定的語音（voice），或根據語言設定取得目前後端對應的語音"""
+        config = config or self.config
+        if config.get('voice'):
+            return config['voice']
+        backend = self._get_tts_backend()
+        if backend is None:
+            return None
+        return backend.voice_for(config['voice_language'])
     
     def set_mode(self, mode: str):
         """設定通知模式"""
         if mode in ['full', 'silent', 'off']:
-            self.config['mode'] = mode
-            self.save_config()
+            self.save_config({'mode': mode})
             print(f'✅ 模式已切換為: {mode}')
         else:
             print('❌ 無效的模式。請使用: full, silent, 或 off')
@@ -241,41 +689,86 @@ class ClaudeVoiceAssistant:
     
     def update_config(self, key: str, value):
         """更新設定值"""
-        self.config[key] = value
-        self.save_config()
-        print(f'✅ 已更新 {key} = {value}')
+        self.update_config_values({key: value})
+    
+    def update_config_values(self, values: Dict[str, Any]):
+        """一次寫入多個設定值"""
+        if self.save_config(values):
+            for key, value in values.items():
+                print(f'✅ 已更新 {key} = {value}')
+    
+    def _update_devices(self, update) -> Optional[bool]:
+        """
+        在寫入鎖內依設定檔目前的 my_devices 修改裝置清單
+
+        Args:
+            update: 以裝置清單呼叫並直接修改，回傳是否有變更
+
+        Returns:
+            是否有變更；寫入失敗時回傳 None
+        """
+        result = {}
+        
+        def mutate(user_config):
+            devices = list(user_config.get('my_devices', DEFAULT_CONFIG['my_devices']))
+            result['changed'] = update(devices)
+            if result['changed']:
+                user_config['my_devices'] = devices
+        
+        if not self.save_config(mutate=mutate):
+            return None
+        return result['changed']
     
     def add_device(self, device_name: str):
         """加入音訊裝置"""
-        if device_name not in self.config.get('my_devices', []):
-            self.config.setdefault('my_devices', []).append(device_name)
-            self.save_config()
+        def add(devices):
+            if device_name in devices:
+                return False
+            devices.append(device_name)
+            return True
+        
+        changed = self._update_devices(add)
+        if changed:
             print(f'✅ 已加入裝置: {device_name}')
-        else:
+        elif changed is not None:
             print(f'ℹ️ 裝置已存在: {device_name}')
     
     def remove_device(self, device_name: str):
         """移除音訊裝置"""
-        devices = self.config.get('my_devices', [])
-        if device_name in devices:
+        def remove(devices):
+            if device_name not in devices:
+                return False
             devices.remove(device_name)
-            self.save_config()
+            return True
+        
+        changed = self._update_devices(remove)
+        if changed:
             print(f'✅ 已移除裝置: {device_name}')
-        else:
+        elif changed is not None:
             print(f'❌ 找不到裝置: {device_name}')
     
-    def say(self, message: str, emotion: str = None, voice_only: bool = False):
-        """自由說話功能"""
+    def say(self, message: str, emotion: str = None, voice_only: bool = False, cwd: str = None,
+            trace_id: str = None):
+        """自由說話功能（cwd 為發出請求的工作目錄，套用該專案的設定；trace_id 見 notify）"""
+        with self._trace(trace_id), self._timer('say'):
+            self._mark('notify_start')
+            self._say(message, emotion, voice_only, cwd)
+    
+    def _say(self, message: str, emotion: Optional[str], voice_only: bool, cwd: Optional[str]):
+        with self._timer('config'):
+            config = self.config_for(cwd)
+        self._configure_metrics(config)
+        
         # 加入情緒化前綴
-        if self.config['emotional_prefix'] and emotion:
-            prefix = self.config['prefixes'].get(emotion, '')
+        if config['emotional_prefix'] and emotion:
+            prefix = config['prefixes'].get(emotion, '')
             if prefix:
                 message = f"{prefix}{message}"
         
         # 顯示訊息（除非是純語音模式或關閉模式）
-        if not voice_only and self.config['mode'] != 'off':
+        if not voice_only and config['mode'] != 'off':
             timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            assistant_name = self.config.get('assistant_name', 'Claude Code')
+            assistant_name = config.get('assistant_name', 'Claude Code')
             print('\n' + '=' * 50)
             print(f'💬 {assistant_name} 說話')
             print(f'時間: {timestamp}')
@@ -283,23 +776,20 @@ class ClaudeVoiceAssistant:
             print('=' * 50 + '\n')
         
         # 語音播放（根據模式決定）
-        if self.config['mode'] != 'off':
+        if config['mode'] != 'off' and config.get('voice_enabled', True):
             # 靜音模式下檢查耳機
-            if self.config['mode'] == 'silent' and self.config.get('auto_detect_audio', True):
+            if config['mode'] == 'silent' and config.get('auto_detect_audio', True):
                 try:
-                    if self.audio_detector is None:
-                        from audio_detector import AudioDeviceDetector
-                        self.audio_detector = AudioDeviceDetector(self.config_path)
-                    
-                    audio_check = self.audio_detector.should_enable_voice()
+                    with self._timer('audio_detect'):
+                        audio_check = self._get_audio_detector().should_enable_voice()
                     if audio_check['enable']:
                         if not voice_only:
                             print(f"🎧 {audio_check['reason']}，自動啟用語音")
-                        self.speak(message)
+                        self._enqueue_speech(message, emotion=emotion, config=config)
                 except ImportError:
                     pass
-            elif self.config['mode'] == 'full':
-                self.speak(message)
+            elif config['mode'] == 'full':
+                self._enqueue_speech(message, emotion=emotion, config=config)
     
     def listen(self, duration: int = 5, fallback_to_text: bool = True, use_real_speech: bool = True):
         """語音輸入功能"""
@@ -485,7 +975,8 @@ class ClaudeVoiceAssistant:
                         '-dropdownLabel', '如何回應？'
                     ])
                 
-                result = subprocess.run(cmd, capture_output=True, check=True, text=True)
+                with self._timer('system_notification', 'terminal-notifier'):
+                    result = subprocess.run(cmd, capture_output=True, check=True, text=True)
                 
                 if (interactive or enable_response) and result.stdout.strip():
                     response = result.stdout.strip()
@@ -516,10 +1007,11 @@ class ClaudeVoiceAssistant:
                 '''
             else:
                 # 普通通知
-                result = subprocess.run([
-                    'osascript', '-e',
-                    f'display notification "{escaped_message}" with title "{escaped_title}"'
-                ], capture_output=True, check=True, text=True)
+                with self._timer('system_notification', 'osascript'):
+                    result = subprocess.run([
+                        'osascript', '-e',
+                        f'display notification "{escaped_message}" with title "{escaped_title}"'
+                    ], capture_output=True, check=True, text=True)
                 
                 print("✅ 使用 osascript 發送通知")
                 if result.stderr:
@@ -793,10 +1285,35 @@ def main():
     # config 命令
     config_parser = subparsers.add_parser('config', help='設定管理')
     config_parser.add_argument('--show', action='store_true', help='顯示目前設定')
-    config_parser.add_argument('--set', nargs=2, metavar=('KEY', 'VALUE'), help='設定單一項目')
+    config_parser.add_argument('--set', nargs=2, action='append', metavar=('KEY', 'VALUE'),
+                               help='設定項目（可重複，多個項目一次寫入）')
     config_parser.add_argument('--add-device', metavar='DEVICE', help='加入音訊裝置')
     config_parser.add_argument('--remove-device', metavar='DEVICE', help='移除音訊裝置')
     
+    # cache 命令
+    cache_parser = subparsers.add_parser('cache', help='查看或清除語音快取')
+    cache_parser.add_argument('--clear', action='store_true', help='清除所有快取的語音檔')
+    
+    # queue 命令
+    subparsers.add_parser('queue', help='查看 daemon 語音佇列深度、等待時間與丟棄／合併／過期統計')
+    
+    # stats 命令
+    stats_parser = subparsers.add_parser('stats', help='各階段、各後端的耗時 p50/p95/p99')
+    stats_parser.add_argument('--since', type=float, help='只統計最近幾分鐘')
+    stats_parser.add_argument('--recent', type=int, help='只統計最近幾筆記錄')
+    stats_parser.add_argument('--json', action='store_true', help='以 JSON 輸出')
+    
+    # trace 命令
+    trace_parser = subparsers.add_parser('trace', help='最近通知從 hook 到開始播放的各站耗時')
+    trace_parser.add_argument('trace_id', nargs='?', help='只顯示此追蹤 ID（可只給開頭幾碼）')
+    trace_parser.add_argument('--recent', type=int, help='顯示最近幾則通知（預設 10）')
+    trace_parser.add_argument('--json', action='store_true', help='以 JSON 輸出')
+    
+    # prerender 命令
+    prerender_parser = subparsers.add_parser('prerender', help='預先合成所有前綴 × 情境訊息到快取')
+    prerender_parser.add_argument('--workers', type=int, help='平行合成的行程數（預設使用設定檔）')
+    prerender_parser.add_argument('--force', action='store_true', help='忽略既有快取，全部重新合成')
+    
     args = parser.parse_args()
     
     # 初始化助理
@@ -885,21 +1402,20 @@ def main():
     elif args.command == 'config':
         if args.show or not any([args.set, args.add_device, args.remove_device]):
             print('目前設定:')
-            print(json.dumps(assistant.config, ensure_ascii=False, indent=2))
+            print(json.dumps(assistant.config.to_dict(), ensure_ascii=False, indent=2))
         
         if args.set:
-            key, value = args.set
-            # 嘗試轉換數值
-            try:
+            values = {}
+            for key, value in args.set:
+                # 嘗試轉換數值
                 if value.lower() == 'true':
                     value = True
                 elif value.lower() == 'false':
                     value = False
                 elif value.isdigit():
                     value = int(value)
-            except:
-                pass
-            assistant.update_config(key, value)
+                values[key] = value
+            assistant.update_config_values(values)
         
         if args.add_device:
             assistant.add_device(args.add_device)
@@ -907,6 +1423,62 @@ def main():
         if args.remove_device:
             assistant.remove_device(args.remove_device)
     
+    elif args.command == 'cache':
+        cache = assistant._get_tts_cache()
+        if cache is None:
+            print('❌ 找不到語音快取模組 tts_cache.py')
+        elif args.clear:
+            removed = cache.clear()
+            print(f'🗑️ 已清除 {removed} 個快取語音檔')
+        else:
+            stats = cache.stats()
+            print('🗂️ 語音快取狀態:')
+            print(f"  位置: {stats['path']}")
+            print(f"  檔案數: {stats['entries']}")
+            print(f"  容量: {stats['bytes'] / 1024 / 1024:.1f} MB / {stats['max_bytes'] / 1024 / 1024:.0f} MB")
+            print(f"  命中: {stats['hits']}  未命中: {stats['misses']}  命中率: {stats['hit_rate']:.1%}")
+            print(f"  淘汰次數: {stats['evictions']}")
+    
+    elif args.command == 'queue':
+        from voice_client import send_request
+        status = send_request({'cmd': 'status'})
+        if not status:
+            print('ℹ️ daemon 未在運行，沒有常駐語音佇列')
+        else:
+            stats = status.get('speech_queue', {})
+            print('📥 語音佇列狀態:')
+            print(f"  等待中: {stats.get('depth', 0)}")
+            if stats.get('playing'):
+                print(f"  播放中: {stats['playing']} (優先權 {stats['playing_priority']})")
+            print(f"  已播放: {stats.get('spoken', 0)}  被打斷: {stats.get('preempted', 0)}")
+            print(f"  過期: {stats.get('expired', 0)}  丟棄: {stats.get('dropped', 0)}  合併: {stats.get('merged', 0)}")
+            print(f"  等待時間: 平均 {stats.get('wait_ms_avg', 0)} ms, "
+                  f"p95 {stats.get('wait_ms_p95', 0)} ms, 最長 {stats.get('wait_ms_max', 0)} ms")
+    
+    elif args.command == 'stats':
+        from voice_metrics import LOG_PATH, STATS_RECENT, read_log, summarize, print_stats
+        since = time.time() - args.since * 60 if args.since else None
+        rows = summarize(read_log(recent=args.recent or STATS_RECENT, since=since))
+        if args.json:
+            print(json.dumps(rows, ensure_ascii=False, indent=2))
+        else:
+            print(f'⏱️ 通知流程耗時（{LOG_PATH}）')
+            print_stats(rows)
+    
+    elif args.command == 'trace':
+        from voice_trace import TRACE_RECENT, read_traces, breakdown, summarize_hops, print_traces
+        traces = read_traces(recent=args.recent or TRACE_RECENT, trace_id=args.trace_id)
+        if args.json:
+            print(json.dumps({'traces': [{'trace': trace['trace'], 'hops': breakdown(trace)}
+                                         for trace in traces],
+                              'segments': summarize_hops(traces)}, ensure_ascii=False, indent=2))
+        else:
+            print_traces(traces)
+    
+    elif args.command == 'prerender':
+        from prerender import prerender_all, print_report
+        print_report(prerender_all(assistant, workers=args.workers, force=args.force))
+    
     elif args.command == 'hotkey':
         assistant.start_hotkey_listener()
     
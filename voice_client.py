@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+語音助理 daemon 客戶端
+透過 Unix socket 送出 JSON-lines 請求，daemon 排入佇列後立即返回
+
+通知路徑（send_notification）每次 hook 都會執行，只依賴 os 與 socket：
+請求由 encode_json() 手動編碼，不匯入 json（會連帶匯入 re）與 typing
+"""
+from __future__ import annotations
+
+import os
+import time
+import socket
+
+from voice_paths import SOCKET_PATH
+
+_ESCAPES = {'"': '\\"', '\\': '\\\\', '\n': '\\n', '\r': '\\r', '\t': '\\t'}
+
+
+def _encode_string(value: str) -> str:
+    out = []
+    for char in value:
+        if char in _ESCAPES:
+            out.append(_ESCAPES[char])
+        elif char < ' ':
+            out.append('\\u%04x' % ord(char))
+        else:
+            out.append(char)
+    return '"' + ''.join(out) + '"'
+
+
+def encode_json(payload: dict) -> str:
+    """把只含字串、數字、布林與 None 的扁平 dict 編碼為 JSON"""
+    items = []
+    for key, value in payload.items():
+        if value is None:
+            encoded = 'null'
+        elif value is True:
+            encoded = 'true'
+        elif value is False:
+            encoded = 'false'
+        elif isinstance(value, (int, float)):
+            encoded = repr(value)
+        else:
+            encoded = _encode_string(str(value))
+        items.append(_encode_string(key) + ': ' + encoded)
+    return '{' + ', '.join(items) + '}'
+
+
+def send_line(line: str, timeout: float = 2.0, socket_path: str = SOCKET_PATH) -> bytes | None:
+    """
+    送出一行請求並讀取一行回覆
+
+    Returns:
+        原始回覆；沒有 daemon 在監聽時回傳 None
+    """
+    if not hasattr(socket, 'AF_UNIX') or not os.path.exists(socket_path):
+        return None
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        sock.connect(socket_path)
+        sock.sendall((line + '\n').encode('utf-8'))
+
+        # 讀取一行回覆
+        data = b''
+        while not data.endswith(b'\n'):
+            chunk = sock.recv(4096)
+            if not chunk:
+                break
+            data += chunk
+        return data or None
+    except OSError:
+        # socket 殘留但 daemon 已結束或逾時
+        return None
+    finally:
+        sock.close()
+
+
+def send_request(payload: dict, timeout: float = 2.0,
+                 socket_path: str = SOCKET_PATH) -> dict | None:
+    """
+    送出單一請求並等待 daemon 的回覆
+
+    Returns:
+        daemon 回傳的 dict；沒有 daemon 在監聽時回傳 None
+    """
+    import json
+
+    data = send_line(json.dumps(payload, ensure_ascii=False), timeout, socket_path)
+    if data is None:
+        return None
+    try:
+        return json.loads(data.decode('utf-8'))
+    except ValueError:
+        # 回覆格式錯誤
+        return None
+
+
+def daemon_available() -> bool:
+    """檢查 daemon 是否正在監聽"""
+    response = send_line('{"cmd": "ping"}', timeout=0.5)
+    return response is not None and b'"ok":true' in response.replace(b' ', b'')
+
+
+def send_notification(message: str = None, emotion: str = None, context: str = None,
+                      details: str = None, force_voice: bool = False, trace_id: str = None) -> bool:
+    """
+    將通知交給 daemon
+
+    Args:
+        trace_id: 追蹤 ID（預設沿用 hook 設定的 CLAUDE_VOICE_TRACE_ID，見 voice_trace）
+
+    Returns:
+        True 表示已排入 daemon 佇列；False 表示需要改用行程內路徑
+    """
+    payload = {
+        'cmd': 'notify',
+        'message': message,
+        'emotion': emotion,
+        'context': context,
+        'details': details,
+        'force_voice': force_voice,
+        'project': os.path.basename(os.getcwd()),
+        # daemon 依客戶端的工作目錄套用專案設定
+        'cwd': os.getcwd(),
+    }
+    try:
+        from voice_trace import TRACE_ENV, mark
+        trace_id = trace_id or os.environ.get(TRACE_ENV)
+    except ImportError:
+        # 舊版本地副本沒有追蹤模組
+        trace_id = None
+    if trace_id:
+        payload['trace'] = trace_id
+        sent_at = time.time()
+    response = send_line(encode_json(payload))
+    # daemon 以 json.dumps 回覆，只需確認 queued 欄位
+    queued = response is not None and b'"queued":true' in response.replace(b' ', b'')
+    if queued and trace_id:
+        # 只記錄確實交給 daemon 的通知（沒有 daemon 時改走行程內路徑）
+        mark(trace_id, 'client_send', ts=sent_at)
+    return queued
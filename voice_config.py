@@ -0,0 +1,421 @@
+#!/usr/bin/env python3
+"""
+語音助理設定
+config.json 與預設值合併後編譯成不可變的快照：檔案的 mtime 與大小不變時直接重用，
+改變時自動重新載入，常駐行程不必重新啟動。合併結果另存一份在狀態目錄，
+新行程不需重新合併。讀取設定永遠不會寫入 config.json。
+
+寫入設定（update_config_file）在檔案鎖內讀取、只修改變更的項目，再以暫存檔加 rename
+整份替換：同時執行的命令不會互相覆蓋，讀取端也不會讀到寫到一半的檔案。
+"""
+import os
+import json
+import copy
+import time
+import hashlib
+import threading
+from contextlib import contextmanager
+from collections.abc import Mapping
+from types import MappingProxyType
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+from voice_paths import STATE_DIR
+
+# 合併結果的磁碟快取
+CACHE_DIR = os.path.join(STATE_DIR, 'config_cache')
+
+# 寫入設定檔用的鎖檔（放在狀態目錄，不在設定檔旁邊留下多餘檔案）
+LOCK_DIR = os.path.join(STATE_DIR, 'locks')
+
+DEFAULT_CONFIG = {
+    'assistant_name': '小西',  # 助理的名字
+    'mode': 'full',  # 'full', 'silent', 'off'
+    'voice_rate': 180,
+    'voice_language': 'zh-TW',
+    'emotional_prefix': True,
+    'voice_enabled': True,  # 專案可在 .claude-voice-config.json 停用
+    'auto_detect_audio': True,  # 靜音模式下偵測到耳機或 my_devices 中的裝置時仍播放語音
+    'my_devices': [],  # 裝置名稱或描述包含任一項即視為個人裝置（不分大小寫）
+    'prefixes': {
+        'urgent': '快來看看！',
+        'gentle': '嗨，打擾一下，',
+        'excited': '太棒了！',
+        'worried': '糟糕，',
+        'thinking': '嗯...讓我想想，'
+    },
+    'hotkey_mode': True,  # 使用按鍵啟動模式
+    'hotkey': 'F5',  # 預設熱鍵
+    'contextual_messages': {
+        # 通用訊息
+        'blocked': '{name}被阻塞了，需要您的協助',
+        'need_help': '{name}需要您的協助',
+        'task_completed': '{name}已完成任務',
+        'error': '{name}遇到錯誤，需要您檢查',
+        
+        # 特定情境訊息
+        'git_conflict': '發現 Git 衝突，需要您決定如何處理',
+        'test_failed': '測試失敗了，需要您檢查錯誤訊息',
+        'build_error': '建置過程出錯，可能需要調整設定',
+        'dependency_issue': '套件相依性問題，需要您確認版本',
+        'permission_denied': '權限不足，需要您授權',
+        'file_not_found': '找不到必要的檔案，需要您提供路徑',
+        'need_user_input': '需要您提供更多資訊才能繼續',
+        'review_required': '程式碼變更完成，請您檢視',
+        'deployment_ready': '部署準備就緒，需要您確認',
+        'long_running': '任務執行時間較長，請耐心等待'
+    },
+    'tts_backend': 'auto',  # auto、say、sapi、espeak（一次性）、espeak-persistent（常駐行程）或 espeak-lib（行程內合成）
+    'tts_cache': {
+        'enabled': True,  # 重複的訊息直接播放已合成的音訊檔
+        'max_mb': 50  # 快取容量上限，超過時淘汰最久未使用的檔案
+    },
+    'prerender': {
+        'auto': True,  # 設定檔變更時（daemon 運行中）自動預先合成常用訊息
+        'workers': 0  # 平行合成的行程數，0 表示使用 CPU 核心數
+    },
+    'speech_chunking': {
+        'enabled': True,  # 長訊息依句子、子句分段合成，第一段合成好就開始播放
+        'first_max_chars': 40,  # 第一段的長度上限（決定開始出聲前的等待）
+        'max_chars': 100,  # 其餘各段的長度上限
+        'lookahead': 2  # 播放時最多預先合成的段數
+    },
+    'metrics': {
+        'enabled': True,  # 記錄 notify()/say() 各階段耗時（voice_assistant.py stats 查看）
+        'log_max_kb': 1024,  # metrics.jsonl 超過此大小時輪替
+        'export_interval': 15  # daemon 寫入 Prometheus 文字檔（metrics.prom）的間隔秒數
+    },
+    'speech_queue': {
+        'enabled': True,  # notify()/say() 排入佇列後立即返回
+        'preempt_priority': 90,  # 達到此優先權的訊息可以打斷較低優先權的播放
+        'priorities': {},  # 覆寫情緒或情境的優先權，例如 {"long_running": 5}
+        'ttl_seconds': {},  # 覆寫語音有效期限（秒），例如 {"long_running": 20, "default": 180}
+        'max_depth': 20,  # 佇列深度上限
+        'overflow_policy': 'merge',  # 超過上限時：merge、drop_oldest 或 drop_lowest
+        'overflow_max_priority': 50,  # 只合併或丟棄不高於此優先權的項目
+        'overflow_merge_template': '另有 {count} 則較低優先的通知'
+    },
+    'coalesce': {
+        'enabled': True,  # 合併時間窗內的重複通知
+        'window_seconds': 10,
+        'fingerprint': ['context', 'project', 'message'],  # 組成指紋的欄位
+        'normalize': {  # 訊息正規化規則（忽略大小寫、數字、雜湊值與空白差異）
+            'lowercase': True,
+            'digits': True,
+            'hex': True,
+            'whitespace': True,
+            'max_length': 80
+        },
+        'merged_template': '{project} 專案發生 {count} 次：{message}'
+    },
+    # 工具執行結果的分類規則（tool_result_hook 使用）：依順序比對，前面的優先；
+    # context 對應 contextual_messages，關鍵字以小寫比對，patterns 為正規表示式（不分大小寫）；
+    # 不收單獨的 error、exception、help 這類一般輸出也常見的字（例如 0 errors、exception handler）
+    'result_rules': [
+        {'context': 'git_conflict', 'emotion': 'urgent',
+         'keywords': ['merge conflict', 'conflict (content)', 'conflict (modify/delete)',
+                      'automatic merge failed', '<<<<<<< ']},
+        {'context': 'permission_denied', 'emotion': 'worried', 'decisive': True,
+         'keywords': ['permission denied', 'eacces', 'operation not permitted', '權限不足']},
+        {'context': 'test_failed', 'emotion': 'worried', 'decisive': True,
+         'keywords': ['= failures =', 'tests failed', 'test failed', 'test result: failed',
+                      'assertionerror', '測試失敗']},
+        {'context': 'build_error', 'emotion': 'worried', 'decisive': True,
+         'keywords': ['build failed', 'compilation failed', 'compilation error', 'could not compile',
+                      'syntaxerror', 'error[e', '建置失敗']},
+        {'context': 'dependency_issue', 'emotion': 'worried',
+         'keywords': ['modulenotfounderror', 'no module named', 'could not resolve dependency',
+                      'eresolve', 'version conflict']},
+        {'context': 'file_not_found', 'emotion': 'gentle',
+         'keywords': ['no such file or directory', 'filenotfounderror', 'enoent', '找不到檔案']},
+        {'context': 'error', 'emotion': 'urgent',
+         'keywords': ['traceback (most recent call last)', 'failed', 'timeout', 'timed out',
+                      '❌', '失敗']},
+        {'context': 'need_help', 'emotion': 'gentle',
+         'keywords': ['需要', 'assist', '協助']}
+    ]
+}
+
+
+def merge_config(user_config: Dict[str, Any],
+                 base: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """把使用者設定合併到預設值或指定的設定（第一層的 dict 逐項合併）"""
+    merged = copy.deepcopy(DEFAULT_CONFIG if base is None else base)
+    for key, value in user_config.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key].update(value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _thaw(value):
+    if isinstance(value, Mapping):
+        return {key: _thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [_thaw(item) for item in value]
+    return value
+
+
+def _format_template(template: str, name: str) -> str:
+    try:
+        return template.format(name=name)
+    except (KeyError, IndexError, ValueError):
+        return template
+
+
+class ConfigSnapshot(Mapping):
+    """不可變的合併後設定（dict 以唯讀映射、list 以 tuple 呈現）"""
+
+    def __init__(self, data: Dict[str, Any], stamp: Optional[Tuple[int, int]] = None):
+        """
+        Args:
+            data: 合併後的設定
+            stamp: 來源檔案的 (mtime_ns, size)；檔案不存在時為 None
+        """
+        self._data = _freeze(data)
+        self.stamp = stamp
+
+        # 預先替換 {name} 的情境訊息
+        name = data.get('assistant_name', 'Claude Code')
+        self.messages = MappingProxyType({
+            context: _format_template(template, name)
+            for context, template in data.get('contextual_messages', {}).items()
+        })
+
+    def __getitem__(self, key: str) -> Any:
+        return self._data[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._data)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __repr__(self) -> str:
+        return f'ConfigSnapshot({self.to_dict()!r})'
+
+    def message(self, context: Optional[str]) -> str:
+        """情境對應的訊息，未知情境使用 need_help"""
+        if context in self.messages:
+            return self.messages[context]
+        return self.messages.get('need_help', '')
+
+    def to_dict(self) -> Dict[str, Any]:
+        """可修改、可序列化的副本"""
+        return _thaw(self._data)
+
+
+_snapshots = {}
+_snapshots_lock = threading.Lock()
+_defaults_digest = None
+
+
+def _file_stamp(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _get_defaults_digest() -> str:
+    """預設值的雜湊，程式更新後舊的磁碟快取自動失效"""
+    global _defaults_digest
+    if _defaults_digest is None:
+        encoded = json.dumps(DEFAULT_CONFIG, sort_keys=True, ensure_ascii=False)
+        _defaults_digest = hashlib.sha256(encoded.encode('utf-8')).hexdigest()
+    return _defaults_digest
+
+
+def _cache_path(path: str) -> str:
+    digest = hashlib.sha256(os.path.abspath(path).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(CACHE_DIR, f'{digest}.json')
+
+
+def _load_cached_merge(path: str, stamp: Tuple[int, int]) -> Optional[Dict[str, Any]]:
+    """讀取磁碟上的合併結果，來源檔案或預設值變動時回傳 None"""
+    try:
+        with open(_cache_path(path), 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if (cached.get('source') != os.path.abspath(path) or cached.get('stamp') != list(stamp)
+            or cached.get('defaults') != _get_defaults_digest()):
+        return None
+    return cached.get('config')
+
+
+def _store_cached_merge(path: str, stamp: Tuple[int, int], config: Dict[str, Any]):
+    """把合併結果寫到狀態目錄（失敗時忽略，下次重新合併即可）"""
+    cache_path = _cache_path(path)
+    temp_path = f'{cache_path}.{os.getpid()}.tmp'
+    try:
+        os.makedirs(CACHE_DIR, mode=0o700, exist_ok=True)
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'source': os.path.abspath(path),
+                'stamp': list(stamp),
+                'defaults': _get_defaults_digest(),
+                'config': config
+            }, f, ensure_ascii=False)
+        os.replace(temp_path, cache_path)
+    except OSError:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+
+
+def read_user_config(path: str) -> Dict[str, Any]:
+    """讀取設定檔原始內容（不含預設值），檔案不存在時回傳空 dict"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            user_config = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as e:
+        print(f'載入設定檔失敗: {e}')
+        return {}
+    return user_config if isinstance(user_config, dict) else {}
+
+
+def load_snapshot(path) -> ConfigSnapshot:
+    """
+    取得設定檔的快照
+
+    每次呼叫只做一次 stat；mtime 與大小都沒變時回傳同一個快照
+    """
+    path = os.fspath(path)
+    stamp = _file_stamp(path)
+    snapshot = _snapshots.get(path)
+    if snapshot is not None and snapshot.stamp == stamp:
+        return snapshot
+
+    with _snapshots_lock:
+        snapshot = _snapshots.get(path)
+        if snapshot is not None and snapshot.stamp == stamp:
+            return snapshot
+
+        config = _load_cached_merge(path, stamp) if stamp else None
+        if config is None:
+            config = merge_config(read_user_config(path) if stamp else {})
+            if stamp:
+                _store_cached_merge(path, stamp, config)
+
+        snapshot = ConfigSnapshot(config, stamp)
+        _snapshots[path] = snapshot
+        return snapshot
+
+
+def record_lock_wait(name: str, seconds: float):
+    """把等待其他行程釋放鎖的時間記錄到耗時統計（lock_wait 階段，後端為鎖的名稱）"""
+    try:
+        from voice_metrics import observe
+    except ImportError:
+        return
+    observe('lock_wait', seconds, name)
+
+
+def lock_exclusive(lock_file, name: str):
+    """
+    以 fcntl.flock 取得排他鎖
+
+    先嘗試不等待；鎖被其他行程持有時才阻塞等待，並以 record_lock_wait 記錄等待時間，
+    沒有競爭時不產生任何記錄
+    """
+    import fcntl
+
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return
+    except BlockingIOError:
+        pass
+    started = time.perf_counter()
+    fcntl.flock(lock_file, fcntl.LOCK_EX)
+    record_lock_wait(name, time.perf_counter() - started)
+
+
+@contextmanager
+def config_lock(path):
+    """
+    設定檔的寫入鎖（fcntl.flock，跨行程）
+
+    鎖在另一個檔案上：設定檔本身會被 rename 替換，鎖住舊檔案沒有意義
+    """
+    try:
+        import fcntl
+    except ImportError:
+        # 沒有 fcntl 的平台只能依賴 rename 的原子性
+        yield
+        return
+
+    os.makedirs(LOCK_DIR, mode=0o700, exist_ok=True)
+    digest = hashlib.sha256(os.path.abspath(path).encode('utf-8')).hexdigest()[:16]
+    with open(os.path.join(LOCK_DIR, f'{digest}.lock'), 'a') as lock:
+        lock_exclusive(lock, 'config')
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _write_json_atomic(path: str, data: Dict[str, Any]):
+    """寫入同目錄的暫存檔後 rename 替換，保留原檔案權限"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    temp_path = os.path.join(directory, f'.{os.path.basename(path)}.{os.getpid()}.tmp')
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            os.chmod(temp_path, os.stat(path).st_mode & 0o777)
+        except OSError:
+            pass
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def update_config_file(path, changes: Optional[Dict[str, Any]] = None,
+                       mutate: Optional[Callable[[Dict[str, Any]], Any]] = None) -> Dict[str, Any]:
+    """
+    把變更的項目寫回設定檔，其他既有內容保持不變
+
+    在寫入鎖內重新讀取檔案再修改，不會覆蓋其他行程同時寫入的項目
+
+    Args:
+        path: 設定檔
+        changes: 要設定的項目
+        mutate: 需要依檔案目前內容修改時使用（例如加入裝置），在鎖內以設定檔內容呼叫並直接修改
+
+    Returns:
+        寫入後的設定檔內容（不含預設值）
+    """
+    path = os.fspath(path)
+    with config_lock(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                user_config = json.load(f)
+        except FileNotFoundError:
+            user_config = {}
+        # 設定檔格式錯誤時不覆寫（json.load 會拋出 ValueError）
+        if changes:
+            user_config.update(changes)
+        if mutate is not None:
+            mutate(user_config)
+        _write_json_atomic(path, user_config)
+    return user_config
@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+Claude Code 語音通知 daemon
+常駐行程保留設定、音訊偵測器與 TTS 後端，透過 Unix socket 接收 JSON-lines 請求
+客戶端（claude_notify.py 等）送出請求後立即返回，語音由 daemon 依優先權播放
+"""
+import os
+import sys
+import json
+import time
+import queue
+import signal
+import socketserver
+import subprocess
+import threading
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+# 添加工具路徑
+sys.path.insert(0, str(Path(__file__).parent))
+
+from voice_paths import SOCKET_PATH, PID_PATH, LOG_PATH, ensure_state_dir
+from voice_client import send_request
+from voice_trace import mark
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """處理單一連線，每行一個 JSON 請求"""
+
+    def handle(self):
+        for raw_line in self.rfile:
+            raw_line = raw_line.strip()
+            if not raw_line:
+                continue
+            try:
+                request = json.loads(raw_line.decode('utf-8'))
+                response = self.server.voice_daemon.handle_request(request)
+            except ValueError as e:
+                response = {'ok': False, 'error': f'無效的請求: {e}'}
+            except Exception as e:
+                response = {'ok': False, 'error': str(e)}
+            self.wfile.write((json.dumps(response, ensure_ascii=False) + '\n').encode('utf-8'))
+            self.wfile.flush()
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class VoiceDaemon:
+    """語音通知 daemon"""
+
+    def __init__(self, socket_path: str = SOCKET_PATH, config_path: Optional[Path] = None):
+        from voice_assistant import ClaudeVoiceAssistant
+
+        self.socket_path = socket_path
+        self.assistant = ClaudeVoiceAssistant(config_path)
+        # daemon 常駐，以事件監聽音訊裝置變更（一次性的行程只查詢一次）
+        self.assistant.watch_audio_devices = True
+        self.jobs = queue.Queue()
+        self.server = None
+        self.started_at = time.time()
+        self.handled = 0
+        self._config_mtime = self._get_config_mtime()
+        self._config_lock = threading.Lock()
+        self._prerender_lock = threading.Lock()
+        self._stopping = threading.Event()
+
+    def _get_config_mtime(self) -> Optional[float]:
+        try:
+            return self.assistant.config_path.stat().st_mtime
+        except OSError:
+            return None
+
+    def _reload_config_if_changed(self) -> bool:
+        """
+        設定檔被其他行程修改（例如 mode 命令）時觸發預先合成
+
+        設定本身由快照在下次讀取時自動更新，這裡只負責偵測變更
+        """
+        with self._config_lock:
+            mtime = self._get_config_mtime()
+            if mtime == self._config_mtime:
+                return False
+            self._config_mtime = mtime
+        self.start_prerender()
+        return True
+
+    def _watch_config(self, interval: float = 2.0):
+        """定期檢查設定檔，沒有通知進來時也能及時預先合成"""
+        while not self._stopping.wait(interval):
+            try:
+                self._reload_config_if_changed()
+            except Exception as e:
+                print(f'⚠️ 重新載入設定失敗: {e}')
+
+    def _start_instance_cleanup(self):
+        """在背景定期清除過期的 Claude Code 實例"""
+        try:
+            from claude_instances import start_cleanup_thread
+            start_cleanup_thread(self._stopping)
+        except Exception as e:
+            print(f'⚠️ 無法啟動實例清除: {e}')
+
+    def _start_metrics_exporter(self):
+        """定期把各階段耗時寫成 Prometheus 文字檔"""
+        metrics_config = self.assistant.config.get('metrics', {})
+        if not metrics_config.get('enabled', True):
+            return
+        try:
+            from voice_metrics import METRICS
+            METRICS.start_exporter(self._stopping, metrics_config.get('export_interval', 15))
+        except Exception as e:
+            print(f'⚠️ 無法啟動統計輸出: {e}')
+
+    def start_prerender(self):
+        """在背景預先合成常用語音（已有一輪在進行時略過）"""
+        if not self.assistant.config.get('prerender', {}).get('auto', True):
+            return
+        if not self._prerender_lock.acquire(blocking=False):
+            return
+
+        def run():
+            try:
+                from prerender import prerender_all
+                report = prerender_all(self.assistant)
+                if report['rendered'] or report['failed']:
+                    print(f"🎼 預先合成: 新合成 {report['rendered']}，失敗 {report['failed']}，"
+                          f"耗時 {report['wall_time']:.2f} 秒 ({report['clips_per_second']:.2f} 段/秒)")
+            except Exception as e:
+                print(f'⚠️ 預先合成失敗: {e}')
+            finally:
+                self._prerender_lock.release()
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def handle_request(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """處理請求，通知類請求只排入佇列不等待播放"""
+        cmd = request.get('cmd')
+
+        if cmd == 'ping':
+            return {'ok': True, 'pid': os.getpid()}
+
+        if cmd in ('notify', 'say'):
+            mark(request.get('trace'), 'daemon_recv')
+            self.jobs.put(request)
+            return {'ok': True, 'queued': True, 'depth': self.jobs.qsize()}
+
+        if cmd == 'status':
+            return {
+                'ok': True,
+                'pid': os.getpid(),
+                'uptime': round(time.time() - self.started_at, 1),
+                'handled': self.handled,
+                'pending': self.jobs.qsize(),
+                'mode': self.assistant.config.get('mode'),
+                'tts_backend': getattr(self.assistant.tts_backend, 'name', None),
+                'speech_queue': self.assistant.speech_stats(),
+            }
+
+        if cmd == 'reload':
+            self._config_mtime = None
+            self._reload_config_if_changed()
+            return {'ok': True}
+
+        if cmd == 'shutdown':
+            threading.Thread(target=self.shutdown, daemon=True).start()
+            return {'ok': True}
+
+        return {'ok': False, 'error': f'未知命令: {cmd}'}
+
+    def _worker(self):
+        """依序執行佇列中的通知"""
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                break
+            try:
+                mark(job.get('trace'), 'daemon_start')
+                self._reload_config_if_changed()
+                if job['cmd'] == 'say':
+                    self.assistant.say(job.get('message', ''), job.get('emotion'),
+                                       job.get('voice_only', False), cwd=job.get('cwd'),
+                                       trace_id=job.get('trace'))
+                else:
+                    self.assistant.notify(
+                        message=job.get('message'),
+                        context=job.get('context'),
+                        emotion=job.get('emotion'),
+                        details=job.get('details'),
+                        force_voice=job.get('force_voice', False),
+                        project=job.get('project'),
+                        cwd=job.get('cwd'),
+                        trace_id=job.get('trace')
+                    )
+            except Exception as e:
+                print(f'❌ 處理通知失敗: {e}')
+            finally:
+                self.handled += 1
+                self.jobs.task_done()
+
+    def serve_forever(self):
+        """啟動 socket 伺服器（前景執行）"""
+        ensure_state_dir()
+
+        # 清除前一次殘留的 socket
+        if os.path.exists(self.socket_path):
+            if send_request({'cmd': 'ping'}, timeout=0.5, socket_path=self.socket_path):
+                print(f'⚠️ daemon 已在運行: {self.socket_path}')
+                return
+            os.unlink(self.socket_path)
+
+        self.server = _UnixServer(self.socket_path, _RequestHandler)
+        self.server.voice_daemon = self
+        os.chmod(self.socket_path, 0o600)
+
+        with open(PID_PATH, 'w') as f:
+            f.write(str(os.getpid()))
+
+        signal.signal(signal.SIGTERM, lambda signum, frame: threading.Thread(
+            target=self.shutdown, daemon=True).start())
+
+        threading.Thread(target=self._worker, daemon=True).start()
+        threading.Thread(target=self._watch_config, daemon=True).start()
+        self._start_instance_cleanup()
+        self._start_metrics_exporter()
+        print(f'🎙️ 語音 daemon 已啟動: {self.socket_path} (PID {os.getpid()})')
+
+        # 啟動時補齊快取中缺少的常用語音
+        self.start_prerender()
+
+        try:
+            self.server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self._cleanup()
+
+    def shutdown(self):
+        """停止伺服器"""
+        if self.server:
+            self.server.shutdown()
+
+    def _cleanup(self):
+        self._stopping.set()
+        self.jobs.put(None)
+        if self.server:
+            self.server.server_close()
+        self.assistant.close()
+        for path in (self.socket_path, PID_PATH):
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+        print('👋 語音 daemon 已停止')
+
+
+def start_background(timeout: float = 5.0) -> bool:
+    """在背景啟動 daemon 並等待可用"""
+    if send_request({'cmd': 'ping'}, timeout=0.5):
+        print('ℹ️ daemon 已在運行')
+        return True
+
+    ensure_state_dir()
+    with open(LOG_PATH, 'a') as log:
+        subprocess.Popen(
+            [sys.executable, '-u', str(Path(__file__).resolve()), 'run'],
+            stdin=subprocess.DEVNULL, stdout=log, stderr=subprocess.STDOUT,
+            start_new_session=True
+        )
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if send_request({'cmd': 'ping'}, timeout=0.5):
+            print(f'✅ daemon 已在背景啟動: {SOCKET_PATH}')
+            return True
+        time.sleep(0.1)
+
+    print(f'❌ daemon 啟動失敗，請查看日誌: {LOG_PATH}')
+    return False
+
+
+def main():
+    """CLI 主程式"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Claude Code 語音通知 daemon')
+    parser.add_argument('command', choices=['run', 'start', 'stop', 'status'],
+                        help='run: 前景執行, start: 背景啟動, stop: 停止, status: 狀態')
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        VoiceDaemon().serve_forever()
+
+    elif args.command == 'start':
+        sys.exit(0 if start_background() else 1)
+
+    elif args.command == 'stop':
+        if send_request({'cmd': 'shutdown'}):
+            print('✅ 已通知 daemon 停止')
+        else:
+            print('ℹ️ daemon 未在運行')
+
+    elif args.command == 'status':
+        status = send_request({'cmd': 'status'})
+        if status:
+            print(json.dumps(status, ensure_ascii=False, indent=2))
+        else:
+            print('❌ daemon 未在運行')
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
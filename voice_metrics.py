@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+通知流程各階段的耗時統計
+
+notify()/say() 的每個階段（讀取設定、音訊偵測、系統通知、語音合成與播放…）以 timer() 計時，
+記錄到行程內的直方圖，另外每筆附加到狀態目錄的 metrics.jsonl（超過上限時輪替）。
+常駐 daemon 定期把直方圖寫成 Prometheus 文字格式（metrics.prom，可交給 node_exporter 的
+textfile collector）；`voice_assistant.py stats` 讀取 metrics.jsonl，
+列出各階段、各後端的 p50 / p95 / p99。
+"""
+import os
+import json
+import math
+import time
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from voice_paths import STATE_DIR
+
+# 逐筆記錄（JSON lines）與 Prometheus 輸出
+LOG_PATH = os.path.join(STATE_DIR, 'metrics.jsonl')
+PROMETHEUS_PATH = os.path.join(STATE_DIR, 'metrics.prom')
+
+# metrics.jsonl 超過此大小時輪替為 metrics.jsonl.1
+LOG_MAX_BYTES = 1024 * 1024
+
+# 直方圖的上界（秒）
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# stats 預設讀取的最近筆數
+STATS_RECENT = 10000
+
+
+class Histogram:
+    """累積式直方圖（Prometheus histogram 的格式）"""
+
+    __slots__ = ('counts', 'count', 'sum')
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds: float):
+        self.count += 1
+        self.sum += seconds
+        for index, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.counts[index] += 1
+                break
+
+
+class Metrics:
+    """行程內的各階段直方圖"""
+
+    def __init__(self, log_path: Optional[str] = LOG_PATH, log_max_bytes: int = LOG_MAX_BYTES):
+        self.log_path = log_path
+        self.log_max_bytes = log_max_bytes
+        self.enabled = True
+        # {(階段, 後端): Histogram}
+        self._histograms: Dict[Tuple[str, str], Histogram] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, seconds: float, backend: Optional[str] = None):
+        """記錄一次耗時"""
+        if not self.enabled:
+            return
+        key = (stage, backend or '')
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(seconds)
+        if self.log_path:
+            try:
+                self._append_log({'ts': round(time.time(), 3), 'stage': stage, 'backend': backend,
+                                  'ms': round(seconds * 1000, 3), 'pid': os.getpid()})
+            except OSError:
+                # 統計寫不進去不影響通知
+                pass
+
+    @contextmanager
+    def timer(self, stage: str, backend: Optional[str] = None):
+        """
+        計時區塊；後端要到區塊內才知道時可以改寫 label
+
+            with metrics.timer('speak') as label:
+                label['backend'] = backend.name
+        """
+        label = {'backend': backend}
+        started = time.perf_counter()
+        try:
+            yield label
+        finally:
+            self.observe(stage, time.perf_counter() - started, label['backend'])
+
+    def _append_log(self, record: Dict[str, Any]):
+        """附加一行（單次 write，多個行程同時附加也不會交錯），超過上限時輪替"""
+        line = (json.dumps(record, ensure_ascii=False) + '\n').encode('utf-8')
+        try:
+            fd = os.open(self.log_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+        except FileNotFoundError:
+            os.makedirs(os.path.dirname(self.log_path), mode=0o700, exist_ok=True)
+            fd = os.open(self.log_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+        try:
+            os.write(fd, line)
+            size = os.fstat(fd).st_size
+        finally:
+            os.close(fd)
+        if size > self.log_max_bytes:
+            try:
+                os.replace(self.log_path, self.log_path + '.1')
+            except OSError:
+                pass
+
+    def render_prometheus(self) -> str:
+        """Prometheus 文字格式"""
+        with self._lock:
+            items = sorted((key, list(h.counts), h.count, h.sum)
+                           for key, h in self._histograms.items())
+
+        lines = ['# HELP claude_voice_stage_seconds 通知流程各階段耗時',
+                 '# TYPE claude_voice_stage_seconds histogram']
+        for (stage, backend), counts, count, total in items:
+            labels = f'stage="{_escape_label(stage)}",backend="{_escape_label(backend)}"'
+            cumulative = 0
+            for bound, bucket_count in zip(BUCKETS, counts):
+                cumulative += bucket_count
+                lines.append(f'claude_voice_stage_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'claude_voice_stage_seconds_bucket{{{labels},le="+Inf"}} {count}')
+            lines.append(f'claude_voice_stage_seconds_sum{{{labels}}} {total:.6f}')
+            lines.append(f'claude_voice_stage_seconds_count{{{labels}}} {count}')
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path: str = PROMETHEUS_PATH):
+        """寫入 Prometheus 文字檔（暫存檔加 rename，collector 不會讀到一半）"""
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        temp_path = f'{path}.{os.getpid()}.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(self.render_prometheus())
+        os.replace(temp_path, path)
+
+    def start_exporter(self, stop_event: threading.Event, interval: float = 15.0,
+                       path: str = PROMETHEUS_PATH) -> threading.Thread:
+        """在背景定期寫入 Prometheus 文字檔（daemon 使用），stop_event 設定後寫入最後一次並結束"""
+
+        def run():
+            while True:
+                stopping = stop_event.wait(interval)
+                try:
+                    self.write_prometheus(path)
+                except OSError as e:
+                    print(f'⚠️ 寫入統計失敗: {e}')
+                if stopping:
+                    break
+
+        thread = threading.Thread(target=run, name='metrics-exporter', daemon=True)
+        thread.start()
+        return thread
+
+
+def _escape_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# 行程共用的統計
+METRICS = Metrics()
+
+
+def timer(stage: str, backend: Optional[str] = None):
+    """以行程共用的統計計時"""
+    return METRICS.timer(stage, backend)
+
+
+def observe(stage: str, seconds: float, backend: Optional[str] = None):
+    METRICS.observe(stage, seconds, backend)
+
+
+def configure(config):
+    """依設定檔的 metrics 區段啟用或停用記錄"""
+    metrics_config = config.get('metrics', {})
+    METRICS.enabled = metrics_config.get('enabled', True)
+    METRICS.log_max_bytes = int(metrics_config.get('log_max_kb', LOG_MAX_BYTES // 1024) * 1024)
+
+
+def read_log(path: str = LOG_PATH, recent: Optional[int] = STATS_RECENT,
+             since: Optional[float] = None) -> List[Dict[str, Any]]:
+    """讀取最近的記錄（含輪替前的檔案；recent 為 None 時讀取全部）"""
+    from collections import deque
+
+    records = deque(maxlen=recent)
+    for log_file in (path + '.1', path):
+        try:
+            with open(log_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    if since is None or record.get('ts', 0) >= since:
+                        records.append(record)
+        except OSError:
+            continue
+    return list(records)
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """已排序數列的百分位數（最近秩法）"""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, math.ceil(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(records: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    依（階段, 後端）彙整
+
+    Returns:
+        [{'stage', 'backend', 'count', 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms'}, ...]
+    """
+    groups: Dict[Tuple[str, str], List[float]] = {}
+    for record in records:
+        key = (record.get('stage') or '?', record.get('backend') or '')
+        groups.setdefault(key, []).append(float(record.get('ms', 0)))
+
+    rows = []
+    for (stage, backend), values in sorted(groups.items()):
+        values.sort()
+        rows.append({
+            'stage': stage,
+            'backend': backend,
+            'count': len(values),
+            'mean_ms': sum(values) / len(values),
+            'p50_ms': percentile(values, 0.50),
+            'p95_ms': percentile(values, 0.95),
+            'p99_ms': percentile(values, 0.99),
+            'max_ms': values[-1],
+        })
+    return rows
+
+
+def print_stats(rows: List[Dict[str, Any]]):
+    """以表格列出 summarize() 的結果"""
+    if not rows:
+        print('ℹ️ 尚無統計資料')
+        return
+    print(f"{'階段':<22}{'後端':<20}{'次數':>7}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'最長 ms':>10}")
+    for row in rows:
+        print(f"{row['stage']:<24}{row['backend'] or '-':<22}{row['count']:>7}"
+              f"{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}{row['p99_ms']:>10.1f}{row['max_ms']:>10.1f}")
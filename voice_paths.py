@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+"""
+語音助理執行期路徑
+集中定義 daemon socket 與狀態檔案的位置
+只依賴 os，讓輕量客戶端可以直接匯入
+"""
+import os
+
+# 執行期狀態目錄（可用環境變數覆寫，方便測試或多人共用主機）
+STATE_DIR = os.environ.get('CLAUDE_VOICE_STATE_DIR') or os.path.join(
+    os.path.expanduser('~'), '.claude-code-voice'
+)
+
+# daemon 相關檔案
+SOCKET_PATH = os.environ.get('CLAUDE_VOICE_SOCKET') or os.path.join(STATE_DIR, 'daemon.sock')
+PID_PATH = os.path.join(STATE_DIR, 'daemon.pid')
+LOG_PATH = os.path.join(STATE_DIR, 'daemon.log')
+
+
+def ensure_state_dir() -> str:
+    """確保狀態目錄存在並回傳路徑"""
+    os.makedirs(STATE_DIR, mode=0o700, exist_ok=True)
+    return STATE_DIR
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+通知的端到端追蹤
+
+hook（或 claude_notify.py）產生追蹤 ID，放進環境變數 CLAUDE_VOICE_TRACE_ID 與送給 daemon 的請求，
+daemon 工作、notify()、語音佇列項目一路帶著同一個 ID；每經過一站就以 mark() 記下時間，
+附加到狀態目錄的 traces.jsonl。`voice_assistant.py trace` 依 ID 組回每則通知經過的各站與耗時。
+
+記錄的各站（依序）:
+    hook / cli          hook 或命令列工具開始處理
+    classified          hook 比對到結果規則
+    client_send         送出給 daemon
+    daemon_recv         daemon 收到請求並排入工作佇列
+    daemon_start        daemon 工作執行緒開始處理
+    notify_start        notify()/say() 開始
+    coalesced           與時間窗內的相同通知合併（不再另外播放）
+    speech_queued       語音排入播放佇列
+    speech_start        語音佇列開始播放這一則
+    synthesized         合成到快取完成（快取未命中時；長訊息分段播放時每段一筆）
+    audio_start         音訊交給播放端（啟動播放行程或寫入常駐行程），最接近第一個聽得到的樣本
+    audio_end           播放結束
+
+時間使用 time.time()，同一台機器上的不同行程可以直接相減。
+常用路徑（hook、claude_notify.py）只匯入 os、time 與 fcntl，記錄以單次 O_APPEND write 附加。
+寫入時持有紀錄檔的共享鎖，輪替時持有排他鎖：輪替期間的寫入等輪替完成後改寫到新的檔案，
+多個行程同時輪替時只有一個會改名，不會互相覆蓋 traces.jsonl.1。
+"""
+from __future__ import annotations
+
+import os
+import time
+
+from voice_paths import STATE_DIR
+
+# 行程之間傳遞追蹤 ID 的環境變數
+TRACE_ENV = 'CLAUDE_VOICE_TRACE_ID'
+
+# 各站時間記錄（JSON lines）
+TRACE_LOG_PATH = os.path.join(STATE_DIR, 'traces.jsonl')
+
+# traces.jsonl 超過此大小時輪替為 traces.jsonl.1
+TRACE_LOG_MAX_BYTES = 1024 * 1024
+
+# trace 預設顯示的最近通知數
+TRACE_RECENT = 10
+
+# 各站的顯示順序
+HOPS = ('hook', 'cli', 'classified', 'client_send', 'daemon_recv', 'daemon_start',
+        'notify_start', 'coalesced', 'speech_queued', 'speech_start', 'synthesized',
+        'audio_start', 'audio_end')
+
+# 工作執行緒目前處理的追蹤 ID（daemon 同時處理多則通知，不能只靠環境變數）
+_local = None
+
+
+def new_trace_id() -> str:
+    return os.urandom(8).hex()
+
+
+def start(hop: str = 'hook', ts: float | None = None) -> str:
+    """
+    開始追蹤：沿用環境變數中的 ID（由上游 hook 傳入），否則產生新的 ID 並寫入環境變數，
+    讓之後啟動的子行程沿用
+
+    Args:
+        hop: 起點的站名
+        ts: 起點時間（預設為現在），hook 可傳入開始處理時記下的時間
+    """
+    trace_id = os.environ.get(TRACE_ENV)
+    if not trace_id:
+        trace_id = os.environ[TRACE_ENV] = new_trace_id()
+    mark(trace_id, hop, ts=ts)
+    return trace_id
+
+
+def current() -> str | None:
+    """目前執行緒的追蹤 ID，沒有時使用環境變數"""
+    if _local is not None:
+        trace_id = getattr(_local, 'trace_id', None)
+        if trace_id:
+            return trace_id
+    return os.environ.get(TRACE_ENV) or None
+
+
+class activate:
+    """
+    在區塊內把追蹤 ID 設為目前執行緒的 ID（離開時還原）
+
+        with voice_trace.activate(job.get('trace')):
+            assistant.notify(...)
+    """
+
+    __slots__ = ('trace_id', 'previous')
+
+    def __init__(self, trace_id: str | None):
+        self.trace_id = trace_id
+        self.previous = None
+
+    def __enter__(self):
+        global _local
+        if _local is None:
+            import threading
+            _local = threading.local()
+        self.previous = getattr(_local, 'trace_id', None)
+        if self.trace_id:
+            _local.trace_id = self.trace_id
+        return self.trace_id
+
+    def __exit__(self, *exc_info):
+        _local.trace_id = self.previous
+
+
+def mark(trace_id: str | None, hop: str, backend: str | None = None, ts: float | None = None,
+         path: str = TRACE_LOG_PATH):
+    """
+    記錄通知經過某一站的時間（trace_id 為 None 時不記錄）
+
+    記錄失敗（例如狀態目錄無法寫入）不影響通知
+    """
+    if not trace_id:
+        return
+    line = '{"trace": "%s", "hop": "%s", "ts": %.6f, "pid": %d' % (
+        _clean(trace_id), _clean(hop), time.time() if ts is None else ts, os.getpid())
+    if backend:
+        line += ', "backend": "%s"' % _clean(backend)
+    data = (line + '}\n').encode('utf-8')
+    try:
+        fd = _open_log(path)
+        try:
+            if _replaced(fd, path):
+                # 開檔後紀錄檔被其他行程輪替了，改寫到新的檔案
+                os.close(fd)
+                fd = _open_log(path)
+            os.write(fd, data)
+            size = os.fstat(fd).st_size
+        finally:
+            os.close(fd)
+        if size > TRACE_LOG_MAX_BYTES:
+            _rotate(path)
+    except OSError:
+        pass
+
+
+def _flock(fd: int, exclusive: bool = False):
+    """取得紀錄檔的鎖（關閉 fd 時釋放）；沒有 fcntl 的平台直接略過"""
+    try:
+        import fcntl
+    except ImportError:
+        return
+    fcntl.flock(fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+
+
+def _open_log(path: str) -> int:
+    """以附加模式開啟紀錄檔並取得共享鎖（輪替中時等待輪替完成）"""
+    try:
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+    except FileNotFoundError:
+        os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o600)
+    try:
+        _flock(fd)
+    except OSError:
+        os.close(fd)
+        raise
+    return fd
+
+
+def _replaced(fd: int, path: str) -> bool:
+    """fd 是否已不是 path 目前指向的檔案（已被輪替）"""
+    try:
+        current = os.stat(path)
+    except FileNotFoundError:
+        return True
+    opened = os.fstat(fd)
+    return (current.st_ino, current.st_dev) != (opened.st_ino, opened.st_dev)
+
+
+def _rotate(path: str):
+    """
+    把紀錄檔輪替為 path.1
+
+    持有排他鎖並確認仍是目前的紀錄檔、仍超過大小上限才改名：
+    其他行程已經輪替過時，這裡開到的是新的小檔案，不會再改名一次
+    """
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except FileNotFoundError:
+        return
+    try:
+        _flock(fd, exclusive=True)
+        if os.fstat(fd).st_size > TRACE_LOG_MAX_BYTES and not _replaced(fd, path):
+            os.replace(path, path + '.1')
+    finally:
+        os.close(fd)
+
+
+def mark_current(hop: str, backend: str | None = None):
+    """以目前執行緒的追蹤 ID 記錄"""
+    mark(current(), hop, backend)
+
+
+def _clean(value: str) -> str:
+    """站名、後端與 ID 都是程式內的識別字，只需去掉會破壞 JSON 的字元"""
+    return ''.join(char for char in str(value) if char not in '"\\' and char >= ' ')
+
+
+def read_traces(path: str = TRACE_LOG_PATH, recent: int | None = TRACE_RECENT,
+                trace_id: str | None = None) -> list:
+    """
+    依追蹤 ID 組合記錄，回傳最近 recent 則通知（舊的在前，recent 為 None 時回傳全部）
+
+    Returns:
+        [{'trace': ID, 'hops': [{'hop', 'ts', 'pid', 'backend'}, ...（依時間排序）]}, ...]
+    """
+    import json
+
+    traces = {}
+    for log_file in (path + '.1', path):
+        try:
+            with open(log_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    key = record.get('trace')
+                    if not key or (trace_id and not key.startswith(trace_id)):
+                        continue
+                    traces.setdefault(key, []).append(record)
+        except OSError:
+            continue
+
+    result = [{'trace': key, 'hops': sorted(hops, key=lambda record: record.get('ts', 0))}
+              for key, hops in traces.items()]
+    result.sort(key=lambda trace: trace['hops'][0].get('ts', 0))
+    return result[-recent:] if recent else result
+
+
+def breakdown(trace: dict) -> list:
+    """
+    各站相對於起點與前一站的耗時
+
+    Returns:
+        [{'hop', 'backend', 'pid', 'since_start_ms', 'since_prev_ms'}, ...]
+    """
+    rows = []
+    hops = trace['hops']
+    if not hops:
+        return rows
+    first = previous = hops[0].get('ts', 0)
+    for record in hops:
+        ts = record.get('ts', 0)
+        rows.append({
+            'hop': record.get('hop'),
+            'backend': record.get('backend'),
+            'pid': record.get('pid'),
+            'since_start_ms': (ts - first) * 1000,
+            'since_prev_ms': (ts - previous) * 1000,
+        })
+        previous = ts
+    return rows
+
+
+def summarize_hops(traces: list) -> list:
+    """
+    彙整多則通知中每一段（前一站 → 這一站）的耗時，找出變慢的階段
+
+    Returns:
+        [{'segment', 'count', 'p50_ms', 'p95_ms', 'max_ms'}, ...]（依 HOPS 順序）
+    """
+    from voice_metrics import percentile
+
+    segments = {}
+    for trace in traces:
+        rows = breakdown(trace)
+        for previous, row in zip(rows, rows[1:]):
+            key = (previous['hop'], row['hop'])
+            segments.setdefault(key, []).append(row['since_prev_ms'])
+
+    order = {hop: index for index, hop in enumerate(HOPS)}
+    summary = []
+    for (start_hop, end_hop), values in sorted(
+            segments.items(), key=lambda item: (order.get(item[0][1], len(HOPS)),
+                                                order.get(item[0][0], len(HOPS)))):
+        values.sort()
+        summary.append({
+            'segment': f'{start_hop} → {end_hop}',
+            'count': len(values),
+            'p50_ms': percentile(values, 0.50),
+            'p95_ms': percentile(values, 0.95),
+            'max_ms': values[-1],
+        })
+    return summary
+
+
+def print_traces(traces: list):
+    """列出每則通知的各站耗時與各段彙整"""
+    if not traces:
+        print('ℹ️ 尚無追蹤記錄')
+        return
+
+    for trace in traces:
+        rows = breakdown(trace)
+        started = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(trace['hops'][0].get('ts', 0)))
+        print(f"🧵 {trace['trace']}  {started}  共 {rows[-1]['since_start_ms']:.1f} ms")
+        for row in rows:
+            backend = f" [{row['backend']}]" if row['backend'] else ''
+            print(f"   {row['hop']:<14}{row['since_start_ms']:>10.1f} ms  "
+                  f"(+{row['since_prev_ms']:.1f})  pid {row['pid']}{backend}")
+        print()
+
+    if len(traces) > 1:
+        print(f"📊 各段耗時（{len(traces)} 則通知）")
+        print(f"{'區段':<34}{'次數':>6}{'p50 ms':>10}{'p95 ms':>10}{'最長 ms':>10}")
+        for row in summarize_hops(traces):
+            print(f"{row['segment']:<36}{row['count']:>6}{row['p50_ms']:>10.1f}"
+                  f"{row['p95_ms']:>10.1f}{row['max_ms']:>10.1f}")